@@ -0,0 +1,214 @@
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from faq_index import char_ngrams, tokenize
+
+# Kept at the end of a word, so "C++" and "C#" don't both become "c"
+WORD_SUFFIXES = '+#'
+
+# Zero-width (non-)joiners are part of Bengali spelling, not separators
+JOINERS = '\u200c\u200d'
+
+
+def _is_word_char(char):
+    # Letters and digits in any script, plus the combining marks (vowel
+    # signs, viramas) that isalnum() leaves out
+    return char.isalnum() or char in JOINERS or unicodedata.category(char).startswith('M')
+
+
+def normalize_question(question):
+    """Casefold a question and strip punctuation and extra whitespace.
+
+    Words are runs of letters, digits and combining marks in any script,
+    keeping a trailing + or #. A question with no words at all is keyed
+    on its stripped text, so such questions never share one empty key.
+    """
+    words = []
+    word = ''
+    for char in unicodedata.normalize('NFKC', question).casefold():
+        if _is_word_char(char) or (word and char in WORD_SUFFIXES):
+            word += char
+        elif word:
+            words.append(word)
+            word = ''
+    if word:
+        words.append(word)
+    return ' '.join(words) or question.strip()
+
+
+def context_version(*parts):
+    """Hash everything that influences an answer into a cache version"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True)
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def token_set(question):
+    """Content terms of a question, for token-set similarity"""
+    return frozenset(tokenize(question))
+
+
+def jaccard(a, b):
+    """Jaccard similarity of two sets"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NullCache:
+    """Cache that never stores anything, used when caching is disabled"""
+
+    def get(self, question, version):
+        return None
+
+    def set(self, question, version, answer):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {'enabled': False}
+
+
+class AnswerCache:
+    """Thread-safe LRU/TTL cache of answers keyed on the normalized question.
+
+    Entries are keyed on (normalized question, version), where version is a
+    hash of the FAQ text and generation config, so changing either one makes
+    old answers unreachable. With near_duplicate_threshold set, a miss on the
+    exact key falls back to the most similar cached question of the same
+    version.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024, ttl=3600,
+                 near_duplicate_threshold=None, similarity='tokens'):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.features = char_ngrams if similarity == 'ngrams' else token_set
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _size(self, key, answer):
+        return len(key[0].encode('utf-8')) + len(answer.encode('utf-8'))
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry['stored_at'] > self.ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry['size']
+
+    def _find_near_duplicate(self, question, version, now):
+        features = self.features(question)
+        best_key, best_score = None, 0.0
+        for key, entry in self._entries.items():
+            if key[1] != version or self._expired(entry, now):
+                continue
+            score = jaccard(features, entry['features'])
+            if score > best_score:
+                best_key, best_score = key, score
+        if best_key is not None and best_score >= self.near_duplicate_threshold:
+            return best_key
+        return None
+
+    def get(self, question, version):
+        """Return a cached answer for the question, or None on a miss"""
+        key = (normalize_question(question), version)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry, now):
+                self._remove(key)
+                entry = None
+
+            if entry is None and self.near_duplicate_threshold is not None:
+                near_key = self._find_near_duplicate(question, version, now)
+                if near_key is not None:
+                    self._entries.move_to_end(near_key)
+                    self.near_hits += 1
+                    return self._entries[near_key]['answer']
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry['answer']
+
+    def set(self, question, version, answer):
+        """Store an answer, evicting least recently used entries if needed"""
+        key = (normalize_question(question), version)
+        size = self._size(key, answer)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = {
+                'answer': answer,
+                'features': self.features(question),
+                'stored_at': time.monotonic(),
+                'size': size,
+            }
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'enabled': True,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
+
+
+def create_answer_cache(config):
+    """Build the answer cache described by the app config"""
+    if config.get('ANSWER_CACHE', 'memory') != 'memory':
+        return NullCache()
+
+    threshold = config.get('ANSWER_CACHE_NEAR_DUPLICATE_THRESHOLD')
+    return AnswerCache(
+        max_entries=config.get('ANSWER_CACHE_MAX_ENTRIES', 1024),
+        max_bytes=config.get('ANSWER_CACHE_MAX_BYTES', 16 * 1024 * 1024),
+        ttl=config.get('ANSWER_CACHE_TTL', 3600),
+        near_duplicate_threshold=float(threshold) if threshold else None,
+        similarity=config.get('ANSWER_CACHE_SIMILARITY', 'tokens'),
+    )
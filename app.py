@@ -1,79 +1,389 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session, flash
+from flask import Blueprint, Flask, Response, current_app, g, render_template, request, jsonify, redirect, url_for, session, flash, stream_with_context
 import os
-import google.generativeai as genai
 from dotenv import load_dotenv
-import sqlite3
 from datetime import datetime
-import hashlib
+import atexit
+import hmac
 import secrets
+import tempfile
+import threading
+import time
 import re
+import json
+import logging
+from faq_index import detect_language, format_entries, estimate_tokens, reply_language
+from knowledge_base import KnowledgeBaseStore
+from search import search_messages
+from archive import restore_conversation
+from export import FORMATS as EXPORT_FORMATS, export_messages
+from http_cache import StaticVersions, compress_response
+from batch import BatchError, BatchRunner, parse_questions
+from write_behind import MessageWriter
+from llm_backend import create_llm_backend
+from llm_invoker import LLMError, LLMInvoker
+from answer_cache import context_version, create_answer_cache, normalize_question
+from model_registry import ModelRegistry, PromptTemplate
+from singleflight import create_single_flight
+from db import ConnectionPool, connect, pragmas_from_config
+from migrations import migrate
+from conversation_memory import ConversationMemory, is_follow_up
+from rate_limit import RateLimited, create_rate_limiter, retry_after_header
+from upstream import UpstreamBusy, UpstreamLimiter
+from structured_log import configure_logging, log_event
+from passwords import HasherBusy, create_password_hasher
+import metrics
+
+# Importing this module has no side effects: the environment, the Gemini
+# client and the database are only touched by create_app() and first use.
+logger = logging.getLogger('smart_faq')
+
+def load_config():
+    """Read the app configuration from the environment (and .env)"""
+    load_dotenv()
+    config = {}
+    config['SECRET_KEY'] = os.getenv("SECRET_KEY", secrets.token_hex(16))
+
+    # Gemini API. GEMINI_TRANSPORT=rest and GEMINI_API_ENDPOINT allow pointing
+    # the client at a local stub server for load tests.
+    config['GEMINI_API_KEY'] = os.getenv("GEMINI_API_KEY")
+    config['GEMINI_TRANSPORT'] = os.getenv("GEMINI_TRANSPORT")
+    config['GEMINI_API_ENDPOINT'] = os.getenv("GEMINI_API_ENDPOINT")
+
+    # LLM_BACKEND=stub answers with a deterministic local stub instead of
+    # Gemini, for offline benchmarks: it waits STUB_LLM_LATENCY seconds, then
+    # streams STUB_LLM_ANSWER_TOKENS words at STUB_LLM_TOKENS_PER_SECOND, and
+    # fails a STUB_LLM_ERROR_RATE fraction of calls. A STUB_LLM_SLOW_RATE
+    # fraction wait STUB_LLM_SLOW_LATENCY instead, for a latency tail, and the
+    # fallback model waits STUB_LLM_FALLBACK_LATENCY
+    config['LLM_BACKEND'] = os.getenv("LLM_BACKEND", "gemini")
+    config['STUB_LLM_LATENCY'] = float(os.getenv("STUB_LLM_LATENCY", "0.5"))
+    config['STUB_LLM_TOKENS_PER_SECOND'] = float(os.getenv("STUB_LLM_TOKENS_PER_SECOND", "100"))
+    config['STUB_LLM_ANSWER_TOKENS'] = int(os.getenv("STUB_LLM_ANSWER_TOKENS", "80"))
+    config['STUB_LLM_ERROR_RATE'] = float(os.getenv("STUB_LLM_ERROR_RATE", "0"))
+    config['STUB_LLM_SEED'] = int(os.getenv("STUB_LLM_SEED", "0"))
+    config['STUB_LLM_SLOW_RATE'] = float(os.getenv("STUB_LLM_SLOW_RATE", "0"))
+    config['STUB_LLM_SLOW_LATENCY'] = float(os.getenv("STUB_LLM_SLOW_LATENCY", "5"))
+    config['STUB_LLM_FALLBACK_LATENCY'] = float(os.getenv("STUB_LLM_FALLBACK_LATENCY", "0.2"))
+
+    # Structured request logs: LOG_FORMAT is "json" (default) or "text"
+    config['LOG_LEVEL'] = os.getenv("LOG_LEVEL", "INFO")
+    config['LOG_FORMAT'] = os.getenv("LOG_FORMAT", "json")
+
+    # The FAQ is read from FAQ_PATH and reloaded when the file changes, checked
+    # at most every FAQ_RELOAD_INTERVAL seconds (0 disables reloading)
+    config['FAQ_PATH'] = os.getenv("FAQ_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "faq.json"))
+    config['FAQ_RELOAD_INTERVAL'] = float(os.getenv("FAQ_RELOAD_INTERVAL", "2"))
+
+    # FAQ context mode: "retrieval" sends only the top-k matching FAQ entries to
+    # Gemini, "full" sends the whole FAQ (useful for comparisons)
+    config['FAQ_CONTEXT_MODE'] = os.getenv("FAQ_CONTEXT_MODE", "retrieval")
+    config['FAQ_TOP_K'] = int(os.getenv("FAQ_TOP_K", "5"))
+
+    # Answer cache: "memory" or "none". Set a near-duplicate threshold (0-1) to
+    # also reuse answers for reworded questions.
+    config['ANSWER_CACHE'] = os.getenv("ANSWER_CACHE", "memory")
+    config['ANSWER_CACHE_MAX_ENTRIES'] = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    config['ANSWER_CACHE_MAX_BYTES'] = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    config['ANSWER_CACHE_TTL'] = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    config['ANSWER_CACHE_NEAR_DUPLICATE_THRESHOLD'] = os.getenv("ANSWER_CACHE_NEAR_DUPLICATE_THRESHOLD")
+    config['ANSWER_CACHE_SIMILARITY'] = os.getenv("ANSWER_CACHE_SIMILARITY", "tokens")
+
+    # Local fast path: answer straight from the FAQ when the question matches an
+    # FAQ question with at least this confidence (0-1)
+    config['FAST_PATH_ENABLED'] = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    config['FAST_PATH_THRESHOLD'] = float(os.getenv("FAST_PATH_THRESHOLD", "0.7"))
+
+    # Request coalescing: concurrent identical questions share one Gemini call.
+    # COALESCE_ACROSS_WORKERS extends this to all gunicorn workers on the host
+    # through lock files in COALESCE_LOCK_DIR.
+    config['COALESCE_REQUESTS'] = os.getenv("COALESCE_REQUESTS", "true").lower() == "true"
+    config['COALESCE_ACROSS_WORKERS'] = os.getenv("COALESCE_ACROSS_WORKERS", "false").lower() == "true"
+    config['COALESCE_LOCK_DIR'] = os.getenv("COALESCE_LOCK_DIR", os.path.join(tempfile.gettempdir(), "smart_faq_singleflight"))
+    config['COALESCE_RESULT_TTL'] = float(os.getenv("COALESCE_RESULT_TTL", "5"))
+    # How long a worker waits for another worker's call before making its own
+    config['COALESCE_LOCK_TIMEOUT'] = float(os.getenv("COALESCE_LOCK_TIMEOUT", "10"))
+
+    # Multi-turn memory: earlier turns of the conversation are added to the
+    # prompt, trimmed to CONVERSATION_TOKEN_BUDGET (roughly 4 chars per token)
+    config['CONVERSATION_MEMORY'] = os.getenv("CONVERSATION_MEMORY", "true").lower() == "true"
+    config['CONVERSATION_TOKEN_BUDGET'] = int(os.getenv("CONVERSATION_TOKEN_BUDGET", "1000"))
+    config['CONVERSATION_LOAD_MESSAGES'] = int(os.getenv("CONVERSATION_LOAD_MESSAGES", "20"))
+
+    # Per-user rate limit on /ask: "memory" (per worker), "sqlite" (shared by
+    # all workers through the database) or "none"
+    config['RATE_LIMIT'] = os.getenv("RATE_LIMIT", "memory")
+    config['RATE_LIMIT_PER_MINUTE'] = float(os.getenv("RATE_LIMIT_PER_MINUTE", "20"))
+    config['RATE_LIMIT_BURST'] = float(os.getenv("RATE_LIMIT_BURST", "5"))
+
+    # Upstream protection: concurrent Gemini calls per worker, how long a request
+    # may wait for a free slot, and retries of transient provider errors
+    config['GEMINI_MAX_CONCURRENCY'] = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+    config['GEMINI_QUEUE_TIMEOUT'] = float(os.getenv("GEMINI_QUEUE_TIMEOUT", "5"))
+    config['GEMINI_RETRIES'] = int(os.getenv("GEMINI_RETRIES", "2"))
+    config['GEMINI_RETRY_BASE_DELAY'] = float(os.getenv("GEMINI_RETRY_BASE_DELAY", "0.5"))
+
+    # Tail latency: an answer must be complete within GEMINI_DEADLINE seconds.
+    # With GEMINI_HEDGE a second identical request is sent when the first is
+    # slower than the GEMINI_HEDGE_QUANTILE of recent calls (GEMINI_HEDGE_DELAY
+    # seconds until enough calls were seen). GEMINI_FALLBACK_MODEL, if set, is
+    # asked too when the primary model fails or only GEMINI_FALLBACK_RESERVE
+    # seconds are left. If no model answers, FAQ_FALLBACK answers with the
+    # closest FAQ entry instead of an error
+    config['GEMINI_DEADLINE'] = float(os.getenv("GEMINI_DEADLINE", "30"))
+    config['GEMINI_HEDGE'] = os.getenv("GEMINI_HEDGE", "false").lower() == "true"
+    config['GEMINI_HEDGE_DELAY'] = float(os.getenv("GEMINI_HEDGE_DELAY", "2"))
+    config['GEMINI_HEDGE_QUANTILE'] = float(os.getenv("GEMINI_HEDGE_QUANTILE", "0.95"))
+    config['GEMINI_FALLBACK_MODEL'] = os.getenv("GEMINI_FALLBACK_MODEL", "")
+    config['GEMINI_FALLBACK_RESERVE'] = float(os.getenv("GEMINI_FALLBACK_RESERVE", "10"))
+    config['FAQ_FALLBACK'] = os.getenv("FAQ_FALLBACK", "true").lower() == "true"
+
+    # Batch answering (/ask/batch and batch_ask.py): worker threads per batch
+    # and the most questions accepted in one /ask/batch request
+    config['BATCH_WORKERS'] = int(os.getenv("BATCH_WORKERS", "4"))
+    config['BATCH_MAX_QUESTIONS'] = int(os.getenv("BATCH_MAX_QUESTIONS", "1000"))
+
+    # Password hashing: scrypt cost parameters, hashing threads per worker and
+    # how many hashes may wait before logins are turned away
+    config['PASSWORD_SCRYPT_N'] = int(os.getenv("PASSWORD_SCRYPT_N", str(2 ** 14)))
+    config['PASSWORD_SCRYPT_R'] = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+    config['PASSWORD_SCRYPT_P'] = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+    config['PASSWORD_HASH_WORKERS'] = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+    # Write-behind persistence: /ask queues question/answer pairs and one
+    # thread per worker commits them in batches. MESSAGE_QUEUE_SIZE bounds the
+    # backlog; when it is full a request waits briefly, then writes directly.
+    config['MESSAGE_WRITE_BEHIND'] = os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() == "true"
+    config['MESSAGE_QUEUE_SIZE'] = int(os.getenv("MESSAGE_QUEUE_SIZE", "10000"))
+    config['MESSAGE_BATCH_SIZE'] = int(os.getenv("MESSAGE_BATCH_SIZE", "500"))
+    config['MESSAGE_FLUSH_INTERVAL'] = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.05"))
+
+    # HTTP caching: JSON responses of at least COMPRESS_MIN_SIZE bytes are
+    # compressed (brotli if installed, else gzip), and static files requested
+    # through their content-hashed URLs are cached for STATIC_MAX_AGE seconds
+    config['COMPRESS_RESPONSES'] = os.getenv("COMPRESS_RESPONSES", "true").lower() == "true"
+    config['COMPRESS_MIN_SIZE'] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    config['STATIC_MAX_AGE'] = int(os.getenv("STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+    # Database setup
+    config['DATABASE'] = os.getenv("DATABASE", "shamim_faq.db")
+
+    # archive_conversations.py moves conversations with no message for
+    # ARCHIVE_AFTER_DAYS days into compressed cold storage
+    config['ARCHIVE_AFTER_DAYS'] = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+
+    # GET /export streams every message to callers sending
+    # "Authorization: Bearer <EXPORT_TOKEN>", and is disabled when it is unset
+    config['EXPORT_TOKEN'] = os.getenv("EXPORT_TOKEN")
+    config['SQLITE_SYNCHRONOUS'] = os.getenv("SQLITE_SYNCHRONOUS")
+    config['SQLITE_CACHE_SIZE'] = os.getenv("SQLITE_CACHE_SIZE")
+    config['SQLITE_MMAP_SIZE'] = os.getenv("SQLITE_MMAP_SIZE")
+    return config
+
+class Services:
+    """Clients, caches and indexes shared by the requests of one app.
+
+    The cheap ones are built with the app. The knowledge base (numpy), the
+    password hasher (which computes a dummy hash), the Gemini models (which
+    import google.generativeai) and the database schema check are built on
+    first use, so starting a worker or importing the app for a CLI only
+    pays for what it touches.
+    """
 
-# Load environment variables
-load_dotenv()
-
-# Configure the Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-
-# Initialize Flask app
-app = Flask(__name__)
-app.secret_key = os.getenv("SECRET_KEY", secrets.token_hex(16))
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.Lock()
+        self._cache_version = (None, None)
+        self._password_hasher = None
+        self._db_ready = False
+
+        self.db_pool = ConnectionPool(config['DATABASE'], pragmas_from_config(config))
+
+        gemini_options = {'api_key': config.get('GEMINI_API_KEY')}
+        if config.get('GEMINI_TRANSPORT'):
+            gemini_options['transport'] = config['GEMINI_TRANSPORT']
+        if config.get('GEMINI_API_ENDPOINT'):
+            gemini_options['client_options'] = {'api_endpoint': config['GEMINI_API_ENDPOINT']}
+
+        self.model_registry = ModelRegistry(SAFETY_SETTINGS, gemini_options)
+        self.llm = create_llm_backend(config, self.model_registry, GEMINI_MODEL_NAME, GENERATION_CONFIG)
+
+        self.upstream = UpstreamLimiter(
+            max_concurrency=config['GEMINI_MAX_CONCURRENCY'],
+            queue_timeout=config['GEMINI_QUEUE_TIMEOUT'],
+            retries=config['GEMINI_RETRIES'],
+            base_delay=config['GEMINI_RETRY_BASE_DELAY'],
+            retryable=self.llm.retryable
+        )
+        self.llm_invoker = LLMInvoker(
+            self.llm, self.upstream, GEMINI_MODEL_NAME,
+            deadline=config['GEMINI_DEADLINE'],
+            hedge=config['GEMINI_HEDGE'],
+            hedge_delay=config['GEMINI_HEDGE_DELAY'],
+            hedge_quantile=config['GEMINI_HEDGE_QUANTILE'],
+            fallback_model=config['GEMINI_FALLBACK_MODEL'],
+            fallback_reserve=config['GEMINI_FALLBACK_RESERVE']
+        )
+
+        self.answer_cache = create_answer_cache(config)
+
+        # The static part of the prompts is compiled with each FAQ version,
+        # one set per language, so each request only looks it up and appends
+        # its question
+        self.knowledge_base = KnowledgeBaseStore(
+            config['FAQ_PATH'],
+            make_prompts=build_prompt_templates,
+            reload_interval=config['FAQ_RELOAD_INTERVAL'],
+            on_reload=self._faq_reloaded
+        )
+
+        # Coalesce identical in-flight questions into one upstream call
+        self.upstream_calls = create_single_flight(config)
+
+        self.conversation_memory = ConversationMemory(
+            token_budget=config['CONVERSATION_TOKEN_BUDGET'],
+            load_messages=config['CONVERSATION_LOAD_MESSAGES']
+        )
+        self.rate_limiter = create_rate_limiter(config, self)
+
+        self.message_writer = None
+        if config['MESSAGE_WRITE_BEHIND']:
+            self.message_writer = MessageWriter(
+                self.connection,
+                max_queue=config['MESSAGE_QUEUE_SIZE'],
+                batch_size=config['MESSAGE_BATCH_SIZE'],
+                flush_interval=config['MESSAGE_FLUSH_INTERVAL'],
+                on_written=self.conversation_memory.record
+            )
+            # Commit queued messages before the process exits
+            atexit.register(self.close)
+
+        self.static_versions = StaticVersions(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static'))
+
+    def answer_cache_version(self, knowledge_base):
+        """Cache version for answers built from a knowledge base.
+
+        Answers depend on the FAQ content, the model and how the context is
+        built, so a reloaded FAQ never serves answers cached for the old one.
+        """
+        faq_version, version = self._cache_version
+        if faq_version != knowledge_base.version:
+            version = context_version(
+                knowledge_base.version, GEMINI_MODEL_NAME, GENERATION_CONFIG,
+                self.config['FAQ_CONTEXT_MODE'], self.config['FAQ_TOP_K']
+            )
+            self._cache_version = (knowledge_base.version, version)
+        return version
+
+    def _faq_reloaded(self, previous, knowledge_base):
+        # Entries for the old version can no longer be hit, free their memory
+        if previous.version != knowledge_base.version:
+            self.answer_cache.clear()
+
+    @property
+    def password_hasher(self):
+        if self._password_hasher is None:
+            with self._lock:
+                if self._password_hasher is None:
+                    self._password_hasher = create_password_hasher(self.config)
+        return self._password_hasher
+
+    def close(self):
+        """Flush work still queued in the background, for shutdown"""
+        if self.message_writer is not None:
+            self.message_writer.close()
+
+    def ensure_schema(self):
+        """Migrate the database schema, once per app"""
+        if not self._db_ready:
+            with self._lock:
+                if not self._db_ready:
+                    init_db(self.config['DATABASE'], self.db_pool.pragmas)
+                    self._db_ready = True
+
+    def connection(self):
+        """Return this thread's pooled connection, migrating the schema once"""
+        self.ensure_schema()
+        return self.db_pool.connection()
+
+bp = Blueprint('faq', __name__)
+
+def create_app(config=None):
+    """Build the Flask app; config entries override the environment"""
+    app = Flask(__name__)
+    app.config.update(load_config())
+    if config:
+        app.config.update(config)
+
+    configure_logging('smart_faq', app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+    app.extensions['smart_faq'] = Services(app.config)
+    app.register_blueprint(bp)
+    return app
+
+def services():
+    """Return the current app's Services"""
+    return current_app.extensions['smart_faq']
 
-# Database setup
 def get_db_connection():
-    conn = sqlite3.connect('shamim_faq.db')
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db_connection()
-    
-    # Create users table
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
-    
-    # Create conversations table with user_id
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS conversations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        title TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
-    
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        conversation_id INTEGER NOT NULL,
-        is_user BOOLEAN NOT NULL,
-        content TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-# Initialize database
-init_db()
+    """Return the pooled connection for the current thread"""
+    return services().connection()
+
+@bp.teardown_app_request
+def release_db_connection(exception):
+    services().db_pool.release()
+
+@bp.app_url_defaults
+def add_static_version(endpoint, values):
+    """Put the file's content hash in static URLs, so they can be cached long"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        version = services().static_versions.get(values['filename'])
+        if version:
+            values['v'] = version
+
+@bp.after_app_request
+def cache_static_files(response):
+    # A URL carrying the current hash never changes content. Anything else
+    # (no hash, or one from an older page) is revalidated as usual
+    if request.endpoint == 'static' and response.status_code == 200:
+        version = request.args.get('v')
+        if version and version == services().static_versions.get(request.view_args['filename']):
+            response.cache_control.public = True
+            response.cache_control.max_age = current_app.config['STATIC_MAX_AGE']
+            response.cache_control.immutable = True
+            response.cache_control.no_cache = None
+    return response
+
+@bp.after_app_request
+def compress(response):
+    if current_app.config['COMPRESS_RESPONSES']:
+        compress_response(response, request.accept_encodings, current_app.config['COMPRESS_MIN_SIZE'])
+    return response
+
+def init_db(path, pragmas=None):
+    """Bring the database schema up to date"""
+    conn = connect(path, pragmas)
+    try:
+        migrate(conn)
+    finally:
+        conn.close()
 
 # Helper functions for authentication
 def hash_password(password):
     """Hash a password for storing."""
-    return hashlib.sha256(password.encode()).hexdigest()
+    return services().password_hasher.hash(password)
 
 def verify_password(stored_password, provided_password):
-    """Verify a stored password against one provided by user"""
-    return stored_password == hash_password(provided_password)
+    """Verify a stored password against one provided by user.
+
+    Returns (matches, needs_rehash); needs_rehash is set for legacy SHA-256
+    hashes and hashes made with old cost parameters.
+    """
+    return services().password_hasher.verify(stored_password, provided_password)
+
+def hasher_busy(template, retry_after):
+    """Re-render an auth form when too many password hashes are queued"""
+    flash('Too many login attempts right now, please try again in a moment')
+    return render_template(template), 503, {'Retry-After': str(retry_after)}
 
 def is_valid_email(email):
     """Check if email is valid"""
@@ -89,223 +399,73 @@ def is_logged_in():
     """Check if user is logged in"""
     return 'user_id' in session
 
-# FAQ data
-faq_data = """
-About Shamim
-Who is Shamim Md. Jony?
-Shamim Md. Jony is a passionate machine learning engineer and software developer from Chittagong, Bangladesh. With a strong academic background and hands-on experience in AI, he specializes in building scalable, real-world applications using modern ML and LLM technologies.
-
-What is your current position?
-I am currently working as a Software Engineer at Prachine Bangla Ecommerce Limited since November 2024.
-
-What are your responsibilities at Prachine Bangla Ecommerce Limited?
-My key responsibilities include:
-- Managing the main AWS Lightsail server infrastructure.
-- Developing and scaling e-commerce solutions to support high traffic and large product catalogs.
-- Integrating AI-powered chatbots to enhance customer support and engagement.
-- Collaborating on API development and third-party service integrations such as payment gateways, shipping, and more.
-
-How do you handle the server infrastructure for Prachine Bangla Ecommerce Limited?
-I am responsible for managing the main AWS Lightsail server, ensuring its smooth operation and scalability to accommodate a large e-commerce platform.
-
-What kind of e-commerce solutions do you develop and scale?
-I work on developing solutions that support high traffic, optimize the browsing experience, and scale the system to manage a large product catalog effectively.
-
-What role do AI-powered chatbots play in your work?
-I integrate AI-powered chatbots into our platform to improve customer support, automate responses, and enhance engagement with users.
-
-Do you work with third-party services?
-Yes, I collaborate on API development and integrate third-party services such as payment gateways and shipping solutions into the e-commerce platform.
-
-What industries or domains has he worked in?
-Shamim has worked primarily in the e-commerce industry, with strong contributions to:
-- AI-enhanced online shopping experiences
-- Chatbot integrations
-- Sentiment analysis in the airline industry
-- Hate speech detection in Bangla language content
-
-What real-world AI applications has he built?
-- Smart FAQ Chatbot: Uses LangChain and LLMs to answer user queries intelligently.
-- E-commerce Assistant: AI system to help customers find products faster and improve UX.
-- Sentiment Classifier: Applied deep learning to analyze customer sentiments about airlines.
-- Hate Speech Detector: Identifies offensive language in Bangla using ML/NLP techniques.
-
-What experience does he have with cloud services?
-He is skilled in deploying and managing models and services on cloud platforms, especially:
-- AWS Lightsail: Server management for high-traffic eCommerce.
-- Google Cloud: Used for ML model hosting and experimentation.
-
-What tools and frameworks is he comfortable with?
-- LangChain, Hugging Face, PyTorch, TensorFlow
-- Flask, FastAPI (for APIs and ML model serving)
-- Laravel & PHP (for backend systems)
-- MongoDB, MySQL, SQLite (for data management)
-
-Professional Experience
-What is his role at Prachine Bangla Ecommerce Ltd.?
-As a Software Engineer, Shamim is:
-- Maintaining and scaling AWS-based eCommerce infrastructure
-- Creating AI-powered features like chatbots
-- Integrating APIs for payment, shipping, etc.
-- Leading tech improvements for better performance and UX
-
-What kind of opportunities is he seeking?
-He is actively looking for challenging projects or remote roles focused on:
-- Large Language Models (LLMs)
-- Advanced machine learning applications
-- AI innovation in real-world products
-
-Qualifications
-What makes Shamim a strong candidate for ML roles?
-- Strong academic foundation (CGPA 3.88 in BSc)
-- Real-world deployment experience
-- Demonstrated success in both backend and AI development
-- Certification from DeepLearning.AI, a leader in ML education
-
-What's unique about his AI approach?
-Shamim blends practical deployment skills with theoretical understanding. He's not just focused on building models, but also on ensuring they work in production and deliver real business value.
-
-Where can I see his work or contributions?
-- GitHub: github.com/shamimjony1000
-- LinkedIn: linkedin.com/in/shamim-jony
-
-Location
-ADDRESS:
-Khulshi-1, Chittagong, Bangladesh
-
-Contact
-How can I contact Shamim for professional opportunities?
-You can reach out to Shamim through his LinkedIn profile at linkedin.com/in/shamim-jony or via email. He is open to discussing remote work opportunities, consulting projects, and collaborations in the field of machine learning and AI development.
-
-শামীম মো. জনি কে?
-শামীম মো. জনি চট্টগ্রাম, বাংলাদেশের একজন উদ্যমী মেশিন লার্নিং প্রকৌশলী এবং সফটওয়্যার ডেভেলপার। কৃত্রিম বুদ্ধিমত্তায় একটি শক্তিশালী একাডেমিক পটভূমি এবং বাস্তব অভিজ্ঞতা নিয়ে, তিনি আধুনিক এমএল এবং এলএলএম প্রযুক্তি ব্যবহার করে স্কেলেবল, বাস্তব-বিশ্বের অ্যাপ্লিকেশন তৈরিতে বিশেষজ্ঞ।
-
-আপনার বর্তমান পদ কি?
-আমি বর্তমানে ২০২৪ সালের নভেম্বর মাস থেকে প্রাচীনে বাংলা ই-কমার্স লিমিটেডে সফটওয়্যার প্রকৌশলী হিসেবে কর্মরত আছি।
-
-প্রাচীনে বাংলা ই-কমার্স লিমিটেডে আপনার দায়িত্বগুলো কী কী?
-আমার প্রধান দায়িত্বগুলোর মধ্যে রয়েছে:
-
-প্রধান AWS লাইটসেল সার্ভার অবকাঠামো পরিচালনা করা।
-উচ্চ ট্র্যাফিক এবং বৃহৎ পণ্য ক্যাটালগ সমর্থন করার জন্য ই-কমার্স সলিউশন তৈরি এবং স্কেল করা।
-গ্রাহক সহায়তা এবং সম্পৃক্ততা বাড়াতে এআই-চালিত চ্যাটবট সংহত করা।
-API ডেভেলপমেন্ট এবং তৃতীয় পক্ষের পরিষেবা যেমন পেমেন্ট গেটওয়ে, শিপিং এবং আরও অনেক কিছুর সাথে সহযোগিতা করা।
-আপনি প্রাচীনে বাংলা ই-কমার্স লিমিটেডের জন্য সার্ভার অবকাঠামো কীভাবে সামলান?
-আমি প্রধান AWS লাইটসেল সার্ভার পরিচালনার জন্য দায়ী, যা একটি বৃহৎ ই-কমার্স প্ল্যাটফর্মের মসৃণ পরিচালনা এবং স্কেলেবিলিটি নিশ্চিত করে।
-
-আপনি কী ধরনের ই-কমার্স সলিউশন তৈরি এবং স্কেল করেন?
-আমি এমন সলিউশন তৈরিতে কাজ করি যা উচ্চ ট্র্যাফিক সমর্থন করে, ব্রাউজিংয়ের অভিজ্ঞতা অপ্টিমাইজ করে এবং কার্যকরভাবে একটি বৃহৎ পণ্য ক্যাটালগ পরিচালনা করার জন্য সিস্টেমকে স্কেল করে।
-
-আপনার কাজে এআই-চালিত চ্যাটবট কী ভূমিকা পালন করে?
-গ্রাহক সহায়তা উন্নত করতে, স্বয়ংক্রিয় প্রতিক্রিয়া জানাতে এবং ব্যবহারকারীদের সাথে সম্পৃক্ততা বাড়াতে আমি আমাদের প্ল্যাটফর্মে এআই-চালিত চ্যাটবট সংহত করি।
-
-আপনি কি তৃতীয় পক্ষের পরিষেবাগুলির সাথে কাজ করেন?
-হ্যাঁ, আমি API ডেভেলপমেন্টে সহযোগিতা করি এবং পেমেন্ট গেটওয়ে এবং শিপিং সলিউশনের মতো তৃতীয় পক্ষের পরিষেবাগুলিকে ই-কমার্স প্ল্যাটফর্মে সংহত করি।
-
-তিনি কোন শিল্প বা ডোমেইনগুলিতে কাজ করেছেন?
-শামীম প্রাথমিকভাবে ই-কমার্স শিল্পে কাজ করেছেন, যেখানে তার শক্তিশালী অবদান রয়েছে:
-
-এআই-বর্ধিত অনলাইন শপিং অভিজ্ঞতা
-চ্যাটবট ইন্টিগ্রেশন
-এয়ারলাইন শিল্পে সেন্টিমেন্ট বিশ্লেষণ
-বাংলা ভাষার সামগ্রীতে বিদ্বেষপূর্ণ বক্তব্য সনাক্তকরণ
-তিনি বাস্তব-বিশ্বে কী কী এআই অ্যাপ্লিকেশন তৈরি করেছেন?
-
-স্মার্ট FAQ চ্যাটবট: ব্যবহারকারীর প্রশ্নের বুদ্ধিদীপ্ত উত্তর দিতে ল্যাংচেইন এবং এলএলএম ব্যবহার করে।
-ই-কমার্স সহকারী: গ্রাহকদের দ্রুত পণ্য খুঁজে পেতে এবং UX উন্নত করতে সাহায্য করার জন্য এআই সিস্টেম।
-সেন্টিমেন্ট ক্লাসিফায়ার: এয়ারলাইনস সম্পর্কে গ্রাহকের অনুভূতি বিশ্লেষণ করতে ডিপ লার্নিং প্রয়োগ করা হয়েছে।
-বিদ্বেষপূর্ণ বক্তব্য সনাক্তকারী: ML/NLP কৌশল ব্যবহার করে বাংলা ভাষায় আপত্তিকর ভাষা চিহ্নিত করে।
-ক্লাউড পরিষেবাগুলির সাথে তার কী অভিজ্ঞতা আছে?
-তিনি ক্লাউড প্ল্যাটফর্মে, বিশেষ করে মডেল এবং পরিষেবা স্থাপন এবং পরিচালনার ক্ষেত্রে দক্ষ:
-
-AWS লাইটসেল: উচ্চ-ট্র্যাফিক ই-কমার্সের জন্য সার্ভার ব্যবস্থাপনা।
-গুগল ক্লাউড: ML মডেল হোস্টিং এবং পরীক্ষণের জন্য ব্যবহৃত।
-তিনি কোন সরঞ্জাম এবং ফ্রেমওয়ার্কের সাথে স্বাচ্ছন্দ্যবোধ করেন?
-
-ল্যাংচেইন, হাগিং ফেস, পাইটর্চ, টেনসরফ্লো
-ফ্লাস্ক, ফাস্টএপিআই (API এবং ML মডেল পরিবেশনের জন্য)
-লারাভেল ও পিএইচপি (ব্যাকেন্ড সিস্টেমের জন্য)
-মঙ্গোডিবি, মাইএসকিউএল, এসকিউলাইট (ডেটা ব্যবস্থাপনার জন্য)
-পেশাগত অভিজ্ঞতা
-
-প্রাচীনে বাংলা ই-কমার্স লিমিটেডে তার ভূমিকা কী?
-সফটওয়্যার প্রকৌশলী হিসেবে, শামীম:
-
-AWS-ভিত্তিক ই-কমার্স অবকাঠামোর রক্ষণাবেক্ষণ ও স্কেলিং করছেন
-চ্যাটবটের মতো এআই-চালিত বৈশিষ্ট্য তৈরি করছেন
-পেমেন্ট, শিপিং ইত্যাদির জন্য API সংহত করছেন
-উন্নত কর্মক্ষমতা এবং UX-এর জন্য প্রযুক্তিগত উন্নতির নেতৃত্ব দিচ্ছেন
-তিনি কী ধরনের সুযোগ খুঁজছেন?
-তিনি সক্রিয়ভাবে চ্যালেঞ্জিং প্রকল্প বা দূরবর্তী ভূমিকা খুঁজছেন যা মূলত:
-
-বৃহৎ ভাষা মডেল (LLMs)
-উন্নত মেশিন লার্নিং অ্যাপ্লিকেশন
-বাস্তব-বিশ্বের পণ্যগুলিতে এআই উদ্ভাবনের উপর দৃষ্টি নিবদ্ধ করে।
-যোগ্যতা
-
-কী কারণে শামীম এমএল ভূমিকার জন্য একজন শক্তিশালী প্রার্থী?
-
-শক্তিশালী একাডেমিক ভিত্তি (বিএসসি-তে ৩.৮৮ সিজিপিএ)
-বাস্তব-বিশ্বে স্থাপনার অভিজ্ঞতা
-ব্যাকেন্ড এবং এআই ডেভেলপমেন্ট উভয় ক্ষেত্রেই প্রমাণিত সাফল্য
-ডিপলার্নিং.এআই, এমএল শিক্ষার একটি শীর্ষস্থানীয় প্রতিষ্ঠান থেকে সার্টিফিকেশন
-তার এআই পদ্ধতির অনন্যতা কী?
-শামীম তাত্ত্বিক বোঝার সাথে ব্যবহারিক স্থাপনার দক্ষতার মিশ্রণ ঘটান। তিনি কেবল মডেল তৈরি করার উপরই মনোযোগ দেন না, বরং সেগুলি যাতে উৎপাদনে কাজ করে এবং প্রকৃত ব্যবসায়িক মূল্য সরবরাহ করে তাও নিশ্চিত করেন।
-
-আমি তার কাজ বা অবদান কোথায় দেখতে পারি?
-
-GitHub: github.com/shamimjony1000
-LinkedIn: linkedin.com/in/shamim-jony
-অবস্থান
-
-ঠিকানা:
-খুলশী-১, চট্টগ্রাম, বাংলাদেশ
-
-যোগাযোগ
-
-পেশাদার সুযোগের জন্য আমি কীভাবে শামীমের সাথে যোগাযোগ করতে পারি?
-আপনি তার লিঙ্কডইন প্রোফাইলের মাধ্যমে linkedin.com/in/shamim-jony অথবা ইমেলের মাধ্যমে শামীমের সাথে যোগাযোগ করতে পারেন। তিনি দূরবর্তী কাজের সুযোগ, কনসাল্টিং প্রকল্প এবং মেশিন লার্নিং ও এআই ডেভেলপমেন্টের ক্ষেত্রে সহযোগিতার বিষয়ে আলোচনা করতে আগ্রহী।
-"""
-
-# Function to get response from Gemini
-def get_gemini_response(question):
-    # Configure the model
-    generation_config = {
-        "temperature": 0.2,
-        "top_p": 0.8,
-        "top_k": 40,
-        "max_output_tokens": 1024,
-    }
+# FAQ knowledge base
+def get_knowledge_base():
+    """Return the knowledge base for the current request.
+
+    It is pinned on first use, so a request that spans a reload answers
+    entirely from the version it started with.
+    """
+    if 'knowledge_base' not in g:
+        g.knowledge_base = services().knowledge_base.current()
+    return g.knowledge_base
+
+def route_question(question):
+    """Return (language, corpora) for a question.
+
+    language is the one to answer in and the only one whose FAQ entries go
+    into the prompt. A mixed-language question is answered in the language
+    most of its words are in, but both corpora are searched, since e.g. an
+    English framework name in a Bengali question may only match English
+    entries. Those hits are swapped for their Bengali translations.
+    """
+    language = detect_language(question)
+    if language == 'mixed':
+        return reply_language(question), ('en', 'bn')
+    return language, (language,)
+
+def build_faq_context(question, language, corpora=None):
+    """Return the FAQ text to include in the prompt for a question"""
+    knowledge_base = get_knowledge_base()
+    if current_app.config['FAQ_CONTEXT_MODE'] != 'retrieval':
+        return knowledge_base.texts[language]
+    
+    matches = knowledge_base.search(question, language, current_app.config['FAQ_TOP_K'], corpora)
+    if not matches:
+        # Nothing matched lexically, let the model see everything
+        return knowledge_base.texts[language]
     
-    safety_settings = [
-        {
-            "category": "HARM_CATEGORY_HARASSMENT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-        },
-        {
-            "category": "HARM_CATEGORY_HATE_SPEECH",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-        },
-        {
-            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-        },
-        {
-            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-        }
-    ]
-    
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash",
-        generation_config=generation_config,
-        safety_settings=safety_settings
-    )
-    
-    # Check if the question is in Bengali (contains Bengali Unicode characters)
-    is_bengali = any('\u0980' <= c <= '\u09FF' for c in question)
-    
-    prompt = f"""
+    return format_entries(record for record, score in matches)
+
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
+
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "top_p": 0.8,
+    "top_k": 40,
+    "max_output_tokens": 1024,
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
+
+PROMPT_INSTRUCTIONS = """
     You are a helpful customer service assistant for Shamim Md. Jony, a machine learning engineer and software developer.
 
     Answer the following questions based on the FAQ information provided below.
@@ -315,23 +475,268 @@ def get_gemini_response(question):
     If the question is not directly addressed, but related to his skills or services, use the FAQ context to provide the most relevant response.
 
     If the question is unrelated to Shamim Md. Jony's professional profile (such as topics outside AI, software development, LLMs, etc.), politely inform the user that you can only answer questions related to Shamim Md. Jony's services and experience.
+    """
+
+# Only the FAQ entries in the answer's language are included, so the
+# model is told which language to use instead of finding the translation
+PROMPT_LANGUAGE_INSTRUCTIONS = {
+    'en': """
+    Answer in English.
     
-    IMPORTANT: If the user's question is in Bengali, you MUST respond in Bengali. Look for the Bengali translations in the FAQ data and use those for your response.
+    FAQ INFORMATION:
+    """,
+    'bn': """
+    IMPORTANT: You MUST respond in Bengali, even if the question contains some English words. Technical terms and names may stay in English.
     
     FAQ INFORMATION:
-    {faq_data}
+    """,
+}
+
+PROMPT_HISTORY_LABEL = """
     
-    USER QUESTION: {question}
+    CONVERSATION SO FAR:
     """
+
+PROMPT_QUESTION_LABEL = """
     
+    USER QUESTION: """
+
+PROMPT_SUFFIX = """
+    """
+
+def build_prompt_templates(language, faq_text):
+    """Precompile the full-context and retrieval prompts for one language"""
+    instructions = PROMPT_INSTRUCTIONS + PROMPT_LANGUAGE_INSTRUCTIONS[language]
+    return {
+        'full': PromptTemplate(instructions + faq_text, PROMPT_QUESTION_LABEL, PROMPT_SUFFIX, PROMPT_HISTORY_LABEL),
+        'retrieval': PromptTemplate(instructions, PROMPT_QUESTION_LABEL, PROMPT_SUFFIX, PROMPT_HISTORY_LABEL),
+    }
+
+def build_prompt(question, history=''):
+    """Build the Gemini prompt for a question and its conversation history"""
+    knowledge_base = get_knowledge_base()
+    language, corpora = route_question(question)
+    prompts = knowledge_base.prompts[language]
+    if current_app.config['FAQ_CONTEXT_MODE'] != 'retrieval':
+        return prompts['full'].render(question, history=history)
+    
+    context = build_faq_context(question, language, corpora)
+    if context is knowledge_base.texts[language]:
+        return prompts['full'].render(question, history=history)
+    return prompts['retrieval'].render(question, context, history)
+
+def get_gemini_model():
+    """Return the configured Gemini model"""
+    return services().model_registry.get_model(GEMINI_MODEL_NAME, GENERATION_CONFIG)
+
+def llm_source(model_name):
+    """Answer source for a model: "llm", or "llm_fallback" for the fallback model"""
+    return 'llm' if model_name == GEMINI_MODEL_NAME else 'llm_fallback'
+
+# Function to get response from Gemini (or the backend set by LLM_BACKEND)
+def get_gemini_response(question, history=''):
+    """Return (answer, source) from the model, raising LLMError if none answered"""
+    with metrics.stage('prompt_build'):
+        prompt = build_prompt(question, history)
+    metrics.PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    
+    with metrics.stage('gemini'):
+        text, model_name = services().llm_invoker.generate(prompt)
+    metrics.RESPONSE_TOKENS.observe(estimate_tokens(text))
+    return text, llm_source(model_name)
+
+def stream_gemini_response(question, history=''):
+    """Yield (chunk, source) pairs of the model's answer to a question"""
+    with metrics.stage('prompt_build'):
+        prompt = build_prompt(question, history)
+    metrics.PROMPT_TOKENS.observe(estimate_tokens(prompt))
+    
+    chunks = services().llm_invoker.stream(prompt)
+    with metrics.stage('gemini'):
+        with metrics.stage('gemini_first_chunk'):
+            text, model_name = next(chunks, ('', GEMINI_MODEL_NAME))
+        source = llm_source(model_name)
+        response_chars = len(text)
+        yield text, source
+        for text, _ in chunks:
+            response_chars += len(text)
+            yield text, source
+    metrics.RESPONSE_TOKENS.observe(response_chars // 4)
+
+# How long a read waits for its conversation's queued messages to commit
+MESSAGE_READ_TIMEOUT = 5
+
+def wait_for_messages(conversation_id):
+    """Make messages queued for a conversation visible before reading it"""
+    message_writer = services().message_writer
+    if message_writer is not None and not message_writer.wait(conversation_id, MESSAGE_READ_TIMEOUT):
+        log_event(logger, logging.WARNING, 'messages_still_queued', conversation_id=conversation_id)
+
+def restore_if_archived(conn, conversation):
+    """Move an archived conversation's messages back before they are read"""
+    if not conversation['archived']:
+        return False
+    restored = restore_conversation(conn, conversation['id'])
+    log_event(logger, logging.INFO, 'conversation_restored', conversation_id=conversation['id'], messages=restored)
+    return True
+
+def get_conversation_history(user_id, conversation_id, question):
+    """Return the prompt history for a question in one of the user's conversations.
+
+    Empty unless the question is a follow-up: a standalone question gets
+    the same prompt, and so can share cached answers, in any conversation.
+    """
+    if not current_app.config['CONVERSATION_MEMORY'] or not conversation_id or not is_follow_up(question):
+        return ''
     try:
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        return f"An error occurred: {str(e)}"
+        conversation_id = int(conversation_id)
+    except (TypeError, ValueError):
+        return ''
+    
+    conn = get_db_connection()
+    conversation = conn.execute('SELECT id, archived FROM conversations WHERE id = ? AND user_id = ?', 
+                              (conversation_id, user_id)).fetchone()
+    if not conversation:
+        return ''
+    restore_if_archived(conn, conversation)
+    wait_for_messages(conversation_id)
+    return services().conversation_memory.history(conn, conversation_id)
+
+def answer_version(history):
+    """Version of a question's answer: the FAQ and prompt version, plus the
+    history for a follow-up, whose answer only holds in that conversation"""
+    version = services().answer_cache_version(get_knowledge_base())
+    if not history:
+        return version
+    return context_version(version, history)
+
+def match_faq(question):
+    """Return the stored FAQ answer if the question confidently matches one"""
+    if not current_app.config['FAST_PATH_ENABLED']:
+        return None
+    
+    language = detect_language(question)
+    if language == 'mixed':
+        # A stored answer is in one language, and lexical confidence across
+        # two scripts isn't meaningful, so let the model answer these
+        return None
+    
+    record, confidence = get_knowledge_base().corpora[language].match(question)
+    if record and confidence >= current_app.config['FAST_PATH_THRESHOLD']:
+        return record['answer']
+    return None
+
+def faq_fallback(question):
+    """The closest FAQ answer however weak the match, for when no model answered"""
+    if not current_app.config['FAQ_FALLBACK']:
+        return None
+    language, corpora = route_question(question)
+    matches = get_knowledge_base().search(question, language, 1, corpora)
+    return matches[0][0]['answer'] if matches else None
+
+def answer_question(question, history='', charge=None):
+    """Answer a question and report which path served it.
+
+    Returns (answer, source) where source is "faq" for the local fast path,
+    "cache" for a cached answer, "llm" for a Gemini call, "llm_fallback" for
+    the fallback model and "faq_fallback" for the closest FAQ entry when no
+    model answered in time. Raises LLMError if there was no answer at all.
+    charge, if given, is called once the fast path and the cache missed,
+    before asking the model, and may raise to refuse the question.
+    """
+    with metrics.stage('fast_path'):
+        answer = match_faq(question)
+    if answer is not None:
+        return answer, 'faq'
+    
+    answer_cache = services().answer_cache
+    version = answer_version(history)
+    # A follow-up's answer depends on its conversation and is practically
+    # never asked again, so only standalone answers are cached
+    if not history:
+        with metrics.stage('cache'):
+            answer = answer_cache.get(question, version)
+        if answer is not None:
+            return answer, 'cache'
+    
+    if charge is not None:
+        charge()
+    key = (normalize_question(question), version)
+    try:
+        answer, source = services().upstream_calls.do(key, lambda: get_gemini_response(question, history))
+    except LLMError:
+        answer = faq_fallback(question)
+        if answer is None:
+            raise
+        return answer, 'faq_fallback'
+    # Fallback answers aren't cached, so the next ask tries the primary model
+    if source == 'llm' and not history:
+        answer_cache.set(question, version, answer)
+    return answer, source
+
+# How many times a batch question waits out a full upstream before failing
+BATCH_BUSY_RETRIES = 5
+
+def create_batch_runner(app=None, user_id=None):
+    """Return a BatchRunner answering through answer_question.
+
+    Must be called with an app context. Every question of the batch is
+    answered from the knowledge base version current at this call, each
+    in its own app context on a worker thread. With a user_id, each
+    distinct question that misses the fast path and the cache takes one
+    of that user's rate limit tokens. Once one is refused, the batch's
+    remaining model questions are not asked and get a "rate_limited"
+    error instead.
+    """
+    app = app or current_app._get_current_object()
+    knowledge_base = get_knowledge_base()
+    rate_limiter = services().rate_limiter
+    # retry_after of the first refused question, once the bucket ran dry
+    exhausted = []
+    
+    def answer_one(question):
+        charged = False
+        
+        def charge():
+            nonlocal charged
+            # Waiting out a busy upstream doesn't cost another token
+            if user_id is None or charged:
+                return
+            if exhausted:
+                raise RateLimited(exhausted[0])
+            allowed, retry_after = rate_limiter.acquire(user_id)
+            if not allowed:
+                exhausted.append(retry_after)
+                raise RateLimited(retry_after)
+            charged = True
+        
+        with app.app_context():
+            g.knowledge_base = knowledge_base
+            for attempt in range(BATCH_BUSY_RETRIES + 1):
+                metrics.start_request()
+                try:
+                    answer, source = answer_question(question, charge=charge)
+                    break
+                except RateLimited as e:
+                    metrics.finish_request('ask_batch', 'rate_limited')
+                    return {'error': str(e), 'code': 'rate_limited',
+                            'retry_after': int(retry_after_header(e.retry_after))}
+                except UpstreamBusy as e:
+                    metrics.finish_request('ask_batch', 'upstream_busy')
+                    # Offline batches can wait for a free slot instead of failing
+                    if attempt == BATCH_BUSY_RETRIES:
+                        raise
+                    time.sleep(e.retry_after)
+                except LLMError as e:
+                    metrics.finish_request('ask_batch', e.code)
+                    raise
+            metrics.finish_request('ask_batch', source)
+        return {'answer': answer, 'source': source}
+    
+    return BatchRunner(answer_one, workers=app.config['BATCH_WORKERS'])
 
 # Authentication routes
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form['username']
@@ -339,18 +744,31 @@ def login():
         
         conn = get_db_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
         
-        if user and verify_password(user['password_hash'], password):
+        try:
+            # Unknown users are checked against a dummy hash so both cases take as long
+            matches, needs_rehash = verify_password(user['password_hash'] if user else None, password)
+        except HasherBusy as e:
+            return hasher_busy('login.html', e.retry_after)
+        
+        if user and matches:
+            if needs_rehash:
+                # Upgrade the stored hash while we have the plaintext
+                try:
+                    conn.execute('UPDATE users SET password_hash = ? WHERE id = ?',
+                                (hash_password(password), user['id']))
+                    conn.commit()
+                except HasherBusy:
+                    pass
             session['user_id'] = user['id']
             session['username'] = user['username']
-            return redirect(url_for('index'))
+            return redirect(url_for('faq.index'))
         else:
             flash('Invalid username or password')
     
     return render_template('login.html')
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
         username = request.form['username']
@@ -385,101 +803,224 @@ def signup():
                                     (username, email)).fetchone()
         
         if existing_user:
-            conn.close()
             flash('Username or email already exists')
             return render_template('signup.html')
         
         # Create new user
-        password_hash = hash_password(password)
+        try:
+            password_hash = hash_password(password)
+        except HasherBusy as e:
+            return hasher_busy('signup.html', e.retry_after)
         conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
                     (username, email, password_hash))
         conn.commit()
         
         # Get the user ID for the session
         user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-        conn.close()
         
         if user:
             session['user_id'] = user['id']
             session['username'] = username
-            return redirect(url_for('index'))
+            return redirect(url_for('faq.index'))
         else:
             flash('An error occurred during registration')
     
     return render_template('signup.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 def logout():
     session.pop('user_id', None)
     session.pop('username', None)
-    return redirect(url_for('login'))
+    return redirect(url_for('faq.login'))
 
 # Main routes
-@app.route('/')
+@bp.route('/')
 def index():
     if not is_logged_in():
-        return redirect(url_for('login'))
+        return redirect(url_for('faq.login'))
     # Ensure username is available in the template
     username = session.get('username', 'User')
     return render_template('index.html', username=username)
 
-@app.route('/conversations', methods=['GET'])
+# Page sizes for the history endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+def get_page_args():
+    """Read the ?before=<id>&limit=N keyset pagination arguments"""
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    return before, max(1, min(limit, MAX_PAGE_SIZE))
+
+def stream_json_items(rows, serialize, limit):
+    """Yield a JSON array of up to limit rows, one item at a time.
+
+    The query fetches limit + 1 rows; the extra one only tells whether
+    another page exists. Returns the id of the last row sent as the cursor
+    for the next page, or None when this is the last page.
+    """
+    yield '['
+    last_id = None
+    has_more = False
+    for count, row in enumerate(rows):
+        if count == limit:
+            has_more = True
+            break
+        if count:
+            yield ','
+        yield json.dumps(serialize(row))
+        last_id = row['id']
+    yield ']'
+    return last_id if has_more else None
+
+def not_modified(etag):
+    """Return a 304 if the client already has this version, else None"""
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        return set_revalidate_headers(response, etag)
+    return None
+
+def set_revalidate_headers(response, etag):
+    """Let the browser keep the response but check its ETag before reuse"""
+    # Weak, since the body is the same whether or not it was compressed
+    response.set_etag(etag, weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def serialize_conversation(conversation):
+    return {
+        'id': conversation['id'],
+        'title': conversation['title'],
+        'created_at': conversation['created_at']
+    }
+
+def serialize_message(message):
+    return {
+        'id': message['id'],
+        'is_user': bool(message['is_user']),
+        'content': message['content'],
+        'created_at': message['created_at']
+    }
+
+@bp.route('/conversations', methods=['GET'])
 def get_conversations():
     if not is_logged_in():
         return jsonify({'error': 'Not logged in'}), 401
     
     user_id = session['user_id']
+    before, limit = get_page_args()
     conn = get_db_connection()
-    conversations = conn.execute('SELECT * FROM conversations WHERE user_id = ? ORDER BY created_at DESC', 
-                               (user_id,)).fetchall()
-    conn.close()
     
-    result = []
-    for conversation in conversations:
-        result.append({
-            'id': conversation['id'],
-            'title': conversation['title'],
-            'created_at': conversation['created_at']
-        })
+    # The list only changes when conversations_version does, so a client
+    # holding the current version is answered without listing anything
+    version = conn.execute('SELECT conversations_version FROM users WHERE id = ?', (user_id,)).fetchone()
+    etag = f"u{user_id}-{version['conversations_version'] if version else 0}"
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    
+    # Newest first; the cursor is the id of the last conversation already seen
+    if before is None:
+        conversations = conn.execute('SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+                                     'ORDER BY created_at DESC, id DESC LIMIT ?', 
+                                   (user_id, limit + 1))
+    else:
+        conversations = conn.execute('SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+                                     'AND (created_at, id) < (SELECT created_at, id FROM conversations WHERE id = ? AND user_id = ?) '
+                                     'ORDER BY created_at DESC, id DESC LIMIT ?', 
+                                   (user_id, before, user_id, limit + 1))
+    
+    def generate():
+        yield '{"conversations": '
+        next_before = yield from stream_json_items(conversations, serialize_conversation, limit)
+        yield f', "next_before": {json.dumps(next_before)}}}'
     
-    return jsonify(result)
+    return set_revalidate_headers(Response(generate(), mimetype='application/json'), etag)
 
-@app.route('/conversation/<int:conversation_id>', methods=['GET'])
+@bp.route('/conversation/<int:conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
     if not is_logged_in():
         return jsonify({'error': 'Not logged in'}), 401
     
     user_id = session['user_id']
+    before, limit = get_page_args()
     conn = get_db_connection()
     conversation = conn.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?', 
                               (conversation_id, user_id)).fetchone()
     
     if not conversation:
-        conn.close()
         return jsonify({'error': 'Conversation not found'}), 404
     
-    messages = conn.execute('SELECT * FROM messages WHERE conversation_id = ? ORDER BY created_at', 
-                          (conversation_id,)).fetchall()
-    conn.close()
+    # Only for the owner: commit queued messages, so the version below
+    # includes them
+    wait_for_messages(conversation_id)
+    restore_if_archived(conn, conversation)
+    # Both may have changed the version
+    conversation = conn.execute('SELECT * FROM conversations WHERE id = ?', (conversation_id,)).fetchone()
     
-    result = {
-        'id': conversation['id'],
-        'title': conversation['title'],
-        'created_at': conversation['created_at'],
-        'messages': []
+    etag = f"c{conversation_id}-{conversation['version']}"
+    response = not_modified(etag)
+    if response is not None:
+        return response
+    
+    # Take the newest page (or the page older than the cursor) and return it
+    # oldest first, so the client can prepend older pages as the user scrolls up
+    if before is None:
+        messages = conn.execute('SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+                                'ORDER BY created_at DESC, id DESC LIMIT ?', 
+                              (conversation_id, limit + 1)).fetchall()
+    else:
+        messages = conn.execute('SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+                                'AND (created_at, id) < (SELECT created_at, id FROM messages WHERE id = ? AND conversation_id = ?) '
+                                'ORDER BY created_at DESC, id DESC LIMIT ?', 
+                              (conversation_id, before, conversation_id, limit + 1)).fetchall()
+    
+    has_more = len(messages) > limit
+    page = messages[:limit][::-1]
+    next_before = page[0]['id'] if has_more else None
+    
+    def generate():
+        header = serialize_conversation(conversation)
+        yield json.dumps(header)[:-1] + ', "messages": '
+        yield from stream_json_items(page, serialize_message, limit)
+        yield f', "has_more": {json.dumps(has_more)}, "next_before": {json.dumps(next_before)}}}'
+    
+    return set_revalidate_headers(Response(generate(), mimetype='application/json'), etag)
+
+def serialize_search_result(row):
+    return {
+        'id': row['id'],
+        'conversation_id': row['conversation_id'],
+        'conversation_title': row['title'],
+        'is_user': bool(row['is_user']),
+        'snippet': row['snippet'],
+        'created_at': row['created_at']
     }
+
+@bp.route('/search', methods=['GET'])
+def search():
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'No search query provided'}), 400
+    
+    # Results are ranked by relevance, not time, so pages are by offset
+    _, limit = get_page_args()
+    offset = max(0, request.args.get('offset', 0, type=int))
+    rows = search_messages(get_db_connection(), session['user_id'], text, limit + 1, offset)
     
-    for message in messages:
-        result['messages'].append({
-            'id': message['id'],
-            'is_user': bool(message['is_user']),
-            'content': message['content'],
-            'created_at': message['created_at']
-        })
+    def generate():
+        yield '{"results": '
+        next_id = yield from stream_json_items(rows, serialize_search_result, limit)
+        next_offset = offset + limit if next_id is not None else None
+        yield f', "next_offset": {json.dumps(next_offset)}}}'
     
-    return jsonify(result)
+    return Response(generate(), mimetype='application/json')
 
-@app.route('/conversation', methods=['POST'])
+@bp.route('/conversation', methods=['POST'])
 def create_conversation():
     if not is_logged_in():
         return jsonify({'error': 'Not logged in'}), 401
@@ -494,11 +1035,10 @@ def create_conversation():
     cursor.execute('INSERT INTO conversations (user_id, title) VALUES (?, ?)', (user_id, title))
     conversation_id = cursor.lastrowid
     conn.commit()
-    conn.close()
     
     return jsonify({'id': conversation_id, 'title': title})
 
-@app.route('/conversation/<int:conversation_id>/title', methods=['PUT'])
+@bp.route('/conversation/<int:conversation_id>/title', methods=['PUT'])
 def update_conversation_title(conversation_id):
     if not is_logged_in():
         return jsonify({'error': 'Not logged in'}), 401
@@ -517,82 +1057,356 @@ def update_conversation_title(conversation_id):
                              (conversation_id, user_id)).fetchone()
     
     if not conversation:
-        conn.close()
         return jsonify({'error': 'Conversation not found'}), 404
     
     # Update the title
     conn.execute('UPDATE conversations SET title = ? WHERE id = ?', 
                (new_title, conversation_id))
     conn.commit()
-    conn.close()
     
     return jsonify({'id': conversation_id, 'title': new_title})
 
-@app.route('/ask', methods=['POST'])
+def save_messages(user_id, conversation_id, question, answer):
+    """Store a question/answer pair, creating the conversation if needed.
+
+    Returns the id of the conversation the messages were saved to. With
+    MESSAGE_WRITE_BEHIND only a new conversation is written here and the
+    messages are queued for the writer thread.
+    """
+    conn = get_db_connection()
+    message_writer = services().message_writer
+    try:
+        # Check if conversation exists and belongs to the user
+        conversation = conn.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?', 
+                                 (conversation_id, user_id)).fetchone()
+        
+        if conversation:
+            # New messages go after the old ones, in the hot table
+            restore_if_archived(conn, conversation)
+        else:
+            # Create new conversation with first question as title
+            cursor = conn.cursor()
+            title = question[:50] + '...' if len(question) > 50 else question
+            cursor.execute('INSERT INTO conversations (user_id, title) VALUES (?, ?)', 
+                         (user_id, title))
+            conversation_id = cursor.lastrowid
+        
+        if message_writer is not None:
+            conn.commit()
+            if message_writer.submit(conversation_id, question, answer):
+                return conversation_id
+            # The queue stayed full, write this pair directly
+        
+        # Save user question
+        question_id = conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)', 
+                                 (conversation_id, True, question)).lastrowid
+        
+        # Save assistant answer
+        answer_id = conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)', 
+                               (conversation_id, False, answer)).lastrowid
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    
+    services().conversation_memory.record(conversation_id, [(question_id, True, question), (answer_id, False, answer)])
+    
+    return conversation_id
+
+def too_many_requests(retry_after):
+    """429 response telling the client when to try again"""
+    response = jsonify({'error': 'Too many requests, please slow down',
+                        'retry_after': int(retry_after_header(retry_after))})
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response
+
+def llm_failed(error):
+    """504 or 502 response for a question no model answered"""
+    status = 504 if error.code == 'deadline_exceeded' else 502
+    return jsonify({'error': str(error), 'code': error.code}), status
+
+def stream_error(error):
+    """Body of the error event ending a stream that has no answer"""
+    if isinstance(error, LLMError):
+        return error.to_dict()
+    if isinstance(error, UpstreamBusy):
+        return {'code': 'upstream_busy', 'message': str(error),
+                'retry_after': int(retry_after_header(error.retry_after))}
+    return {'code': 'server_error', 'message': 'Server error'}
+
+def get_question_data():
+    """Read the question and conversation id from a JSON or form request"""
+    if request.is_json:
+        data = request.get_json()
+        return data.get('question'), data.get('conversation_id')
+    
+    # Fallback for form data
+    return request.form.get('question'), request.form.get('conversation_id')
+
+def log_answer(endpoint, user_id, question, answer, source):
+    """Finish the request's metrics and write its log line"""
+    timings = metrics.finish_request(endpoint, source)
+    log_event(logger, logging.INFO, endpoint, user_id=user_id, source=source,
+              question_chars=len(question), answer_chars=len(answer), timings_ms=timings)
+
+@bp.route('/ask', methods=['POST'])
 def ask():
     if request.method == 'POST':
-        if not is_logged_in():
-            return jsonify({'error': 'Not logged in'}), 401
-        
-        user_id = session['user_id']
+        metrics.start_request()
+        with metrics.stage('auth'):
+            if not is_logged_in():
+                return jsonify({'error': 'Not logged in'}), 401
+            
+            user_id = session['user_id']
+            allowed, retry_after = services().rate_limiter.acquire(user_id)
+        if not allowed:
+            metrics.finish_request('ask', 'rate_limited')
+            return too_many_requests(retry_after)
         
         # Check if request is JSON
         try:
-            if request.is_json:
-                data = request.get_json()
-                question = data.get('question')
-                conversation_id = data.get('conversation_id')
-                print(f"Received JSON data: {data}")
-            else:
-                # Fallback for form data
-                question = request.form.get('question')
-                conversation_id = request.form.get('conversation_id')
-                print(f"Received form data: question={question}, conversation_id={conversation_id}")
+            question, conversation_id = get_question_data()
             
             if not question:
                 return jsonify({'error': 'No question provided'}), 400
                 
-            # Get answer from Gemini
-            answer = get_gemini_response(question)
+            # Get answer from the FAQ, the cache or Gemini
+            with metrics.stage('history'):
+                history = get_conversation_history(user_id, conversation_id, question)
+            answer, source = answer_question(question, history)
             
             # Save to database if conversation_id is provided
             if conversation_id:
                 try:
-                    conversation_id = int(conversation_id)
-                    conn = get_db_connection()
-                    
-                    # Check if conversation exists and belongs to the user
-                    conversation = conn.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?', 
-                                             (conversation_id, user_id)).fetchone()
-                    
-                    if not conversation:
-                        # Create new conversation with first question as title
-                        cursor = conn.cursor()
-                        title = question[:50] + '...' if len(question) > 50 else question
-                        cursor.execute('INSERT INTO conversations (user_id, title) VALUES (?, ?)', 
-                                     (user_id, title))
-                        conversation_id = cursor.lastrowid
-                    
-                    # Save user question
-                    conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)', 
-                               (conversation_id, True, question))
+                    with metrics.stage('db_write'):
+                        conversation_id = save_messages(user_id, int(conversation_id), question, answer)
+                    log_answer('ask', user_id, question, answer, source)
                     
-                    # Save assistant answer
-                    conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)', 
-                               (conversation_id, False, answer))
-                    
-                    conn.commit()
-                    conn.close()
-                    
-                    return jsonify({'answer': answer, 'conversation_id': conversation_id})
+                    return jsonify({'answer': answer, 'source': source, 'conversation_id': conversation_id})
                 except Exception as e:
-                    print(f"Database error: {str(e)}")
-                    return jsonify({'answer': answer, 'error': str(e)})
+                    log_event(logger, logging.ERROR, 'save_failed', exc_info=True, user_id=user_id)
+                    log_answer('ask', user_id, question, answer, source)
+                    return jsonify({'answer': answer, 'source': source, 'error': str(e)})
             
-            return jsonify({'answer': answer})
+            log_answer('ask', user_id, question, answer, source)
+            return jsonify({'answer': answer, 'source': source})
+        except UpstreamBusy as e:
+            metrics.finish_request('ask', 'upstream_busy')
+            return too_many_requests(e.retry_after)
+        except LLMError as e:
+            # Nothing is saved: the question can simply be asked again
+            metrics.finish_request('ask', e.code)
+            log_event(logger, logging.WARNING, 'llm_failed', user_id=user_id, code=e.code, error=str(e))
+            return llm_failed(e)
         except Exception as e:
-            print(f"Error in /ask route: {str(e)}")
+            log_event(logger, logging.ERROR, 'ask_failed', exc_info=True, user_id=user_id)
             return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@bp.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """Answer a JSONL body of questions, streaming JSONL results as they finish.
+
+    Each input line is {"id": ..., "question": ...}. Each output line is
+    the item with "answer" and "source", or with "error" if it failed.
+    Results come in completion order, not input order. Questions that
+    need the model are charged to the user's rate limit one by one.
+    """
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    user_id = session['user_id']
+    try:
+        items = parse_questions(request.get_data(as_text=True).splitlines())
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+    if not items:
+        return jsonify({'error': 'No questions provided'}), 400
+    if len(items) > current_app.config['BATCH_MAX_QUESTIONS']:
+        return jsonify({'error': f"At most {current_app.config['BATCH_MAX_QUESTIONS']} questions per batch"}), 413
+    
+    runner = create_batch_runner(user_id=user_id)
+    
+    def generate():
+        start = time.perf_counter()
+        failed = rate_limited = 0
+        for result in runner.run(items):
+            failed += 'error' in result
+            rate_limited += result.get('code') == 'rate_limited'
+            yield json.dumps(result, ensure_ascii=False) + '\n'
+        log_event(logger, logging.INFO, 'ask_batch', user_id=user_id, questions=len(items),
+                  failed=failed, rate_limited=rate_limited, duration_ms=round((time.perf_counter() - start) * 1000, 2))
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def sse_event(data, event=None):
+    """Format a server-sent event"""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+@bp.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    metrics.start_request()
+    with metrics.stage('auth'):
+        if not is_logged_in():
+            return jsonify({'error': 'Not logged in'}), 401
+        
+        user_id = session['user_id']
+        allowed, retry_after = services().rate_limiter.acquire(user_id)
+    if not allowed:
+        metrics.finish_request('ask_stream', 'rate_limited')
+        return too_many_requests(retry_after)
+    
+    question, conversation_id = get_question_data()
+    
+    if not question:
+        return jsonify({'error': 'No question provided'}), 400
+    
+    with metrics.stage('history'):
+        history = get_conversation_history(user_id, conversation_id, question)
+    version = answer_version(history)
+    answer_cache = services().answer_cache
+    
+    def persist(answer):
+        if not conversation_id or not answer:
+            return conversation_id
+        try:
+            with metrics.stage('db_write'):
+                return save_messages(user_id, int(conversation_id), question, answer)
+        except Exception:
+            log_event(logger, logging.ERROR, 'save_failed', exc_info=True, user_id=user_id)
+            return conversation_id
+    
+    def generate():
+        chunks = []
+        source = 'llm'
+        persisted = False
+        try:
+            # The fast path and the cache answer in one chunk
+            with metrics.stage('fast_path'):
+                answer = match_faq(question)
+            if answer is not None:
+                source = 'faq'
+            elif not history:
+                with metrics.stage('cache'):
+                    answer = answer_cache.get(question, version)
+                if answer is not None:
+                    source = 'cache'
+            
+            if answer is None:
+                # Concurrent identical questions share one model stream
+                key = (normalize_question(question), version)
+                stream = services().upstream_calls.stream(key, lambda: stream_gemini_response(question, history))
+                try:
+                    for text, source in stream:
+                        chunks.append(text)
+                        yield sse_event({'text': text})
+                except Exception as e:
+                    # A model that didn't answer at all is replaced by the
+                    # closest FAQ entry. A half-finished answer isn't
+                    if isinstance(e, LLMError) and not chunks:
+                        answer = faq_fallback(question)
+                    if answer is None:
+                        # Neither the partial answer nor the error is saved
+                        persisted = True
+                        error = stream_error(e)
+                        metrics.finish_request('ask_stream', error['code'])
+                        log_event(logger, logging.WARNING, 'llm_failed', exc_info=error['code'] == 'server_error',
+                                  user_id=user_id, code=error['code'], error=str(e),
+                                  answer_chars=len(''.join(chunks)))
+                        yield sse_event(error, event='error')
+                        return
+                    source = 'faq_fallback'
+                else:
+                    if source == 'llm' and not history:
+                        answer_cache.set(question, version, ''.join(chunks))
+            
+            if answer is not None:
+                chunks.append(answer)
+                yield sse_event({'text': answer})
+            
+            saved_conversation_id = persist(''.join(chunks))
+            persisted = True
+            log_answer('ask_stream', user_id, question, ''.join(chunks), source)
+            yield sse_event({'source': source, 'conversation_id': saved_conversation_id}, event='done')
+        finally:
+            # The client disconnected mid-stream: keep what was generated
+            if not persisted:
+                persist(''.join(chunks))
+                log_answer('ask_stream', user_id, question, ''.join(chunks), 'cancelled')
+    
+    # Keep the app context for the generator, which saves the answer after
+    # the view has returned (or when the client goes away)
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+@bp.route('/export', methods=['GET'])
+def export():
+    token = current_app.config['EXPORT_TOKEN']
+    if not token:
+        return jsonify({'error': 'Not found'}), 404
+    provided = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(provided.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        return jsonify({'error': 'Invalid export token'}), 401
+    
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(sorted(EXPORT_FORMATS))}"}), 400
+    since = request.args.get('since', 0, type=int)
+    include_archived = request.args.get('include_archived')
+    if include_archived is not None:
+        include_archived = include_archived.lower() == 'true'
+    
+    # A connection of its own, since the export outlives the request and
+    # shouldn't tie up the pooled one
+    svc = services()
+    svc.ensure_schema()
+    conn = connect(current_app.config['DATABASE'], svc.db_pool.pragmas)
+    
+    def generate():
+        try:
+            yield from export_messages(conn, fmt, since, include_archived=include_archived)
+        finally:
+            conn.close()
+    
+    _, content_type = EXPORT_FORMATS[fmt]
+    return Response(generate(), content_type=f'{content_type}; charset=utf-8', headers={
+        'Content-Disposition': f'attachment; filename=messages-after-{since}.{fmt}',
+    })
+
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    if not is_logged_in():
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    svc = services()
+    stats = svc.answer_cache.stats()
+    stats['coalescing'] = svc.upstream_calls.stats()
+    stats['upstream'] = svc.upstream.stats()
+    stats['llm'] = svc.llm_invoker.stats()
+    stats['rate_limit'] = svc.rate_limiter.stats()
+    stats['knowledge_base'] = svc.knowledge_base.stats()
+    stats['message_writer'] = svc.message_writer.stats() if svc.message_writer else {'enabled': False}
+    return jsonify(stats)
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+def __getattr__(name):
+    # Keeps `gunicorn app:app` and `from app import app` working: the app is
+    # only built when first asked for, not when the module is imported
+    global app
+    if name == 'app':
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
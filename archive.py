@@ -0,0 +1,141 @@
+import json
+import zlib
+
+# zlib level 9: archiving runs offline, and decompression costs the same at
+# any level
+COMPRESSION_LEVEL = 9
+
+# Conversations whose newest message is older than the cutoff. Empty
+# conversations have no newest message and are never picked
+INACTIVE_CONVERSATIONS = (
+    'SELECT c.id FROM conversations c '
+    'WHERE c.archived = 0 '
+    'AND (SELECT MAX(m.created_at) FROM messages m WHERE m.conversation_id = c.id) < datetime(\'now\', ?) '
+    'ORDER BY c.id LIMIT ?'
+)
+
+
+def pack_messages(rows):
+    """Compress (id, is_user, content, created_at) rows into one blob"""
+    data = json.dumps([[row[0], bool(row[1]), row[2], row[3]] for row in rows],
+                      ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(data, COMPRESSION_LEVEL), len(data)
+
+
+def unpack_messages(blob):
+    """Inverse of pack_messages, returning (id, is_user, content, created_at) tuples"""
+    return [tuple(row) for row in json.loads(zlib.decompress(blob))]
+
+
+def index_archived_messages(conn, conversation_id, rows):
+    """Add archived (id, is_user, content, created_at) rows to the search index"""
+    conn.executemany('INSERT INTO archived_messages_fts (rowid, content) VALUES (?, ?)',
+                     [(row[0], row[2]) for row in rows])
+    conn.executemany('INSERT INTO archived_message_ids (id, conversation_id, is_user, created_at) '
+                     'VALUES (?, ?, ?, ?)',
+                     [(row[0], conversation_id, row[1], row[3]) for row in rows])
+
+
+def unindex_archived_messages(conn, conversation_id, rows):
+    """Inverse of index_archived_messages, for the rows of a restored conversation"""
+    # A contentless table can only forget a row given the text it indexed
+    conn.executemany("INSERT INTO archived_messages_fts (archived_messages_fts, rowid, content) "
+                     "VALUES ('delete', ?, ?)", [(row[0], row[2]) for row in rows])
+    conn.execute('DELETE FROM archived_message_ids WHERE conversation_id = ?', (conversation_id,))
+
+
+def find_inactive_conversations(conn, days, limit):
+    """Return ids of hot conversations with no message in the last days days"""
+    return [row[0] for row in conn.execute(INACTIVE_CONVERSATIONS, (f'-{days} days', limit))]
+
+
+def archive_conversation(conn, conversation_id):
+    """Move a conversation's messages into one compressed archived_messages row.
+
+    Runs in its own transaction, which must not already be open. Messages
+    written after an earlier archive (by a queued write that raced the
+    archiver) are merged into the existing blob. Returns (messages,
+    raw bytes, compressed bytes), all zero if there was nothing to move.
+    The messages stay searchable through archived_messages_fts.
+    """
+    # IMMEDIATE so no message can be added between reading and deleting
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        rows = conn.execute('SELECT id, is_user, content, created_at FROM messages '
+                            'WHERE conversation_id = ? ORDER BY id', (conversation_id,)).fetchall()
+        if not rows:
+            conn.rollback()
+            return 0, 0, 0
+        rows = [tuple(row) for row in rows]
+        # Deleting them drops them from messages_fts
+        index_archived_messages(conn, conversation_id, rows)
+        existing = conn.execute('SELECT data FROM archived_messages WHERE conversation_id = ?',
+                                (conversation_id,)).fetchone()
+        if existing:
+            rows = unpack_messages(existing['data']) + rows
+        blob, raw_bytes = pack_messages(rows)
+        conn.execute('INSERT OR REPLACE INTO archived_messages (conversation_id, message_count, raw_bytes, data) '
+                     'VALUES (?, ?, ?, ?)', (conversation_id, len(rows), raw_bytes, blob))
+        conn.execute('DELETE FROM messages WHERE conversation_id = ?', (conversation_id,))
+        conn.execute('UPDATE conversations SET archived = 1 WHERE id = ?', (conversation_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows), raw_bytes, len(blob)
+
+
+def restore_conversation(conn, conversation_id):
+    """Move an archived conversation's messages back into messages.
+
+    Messages keep their ids and timestamps, so pagination cursors and
+    conversation memory stay valid. Runs in its own transaction, which
+    must not already be open. Returns the number of messages restored,
+    0 if another request restored the conversation first.
+    """
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        archived = conn.execute('SELECT data FROM archived_messages WHERE conversation_id = ?',
+                                (conversation_id,)).fetchone()
+        rows = unpack_messages(archived['data']) if archived else []
+        # Inserting them puts them back in messages_fts
+        unindex_archived_messages(conn, conversation_id, rows)
+        conn.executemany('INSERT INTO messages (id, conversation_id, is_user, content, created_at) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         [(message_id, conversation_id, is_user, content, created_at)
+                          for message_id, is_user, content, created_at in rows])
+        conn.execute('DELETE FROM archived_messages WHERE conversation_id = ?', (conversation_id,))
+        conn.execute('UPDATE conversations SET archived = 0 WHERE id = ?', (conversation_id,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def incremental_vacuum(conn, pages=None):
+    """Return free pages to the filesystem, all of them or at most pages.
+
+    Only has an effect on databases in auto_vacuum=INCREMENTAL mode, see
+    enable_incremental_vacuum. Returns the number of pages freed.
+    """
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    # The pragma frees one page per step and execute() steps only once,
+    # executescript() runs it to completion
+    conn.executescript(f'PRAGMA incremental_vacuum({int(pages) if pages is not None else 0})')
+    return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """Switch an existing database to auto_vacuum=INCREMENTAL.
+
+    Needs a full VACUUM, which rewrites the whole file and blocks writers
+    while it runs, so this is done once, by hand. New databases are
+    created in this mode (see db.DEFAULT_PRAGMAS). Returns True if the
+    database had to be converted.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
@@ -0,0 +1,80 @@
+"""Move inactive conversations' messages into compressed cold storage.
+
+Conversations with no message in the last --days days (default
+ARCHIVE_AFTER_DAYS) have their messages packed into one zlib-compressed
+row of archived_messages and deleted from messages. The app restores them
+when the conversation is opened or continued. Freed pages are then handed
+back to the filesystem with PRAGMA incremental_vacuum.
+
+Safe to run while the app is serving, e.g. nightly from cron. Each
+conversation is archived in its own short transaction.
+
+Databases created before incremental vacuum was enabled need a one-off
+--enable-incremental-vacuum, which runs a full VACUUM (it rewrites the
+file and blocks writers while it runs).
+
+Usage:
+    python archive_conversations.py [path/to/database.db] [--days 90]
+                                    [--limit 10000] [--vacuum-pages N]
+                                    [--enable-incremental-vacuum]
+"""
+import argparse
+import os
+import sys
+import time
+
+from archive import archive_conversation, enable_incremental_vacuum, find_inactive_conversations, incremental_vacuum
+from app import load_config
+from db import connect
+from migrations import migrate
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def main(argv=None):
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database', nargs='?', default=config['DATABASE'])
+    parser.add_argument('--days', type=int, default=config['ARCHIVE_AFTER_DAYS'],
+                        help='archive conversations with no message for this many days')
+    parser.add_argument('--limit', type=int, default=10000, help='most conversations to archive in this run')
+    parser.add_argument('--vacuum-pages', type=int, help='most free pages to release (default all)')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='convert an older database with a full VACUUM first')
+    args = parser.parse_args(argv)
+
+    conn = connect(args.database)
+    migrate(conn)
+    if args.enable_incremental_vacuum and enable_incremental_vacuum(conn):
+        print('Converted the database to auto_vacuum=INCREMENTAL')
+
+    size_before = file_size(args.database)
+    start = time.perf_counter()
+    conversations = messages = raw_bytes = compressed_bytes = 0
+    for conversation_id in find_inactive_conversations(conn, args.days, args.limit):
+        count, raw, compressed = archive_conversation(conn, conversation_id)
+        if count:
+            conversations += 1
+            messages += count
+            raw_bytes += raw
+            compressed_bytes += compressed
+
+    freed = incremental_vacuum(conn, args.vacuum_pages)
+    # Move the freed space out of the WAL so the file actually shrinks
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        print('Note: auto_vacuum is off, freed pages stay in the file for reuse. '
+              'Run once with --enable-incremental-vacuum to release them.')
+    conn.close()
+
+    ratio = raw_bytes / compressed_bytes if compressed_bytes else 0
+    print(f"Archived {messages} messages from {conversations} conversations in {time.perf_counter() - start:.1f}s "
+          f"({raw_bytes / 1e6:.1f} MB of text stored as {compressed_bytes / 1e6:.1f} MB, {ratio:.1f}x)")
+    print(f"Released {freed} pages, database {size_before / 1e6:.1f} MB -> {file_size(args.database) / 1e6:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from answer_cache import normalize_question
+
+
+class BatchError(Exception):
+    """Raised for a malformed batch input line"""
+
+
+def parse_questions(lines, id_field='id', question_field='question'):
+    """Read batch items from JSONL lines.
+
+    Each line is a JSON object with the question under question_field and
+    an optional id under id_field (or "request_id", as in requests.jsonl).
+    Lines without an id are numbered from 1. Blank lines are skipped.
+    """
+    items = []
+    ids = set()
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as e:
+            raise BatchError(f'Line {number} is not valid JSON: {e}') from e
+        if not isinstance(data, dict):
+            raise BatchError(f'Line {number} is not a JSON object')
+
+        question = data.get(question_field)
+        if not isinstance(question, str) or not question.strip():
+            raise BatchError(f'Line {number} has no "{question_field}"')
+        item_id = data.get(id_field, data.get('request_id', number))
+        if item_id in ids:
+            raise BatchError(f'Line {number} repeats id {item_id!r}')
+        ids.add(item_id)
+        items.append({'id': item_id, 'question': question.strip()})
+    return items
+
+
+def read_checkpoint(lines):
+    """Return the ids already answered in a previous run's JSONL output.
+
+    Items that failed are left out, so a resumed run asks them again. A
+    truncated last line from an interrupted write is ignored.
+    """
+    done = set()
+    for line in lines:
+        try:
+            result = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(result, dict) and 'answer' in result:
+            done.add(result['id'])
+    return done
+
+
+class BatchRunner:
+    """Answers a batch of questions on a bounded pool of worker threads.
+
+    answer(question) returns a dict of result fields (e.g. answer and
+    source). Identical questions, after normalization, are answered once
+    and the result is given to every item that asked it. At most
+    max_pending distinct questions are queued at a time, so a large batch
+    isn't materialized as futures all at once.
+    """
+
+    def __init__(self, answer, workers=4, max_pending=None):
+        self.answer = answer
+        self.workers = workers
+        self.max_pending = max_pending or workers * 2
+
+    def _group(self, items, skip_ids):
+        groups = {}
+        for item in items:
+            if item['id'] in skip_ids:
+                continue
+            groups.setdefault(normalize_question(item['question']), []).append(item)
+        return list(groups.values())
+
+    def _answer(self, question):
+        try:
+            return self.answer(question)
+        except Exception as e:
+            return {'error': str(e)}
+
+    def run(self, items, skip_ids=()):
+        """Yield one result per item, in completion order.
+
+        Results are the item's id and question plus the answer fields, or
+        an "error" field when answering failed. Items whose id is in
+        skip_ids are not asked. Closing the generator early cancels the
+        questions that haven't started.
+        """
+        groups = iter(self._group(items, skip_ids))
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='batch')
+        pending = {}
+        try:
+            while True:
+                for group in groups:
+                    pending[executor.submit(self._answer, group[0]['question'])] = group
+                    if len(pending) >= self.max_pending:
+                        break
+                if not pending:
+                    return
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    result = future.result()
+                    for item in pending.pop(future):
+                        yield dict(item, **result)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
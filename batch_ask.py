@@ -0,0 +1,66 @@
+"""Answer a JSONL file of questions through the app's answer path.
+
+Each input line is a JSON object with a question and an id (see
+--question-field and --id-field). Results are appended to the output file
+as they finish, one JSON object per line, so the output doubles as a
+checkpoint: rerunning with the same output file skips the ids already
+answered in it and retries the ones that failed.
+
+Usage:
+    python batch_ask.py questions.jsonl -o answers.jsonl [--workers 4]
+                        [--id-field id] [--question-field question]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from app import create_app, create_batch_runner
+from batch import BatchError, parse_questions, read_checkpoint
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', help='JSONL file of questions, or - for stdin')
+    parser.add_argument('-o', '--output', default='-', help='JSONL file to append results to (default stdout)')
+    parser.add_argument('--workers', type=int, help='worker threads (default BATCH_WORKERS)')
+    parser.add_argument('--id-field', default='id')
+    parser.add_argument('--question-field', default='question')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    with source:
+        try:
+            items = parse_questions(source, args.id_field, args.question_field)
+        except BatchError as e:
+            parser.error(str(e))
+
+    done = set()
+    if args.output != '-' and os.path.exists(args.output):
+        with open(args.output, encoding='utf-8') as f:
+            done = read_checkpoint(f)
+    output = sys.stdout if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+
+    app = create_app({'BATCH_WORKERS': args.workers} if args.workers else None)
+    answered = failed = 0
+    start = time.perf_counter()
+    with app.app_context(), output:
+        runner = create_batch_runner(app)
+        for result in runner.run(items, skip_ids=done):
+            output.write(json.dumps(result, ensure_ascii=False) + '\n')
+            # Flush each line so an interrupted run keeps what it finished
+            output.flush()
+            if 'error' in result:
+                failed += 1
+            else:
+                answered += 1
+
+    skipped = sum(1 for item in items if item['id'] in done)
+    print(f"{answered} answered, {failed} failed, {skipped} already done, "
+          f"{time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Answer cache keys: which questions share one, and what a key costs.
+
+Checks normalize_question on pairs of questions that must share a cache
+key (case, punctuation and spacing variants) and pairs that must not
+(C++ and C#, questions in different non-Latin scripts, questions with no
+words). Then asks the app the C++/C# and Russian/Chinese pairs through
+/ask with the stub backend, and checks that the second question of each
+pair goes to the model instead of being served the first one's answer.
+Reports the time per normalize_question call. Exits non-zero if a check
+fails.
+
+Usage:
+    python benchmarks/answer_cache.py [--runs 100000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from answer_cache import normalize_question
+
+SAME_KEY = [
+    ('What is your current position?', 'what is your CURRENT position'),
+    ('Do you know C++?', 'do you know   c++'),
+    ('আপনার বর্তমান পদ কি?', 'আপনার বর্তমান পদ কি'),
+    ('Как тебя зовут?', 'как тебя зовут'),
+]
+
+DIFFERENT_KEYS = [
+    ('Do you know C++?', 'Do you know C#?'),
+    ('Как тебя зовут?', '你叫什么名字？'),
+    ('Где ты работаешь?', '你在哪里工作？'),
+    ('???', '!!!'),
+]
+
+
+def check_keys():
+    failures = []
+    for a, b in SAME_KEY:
+        if normalize_question(a) != normalize_question(b):
+            failures.append(f'{a!r} and {b!r} got different keys')
+    for a, b in DIFFERENT_KEYS:
+        key = normalize_question(a)
+        if not key or key == normalize_question(b):
+            failures.append(f'{a!r} and {b!r} share the key {key!r}')
+    return failures
+
+
+def check_app():
+    """Ask each pair in turn, the second must not be a cache hit"""
+    os.environ.update(
+        LLM_BACKEND='stub', STUB_LLM_LATENCY='0', STUB_LLM_TOKENS_PER_SECOND='0',
+        FAST_PATH_ENABLED='false', RATE_LIMIT='none', LOG_LEVEL='ERROR',
+        DATABASE=os.path.join(tempfile.mkdtemp(), 'answer_cache.db'),
+    )
+    from app import create_app
+
+    client = create_app().test_client()
+    client.post('/signup', data={'username': 'cache', 'email': 'cache@example.com',
+                                 'password': 'benchmark', 'confirm_password': 'benchmark'})
+    failures = []
+    for first, second in DIFFERENT_KEYS[:2]:
+        client.post('/ask', json={'question': first})
+        response = client.post('/ask', json={'question': second})
+        if response.json.get('source') == 'cache':
+            failures.append(f'{second!r} was served the cached answer to {first!r}')
+    response = client.post('/ask', json={'question': DIFFERENT_KEYS[0][0]})
+    if response.json.get('source') != 'cache':
+        failures.append(f'asking {DIFFERENT_KEYS[0][0]!r} again was not a cache hit')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=100000)
+    args = parser.parse_args()
+
+    for question in ('What is your current position at the company?', 'আপনার বর্তমান পদ কি?'):
+        seconds = timeit.timeit(lambda: normalize_question(question), number=args.runs)
+        print(f'normalize_question({question!r}): {seconds / args.runs * 1e6:.2f} us')
+
+    failures = check_keys() + check_app()
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,157 @@
+"""Database size and hot-query latency before and after archiving.
+
+Seeds --conversations conversations of --messages messages each, with
+answer-sized text. All but --hot-fraction of them are backdated past the
+archive age. Measures the file size and the latency of the queries the
+app runs on recent conversations: the newest page of a conversation, the
+conversation list, a search, and saving a question/answer pair. Then it
+archives the old conversations, releases the freed pages and measures
+again. Also reports how long restoring one archived conversation takes.
+
+Each query runs on a fresh connection with a small page cache, so that
+reads which miss it pay for going to the file.
+
+Usage:
+    python benchmarks/archive.py [--conversations 5000] [--messages 40]
+                                 [--hot-fraction 0.1] [--runs 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import archive_conversation, find_inactive_conversations, incremental_vacuum, restore_conversation
+from db import DEFAULT_PRAGMAS, connect
+from migrations import migrate
+from search import search_messages
+
+WORDS = (
+    'the a of and to in is for on with that by this as are be experience python machine learning '
+    'project team data model deploy production api service database query latency cache aws '
+    'docker pipeline training inference research paper company role engineer skills university'
+).split()
+USERS = 100
+
+# A page cache far smaller than the database, as on a server whose memory
+# is shared with other workers
+PRAGMAS = dict(DEFAULT_PRAGMAS, cache_size=-2000, mmap_size=0)
+
+
+def text(rng, words):
+    return ' '.join(rng.choices(WORDS, k=words))
+
+
+def seed(path, conversations, messages, hot_fraction):
+    conn = connect(path, PRAGMAS)
+    migrate(conn)
+    rng = random.Random(0)
+    conn.executemany('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                     [(f'user{i}', f'user{i}@example.com', 'x') for i in range(USERS)])
+    hot = set(rng.sample(range(1, conversations + 1), int(conversations * hot_fraction)))
+    for conversation_id in range(1, conversations + 1):
+        user_id = conversation_id % USERS + 1
+        age = '-1 days' if conversation_id in hot else f'-{rng.randrange(100, 700)} days'
+        conn.execute("INSERT INTO conversations (id, user_id, title, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+                     (conversation_id, user_id, f'conversation {conversation_id}', age))
+        conn.executemany(
+            "INSERT INTO messages (conversation_id, is_user, content, created_at) VALUES (?, ?, ?, datetime('now', ?))",
+            [(conversation_id, i % 2 == 0, text(rng, 15 if i % 2 == 0 else 150), age) for i in range(messages)])
+        if conversation_id % 500 == 0:
+            conn.commit()
+    conn.commit()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    return sorted(hot)
+
+
+def file_size(path):
+    return sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+
+def median_ms(path, hot, runs, query):
+    rng = random.Random(1)
+    timings = []
+    for _ in range(runs):
+        conversation_id = rng.choice(hot)
+        conn = connect(path, PRAGMAS)
+        start = time.perf_counter()
+        query(conn, conversation_id)
+        timings.append(time.perf_counter() - start)
+        conn.close()
+    return statistics.median(timings) * 1000
+
+
+def newest_page(conn, conversation_id):
+    conn.execute('SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+                 'ORDER BY created_at DESC, id DESC LIMIT 51', (conversation_id,)).fetchall()
+
+
+def conversation_list(conn, conversation_id):
+    conn.execute('SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+                 'ORDER BY created_at DESC, id DESC LIMIT 51', (conversation_id % USERS + 1,)).fetchall()
+
+
+def search(conn, conversation_id):
+    search_messages(conn, conversation_id % USERS + 1, 'inference', 20)
+
+
+def save_pair(conn, conversation_id):
+    conn.executemany('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                     [(conversation_id, True, 'question'), (conversation_id, False, 'answer ' * 100)])
+    conn.commit()
+
+
+QUERIES = [
+    ('newest page', newest_page),
+    ('conversation list', conversation_list),
+    ('search', search),
+    ('save pair', save_pair),
+]
+
+
+def measure(label, path, hot, runs):
+    print(f"{label}: database {file_size(path) / 1e6:.1f} MB")
+    for name, query in QUERIES:
+        print(f"    {name:<18} {median_ms(path, hot, runs, query):7.3f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--conversations', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--hot-fraction', type=float, default=0.1)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'archive.db')
+    hot = seed(path, args.conversations, args.messages, args.hot_fraction)
+    measure('before', path, hot, args.runs)
+
+    conn = connect(path, PRAGMAS)
+    start = time.perf_counter()
+    archived = []
+    raw_bytes = compressed_bytes = 0
+    for conversation_id in find_inactive_conversations(conn, 90, args.conversations):
+        _, raw, compressed = archive_conversation(conn, conversation_id)
+        archived.append(conversation_id)
+        raw_bytes += raw
+        compressed_bytes += compressed
+    freed = incremental_vacuum(conn)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    print(f"archived {len(archived)} conversations in {time.perf_counter() - start:.1f}s, "
+          f"{raw_bytes / 1e6:.1f} MB of messages stored as {compressed_bytes / 1e6:.1f} MB, {freed} pages released")
+    conn.close()
+    measure('after', path, hot, args.runs)
+
+    conn = connect(path, PRAGMAS)
+    timings = []
+    for conversation_id in archived[:args.runs]:
+        start = time.perf_counter()
+        restore_conversation(conn, conversation_id)
+        timings.append(time.perf_counter() - start)
+    print(f"restoring an archived conversation: median {statistics.median(timings) * 1000:.2f} ms")
@@ -0,0 +1,130 @@
+"""Request coalescing for /ask and /ask/stream with the stub backend.
+
+--users threads ask the same new question at once, first through /ask and
+then through /ask/stream as the web UI does. Reports how many model calls
+each burst made and how long the slowest answer took. Then checks that
+the followers of a stream whose first client disconnects still get the
+whole answer. Exits non-zero if a burst made more than one model call, a
+streamed answer differs from the others, or a follower was cut short.
+
+Usage:
+    python benchmarks/coalescing.py [--users 20] [--latency 0.5]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def stream_answer(body):
+    """The answer text of an /ask/stream body, and whether it ended with done"""
+    text = []
+    done = False
+    for block in body.split('\n\n'):
+        lines = block.splitlines()
+        if 'event: done' in lines:
+            done = True
+        for line in lines:
+            if line.startswith('data: ') and 'event: done' not in lines and 'event: error' not in lines:
+                text.append(json.loads(line[len('data: '):])['text'])
+    return ''.join(text), done
+
+
+def burst(app, users, endpoint, question):
+    """Ask question from users threads at once, returning the answers and the slowest time"""
+    answers = [None] * users
+    times = [0.0] * users
+    barrier = threading.Barrier(users)
+
+    def ask(index):
+        client = app.test_client()
+        client.post('/login', data={'username': 'coalesce', 'password': 'benchmark'})
+        barrier.wait()
+        start = time.perf_counter()
+        response = client.post(endpoint, json={'question': question})
+        if endpoint == '/ask':
+            answers[index] = response.json.get('answer')
+        else:
+            answers[index] = stream_answer(response.get_data(as_text=True))[0]
+        times[index] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return answers, max(times)
+
+
+def check_disconnect(app, followers):
+    """The first client reads one chunk and leaves, the others must get it all"""
+    question = 'What did the first client miss?'
+    clients = []
+    for _ in range(followers + 1):
+        client = app.test_client()
+        client.post('/login', data={'username': 'coalesce', 'password': 'benchmark'})
+        clients.append(client)
+    response = clients[0].post('/ask/stream', json={'question': question}, buffered=False)
+    next(iter(response.response))
+    results = []
+
+    def follow(client):
+        results.append(stream_answer(client.post('/ask/stream', json={'question': question}).get_data(as_text=True)))
+
+    threads = [threading.Thread(target=follow, args=(client,)) for client in clients[1:]]
+    for thread in threads:
+        thread.start()
+    # Let the followers join before the leader goes away
+    time.sleep(0.1)
+    response.close()
+    for thread in threads:
+        thread.join()
+    failures = []
+    if not all(done for _, done in results):
+        failures.append('a follower of a disconnected stream did not get the done event')
+    if len({text for text, _ in results}) != 1 or not results[0][0]:
+        failures.append('followers of a disconnected stream got different answers')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    os.environ.update(
+        LLM_BACKEND='stub', STUB_LLM_LATENCY=str(args.latency), STUB_LLM_TOKENS_PER_SECOND='100',
+        STUB_LLM_ANSWER_TOKENS='40', FAST_PATH_ENABLED='false', RATE_LIMIT='none', LOG_LEVEL='ERROR',
+        GEMINI_MAX_CONCURRENCY=str(args.users * 2),
+        DATABASE=os.path.join(tempfile.mkdtemp(), 'coalescing.db'),
+    )
+    from app import create_app
+
+    app = create_app()
+    app.test_client().post('/signup', data={'username': 'coalesce', 'email': 'coalesce@example.com',
+                                            'password': 'benchmark', 'confirm_password': 'benchmark'})
+    upstream = app.extensions['smart_faq'].upstream
+    failures = []
+    print(f"{args.users} users asking one question, {args.latency:g}s model latency")
+    for endpoint in ('/ask', '/ask/stream'):
+        before = upstream.stats()['calls']
+        answers, slowest = burst(app, args.users, endpoint, f'What is new at {endpoint}?')
+        calls = upstream.stats()['calls'] - before
+        print(f"{endpoint:<12} model calls {calls:>3}   slowest answer {slowest:.3f}s")
+        if calls != 1:
+            failures.append(f'{endpoint}: {args.users} identical questions made {calls} model calls')
+        if len(set(answers)) != 1 or not answers[0]:
+            failures.append(f'{endpoint}: the users got different answers')
+    failures += check_disconnect(app, followers=5)
+    print('coalescing stats:', app.extensions['smart_faq'].upstream_calls.stats())
+
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
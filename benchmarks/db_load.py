@@ -0,0 +1,170 @@
+"""Mixed read/write SQLite load across several worker processes.
+
+Compares the old per-request connections (rollback journal, fresh
+connect for every request) with the pooled, WAL-mode connections from
+db.py. Each process stands in for a gunicorn worker and runs several
+threads issuing the same queries as get_conversation (reads) and
+save_messages (writes).
+
+Usage:
+    python benchmarks/db_load.py [--workers 4] [--threads 8] [--duration 10]
+                                 [--write-ratio 0.2]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.percentiles import percentile
+from db import ConnectionPool, connect
+
+USERS = 50
+CONVERSATIONS_PER_USER = 20
+MESSAGES_PER_CONVERSATION = 20
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation_id INTEGER NOT NULL,
+    is_user BOOLEAN NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+
+def seed(path, journal_mode):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+    conn.executescript(SCHEMA)
+    conversation_id = 0
+    for user_id in range(1, USERS + 1):
+        for _ in range(CONVERSATIONS_PER_USER):
+            conversation_id += 1
+            conn.execute('INSERT INTO conversations (user_id, title) VALUES (?, ?)', (user_id, 'seed'))
+            conn.executemany(
+                'INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                [(conversation_id, i % 2 == 0, 'seed message ' * 20) for i in range(MESSAGES_PER_CONVERSATION)]
+            )
+    conn.commit()
+    conn.close()
+
+
+def legacy_connection(path):
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def read_conversation(conn, user_id, conversation_id):
+    conn.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?',
+                 (conversation_id, user_id)).fetchone()
+    conn.execute('SELECT * FROM messages WHERE conversation_id = ? ORDER BY created_at',
+                 (conversation_id,)).fetchall()
+
+
+def write_messages(conn, user_id, conversation_id):
+    conn.execute('SELECT * FROM conversations WHERE id = ? AND user_id = ?',
+                 (conversation_id, user_id)).fetchone()
+    conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                 (conversation_id, True, 'benchmark question'))
+    conn.execute('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                 (conversation_id, False, 'benchmark answer ' * 20))
+    conn.commit()
+
+
+def worker_thread(mode, path, pool, deadline, write_ratio, results):
+    rng = random.Random()
+    while time.monotonic() < deadline:
+        user_id = rng.randint(1, USERS)
+        conversation_id = (user_id - 1) * CONVERSATIONS_PER_USER + rng.randint(1, CONVERSATIONS_PER_USER)
+        kind = 'write' if rng.random() < write_ratio else 'read'
+
+        start = time.perf_counter()
+        try:
+            conn = pool.connection() if mode == 'pooled' else legacy_connection(path)
+            try:
+                if kind == 'write':
+                    write_messages(conn, user_id, conversation_id)
+                else:
+                    read_conversation(conn, user_id, conversation_id)
+            finally:
+                if mode == 'pooled':
+                    pool.release()
+                else:
+                    conn.close()
+            results.append((kind, time.perf_counter() - start, None))
+        except sqlite3.OperationalError as e:
+            results.append((kind, time.perf_counter() - start, str(e)))
+
+
+def worker_process(mode, path, threads, duration, write_ratio, queue):
+    pool = ConnectionPool(path)
+    results = []
+    deadline = time.monotonic() + duration
+    workers = [
+        threading.Thread(target=worker_thread, args=(mode, path, pool, deadline, write_ratio, results))
+        for _ in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    queue.put(results)
+
+
+def run(mode, args):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, f'{mode}.db')
+    seed(path, 'WAL' if mode == 'pooled' else 'DELETE')
+    if mode == 'pooled':
+        connect(path).close()
+
+    queue = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker_process,
+                                args=(mode, path, args.threads, args.duration, args.write_ratio, queue))
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    results = []
+    for _ in processes:
+        results.extend(queue.get())
+    for process in processes:
+        process.join()
+
+    for kind in ('read', 'write'):
+        latencies = [latency for k, latency, error in results if k == kind and error is None]
+        errors = sum(1 for k, _, error in results if k == kind and error is not None)
+        print(f"{mode:<7} {kind:<6} {len(latencies) / args.duration:>9.0f} ops/s "
+              f"p50 {percentile(latencies, 0.5) * 1000:>7.2f} ms "
+              f"p95 {percentile(latencies, 0.95) * 1000:>7.2f} ms "
+              f"p99 {percentile(latencies, 0.99) * 1000:>7.2f} ms "
+              f"errors {errors}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers x {args.threads} threads, {args.write_ratio:.0%} writes, {args.duration}s")
+    for mode in ('legacy', 'pooled'):
+        run(mode, args)
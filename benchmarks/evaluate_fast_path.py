@@ -0,0 +1,87 @@
+"""Offline evaluation of the local FAQ fast path.
+
+Each line of the labeled set is {"question": ..., "expected": ...} where
+expected is the FAQ question that should answer it, or null when the
+question should go to the LLM.
+
+Usage:
+    python benchmarks/evaluate_fast_path.py [labeled.jsonl] [--threshold 0.75]
+
+Reports, per threshold:
+    hit rate   - share of questions answered locally
+    precision  - share of local answers that used the expected FAQ entry
+    recall     - share of answerable questions that were answered locally
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from faq_index import detect_language
+from knowledge_base import KnowledgeBase, load_records
+
+knowledge_base = KnowledgeBase(load_records(os.path.join(ROOT, 'data', 'faq.json')))
+
+DEFAULT_LABELS = os.path.join(ROOT, 'benchmarks', 'fast_path_questions.jsonl')
+THRESHOLDS = [0.5, 0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9]
+
+
+def load_labels(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def match(question):
+    # Same routing as match_faq in app.py: mixed-language questions skip the fast path
+    language = detect_language(question)
+    if language == 'mixed':
+        return None, 0.0
+    return knowledge_base.corpora[language].match(question)
+
+
+def evaluate(labels, threshold):
+    served = correct = answerable = answerable_served = 0
+    mistakes = []
+
+    for label in labels:
+        record, confidence = match(label['question'])
+        hit = record is not None and confidence >= threshold
+        if label['expected'] is not None:
+            answerable += 1
+        if not hit:
+            continue
+
+        served += 1
+        if record['question'] == label['expected']:
+            correct += 1
+            answerable_served += 1
+        else:
+            mistakes.append((label['question'], record['question'], confidence))
+
+    return {
+        'threshold': threshold,
+        'hit_rate': served / len(labels) if labels else 0.0,
+        'precision': correct / served if served else 1.0,
+        'recall': answerable_served / answerable if answerable else 0.0,
+        'mistakes': mistakes,
+    }
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    thresholds = THRESHOLDS
+    if '--threshold' in args:
+        i = args.index('--threshold')
+        thresholds = [float(args[i + 1])]
+        del args[i:i + 2]
+
+    labels = load_labels(args[0] if args else DEFAULT_LABELS)
+    print(f"{len(labels)} labeled questions")
+    print(f"{'threshold':>9} {'hit rate':>9} {'precision':>9} {'recall':>7}")
+    for threshold in thresholds:
+        result = evaluate(labels, threshold)
+        print(f"{threshold:>9.2f} {result['hit_rate']:>9.2%} {result['precision']:>9.2%} {result['recall']:>7.2%}")
+        for question, matched, confidence in result['mistakes']:
+            print(f"    wrong: {question!r} -> {matched!r} ({confidence:.2f})")
@@ -0,0 +1,100 @@
+"""Time and peak memory of a full message export.
+
+Seeds --messages messages, then runs export_conversations.py as a child
+process for each format and reports rows per second, output size and the
+child's peak RSS. For comparison it also runs the naive export the request
+path would do (fetchall() then serialize), which needs memory in
+proportion to the table.
+
+Usage:
+    python benchmarks/export.py [--messages 2000000]
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from db import connect
+from migrations import migrate
+
+WORDS = 'the a of and to in is for python machine learning project team data model deploy api service'.split()
+
+NAIVE_EXPORT = '''
+import json, sys
+sys.path.insert(0, {root!r})
+from db import DEFAULT_PRAGMAS, connect
+from export import MESSAGES_AFTER
+conn = connect({path!r}, dict(DEFAULT_PRAGMAS, mmap_size=0))
+rows = conn.execute(MESSAGES_AFTER, (0, -1)).fetchall()
+with open({output!r}, 'w') as f:
+    f.write(''.join(json.dumps(dict(zip(('id', 'conversation_id', 'user_id', 'conversation_title', 'is_user',
+                                          'content', 'created_at'), row)), ensure_ascii=False) + '\\n'
+                    for row in rows))
+'''
+
+
+def seed(path, messages):
+    conn = connect(path)
+    migrate(conn)
+    # The export doesn't read the search index or version counters, so
+    # skip their triggers to seed faster
+    for trigger in ('messages_fts_insert', 'messages_version_insert'):
+        conn.execute(f'DROP TRIGGER {trigger}')
+    rng = random.Random(0)
+    conn.executemany('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                     [(f'user{i}', f'user{i}@example.com', 'x') for i in range(100)])
+    conn.executemany('INSERT INTO conversations (user_id, title) VALUES (?, ?)',
+                     [(i % 100 + 1, f'conversation {i}') for i in range(messages // 40 + 1)])
+    batch = 50000
+    for offset in range(0, messages, batch):
+        conn.executemany('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                         [((offset + i) // 40 + 1, i % 2 == 0, ' '.join(rng.choices(WORDS, k=5 if i % 2 == 0 else 40)))
+                          for i in range(min(batch, messages - offset))])
+        conn.commit()
+    conn.close()
+
+
+def run_child(args):
+    """Run a command and return (seconds, peak RSS in MB)"""
+    start = time.perf_counter()
+    # Without the 256 MB mmap window, whose file-backed pages would count
+    # towards RSS, so the figure is the export's own memory
+    process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               env=dict(os.environ, SQLITE_MMAP_SIZE='0'))
+    _, status, usage = os.wait4(process.pid, 0)
+    if status:
+        raise RuntimeError(f'{args} failed with status {status}')
+    # ru_maxrss is in kilobytes on Linux
+    return time.perf_counter() - start, usage.ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'export.db')
+    start = time.perf_counter()
+    seed(path, args.messages)
+    print(f"seeded {args.messages} messages in {time.perf_counter() - start:.0f}s, "
+          f"database {os.path.getsize(path) / 1e6:.0f} MB")
+
+    print(f"{'export':<16} {'seconds':>8} {'rows/s':>10} {'output':>9} {'peak RSS':>9}")
+    runs = [(f'stream {fmt}', fmt, [sys.executable, os.path.join(ROOT, 'export_conversations.py'), path,
+                                    '-o', os.path.join(workdir, f'out.{fmt}'), '--format', fmt])
+            for fmt in ('jsonl', 'csv')]
+    runs.append(('fetchall jsonl', 'naive', [sys.executable, '-c', NAIVE_EXPORT.format(
+        root=ROOT, path=path, output=os.path.join(workdir, 'out.naive'))]))
+    for label, suffix, command in runs:
+        seconds, rss = run_child(command)
+        output = os.path.join(workdir, f'out.{suffix}')
+        print(f"{label:<16} {seconds:>8.1f} {args.messages / seconds:>10.0f} "
+              f"{os.path.getsize(output) / 1e6:>7.0f}MB {rss:>7.0f}MB")
+        os.remove(output)
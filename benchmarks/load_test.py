@@ -0,0 +1,179 @@
+"""Load test /ask against a stub Gemini backend.
+
+Starts the stub Gemini server and a gunicorn instance of the app for each
+worker class, then runs closed-loop virtual users at each concurrency
+level and reports throughput and latency percentiles.
+
+Usage:
+    python benchmarks/load_test.py [--levels 10,100,500] [--duration 10]
+                                   [--latency 1.0] [--worker-classes sync,gthread]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.percentiles import percentile
+from benchmarks.stub_gemini import create_server
+
+APP_PORT = 8050
+STUB_PORT = 8051
+
+
+def request(conn, method, path, body=None, headers=None):
+    conn.request(method, path, body=body, headers=headers or {})
+    response = conn.getresponse()
+    data = response.read()
+    return response, data
+
+
+def login(port):
+    """Sign up a load-test user and return its session cookie"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    form = urllib.parse.urlencode({
+        'username': 'loadtest',
+        'email': 'loadtest@example.com',
+        'password': 'loadtest',
+        'confirm_password': 'loadtest',
+    })
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    response, _ = request(conn, 'POST', '/signup', form, headers)
+    cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    if 'session=' not in cookie:
+        form = urllib.parse.urlencode({'username': 'loadtest', 'password': 'loadtest'})
+        response, _ = request(conn, 'POST', '/login', form, headers)
+        cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    conn.close()
+    return cookie
+
+
+def virtual_user(port, cookie, user_number, deadline, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    headers = {'Content-Type': 'application/json', 'Cookie': cookie}
+    try:
+        _, data = request(conn, 'POST', '/conversation', json.dumps({'title': f'load {user_number}'}), headers)
+        conversation_id = json.loads(data)['id']
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        errors.append(type(e).__name__)
+        conn.close()
+        return
+
+    sent = 0
+    while time.monotonic() < deadline:
+        # Unique questions so neither the cache nor the fast path can answer
+        body = json.dumps({
+            'question': f'Load test question {user_number}-{sent}',
+            'conversation_id': conversation_id,
+        })
+        start = time.monotonic()
+        try:
+            response, data = request(conn, 'POST', '/ask', body, headers)
+            if response.status == 200:
+                latencies.append(time.monotonic() - start)
+            else:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        sent += 1
+    conn.close()
+
+
+def run_level(port, cookie, users, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=virtual_user, args=(port, cookie, i, deadline, latencies, errors))
+        for i in range(users)
+    ]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+
+    return {
+        'users': users,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+    }
+
+
+def start_app(worker_class, workdir):
+    env = dict(
+        os.environ,
+        GEMINI_API_KEY='stub',
+        GEMINI_TRANSPORT='rest',
+        GEMINI_API_ENDPOINT=f'http://127.0.0.1:{STUB_PORT}',
+        SECRET_KEY='load-test',
+        ANSWER_CACHE='none',
+        FAST_PATH_ENABLED='false',
+        # Measure the worker class, not the per-user and upstream limits
+        RATE_LIMIT='none',
+        GEMINI_MAX_CONCURRENCY='10000',
+        GUNICORN_BIND=f'127.0.0.1:{APP_PORT}',
+        GUNICORN_WORKER_CLASS=worker_class,
+    )
+    if worker_class == 'sync':
+        # gunicorn silently switches sync workers to gthread when threads > 1
+        env['GUNICORN_THREADS'] = '1'
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--chdir', workdir, '--pythonpath', ROOT, 'app:create_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=1)
+            request(conn, 'GET', '/login')
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--levels', default='10,100,500')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--worker-classes', default='sync,gthread')
+    args = parser.parse_args()
+
+    stub = create_server(STUB_PORT, args.latency)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    print(f"stub latency {args.latency}s, {args.duration}s per level")
+    print(f"{'workers':<8} {'users':>6} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7}")
+    for worker_class in args.worker_classes.split(','):
+        with tempfile.TemporaryDirectory() as workdir:
+            process = start_app(worker_class, workdir)
+            try:
+                cookie = login(APP_PORT)
+                for users in (int(level) for level in args.levels.split(',')):
+                    result = run_level(APP_PORT, cookie, users, args.duration)
+                    print(f"{worker_class:<8} {result['users']:>6} {result['requests']:>9} {result['errors']:>7} "
+                          f"{result['rps']:>8.1f} {result['p50']:>6.2f}s {result['p95']:>6.2f}s {result['p99']:>6.2f}s")
+            finally:
+                process.terminate()
+                process.wait()
+
+    stub.shutdown()
@@ -0,0 +1,100 @@
+"""Hot history queries on a large generated database, before and after indexes.
+
+Generates users, conversations and messages on schema version 1 (no
+secondary indexes), times the /conversations and /conversation/<id>
+queries, applies the remaining migrations and times them again. Exits
+non-zero if EXPLAIN QUERY PLAN shows a hot query not using its index.
+
+Usage:
+    python benchmarks/message_history.py [--messages 2000000] [--db path]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect
+from migrations import check_query_plans, migrate
+
+MESSAGES_PER_CONVERSATION = 20
+CONVERSATIONS_PER_USER = 25
+
+
+def generate(conn, messages):
+    conversations = max(messages // MESSAGES_PER_CONVERSATION, 1)
+    users = max(conversations // CONVERSATIONS_PER_USER, 1)
+    rng = random.Random(42)
+
+    conn.executemany(
+        'INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)',
+        ((i, f'user{i}', f'user{i}@example.com', 'x') for i in range(1, users + 1))
+    )
+    conn.executemany(
+        'INSERT INTO conversations (id, user_id, title, created_at) VALUES (?, ?, ?, ?)',
+        ((i, rng.randint(1, users), f'Conversation {i}', f'2024-01-01 00:00:{i % 60:02d}')
+         for i in range(1, conversations + 1))
+    )
+
+    def rows():
+        for i in range(messages):
+            conversation_id = rng.randint(1, conversations)
+            yield conversation_id, i % 2 == 0, 'Generated message content ' * 4, f'2024-01-02 {i % 24:02d}:00:00'
+
+    conn.executemany(
+        'INSERT INTO messages (conversation_id, is_user, content, created_at) VALUES (?, ?, ?, ?)', rows()
+    )
+    conn.commit()
+    return users, conversations
+
+
+def time_queries(conn, users, conversations, samples=200):
+    rng = random.Random(7)
+    timings = {}
+    for label, sql, upper in (
+        ('/conversations', 'SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+                           'ORDER BY created_at DESC, id DESC LIMIT 51', users),
+        ('/conversation/<id>', 'SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+                               'ORDER BY created_at DESC, id DESC LIMIT 51', conversations),
+    ):
+        start = time.perf_counter()
+        for _ in range(samples):
+            conn.execute(sql, (rng.randint(1, upper),)).fetchall()
+        timings[label] = (time.perf_counter() - start) / samples
+    return timings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2_000_000)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--db', default=None)
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'history.db')
+    conn = connect(path)
+    migrate(conn, target=1)
+
+    start = time.perf_counter()
+    users, conversations = generate(conn, args.messages)
+    print(f"generated {args.messages} messages, {conversations} conversations, {users} users "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    before = time_queries(conn, users, conversations, args.samples)
+    start = time.perf_counter()
+    migrate(conn)
+    print(f"applied migrations in {time.perf_counter() - start:.1f}s")
+    after = time_queries(conn, users, conversations, args.samples)
+
+    for label in before:
+        print(f"{label:<20} {before[label] * 1000:>9.3f} ms -> {after[label] * 1000:>7.3f} ms "
+              f"({before[label] / after[label]:.0f}x)")
+
+    problems = check_query_plans(conn)
+    conn.close()
+    for sql, plan in problems:
+        print(f"FAIL: {sql}\n    plan: {plan}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,99 @@
+"""Login throughput at the chosen scrypt cost, and its effect on other requests.
+
+Reports verifications per second on one thread and on the hashing pool
+(one thread per core by default), per core, next to the legacy unsalted
+SHA-256 check. While the pool is saturated by a login storm, a probe
+thread repeatedly does a small piece of request-like work; its latency
+shows whether the storm starves the rest of the worker.
+
+Usage:
+    python benchmarks/password_hashing.py [--n 16384] [--r 8] [--p 1]
+                                          [--storm-threads 32] [--duration 5]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.percentiles import percentile
+from passwords import HasherBusy, PasswordHasher
+
+PASSWORD = 'correct horse battery staple'
+
+
+def rate(func, duration):
+    count = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        func()
+        count += 1
+    return count / duration
+
+
+def probe(deadline, latencies):
+    payload = {'answer': 'x' * 500, 'source': 'cache', 'conversation_id': 1}
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        for _ in range(20):
+            json.dumps(payload)
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+
+
+def storm(hasher, stored, deadline, counts):
+    done = busy = 0
+    while time.perf_counter() < deadline:
+        try:
+            hasher.verify(stored, PASSWORD)
+            done += 1
+        except HasherBusy:
+            busy += 1
+            time.sleep(0.01)
+    counts.append((done, busy))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--n', type=int, default=2 ** 14)
+    parser.add_argument('--r', type=int, default=8)
+    parser.add_argument('--p', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--storm-threads', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    hasher = PasswordHasher(n=args.n, r=args.r, p=args.p, max_workers=args.workers)
+    stored = hasher.hash(PASSWORD)
+    legacy = hashlib.sha256(PASSWORD.encode()).hexdigest()
+    cores = os.cpu_count() or 1
+    print(f"scrypt n={args.n} r={args.r} p={args.p}, {args.workers} hashing threads, {cores} cores")
+
+    legacy_rate = rate(lambda: hashlib.sha256(PASSWORD.encode()).hexdigest() == legacy, 1.0)
+    single_rate = rate(lambda: hasher.verify(stored, PASSWORD), args.duration)
+    print(f"legacy sha256    {legacy_rate:>11.0f} verifications/s")
+    print(f"scrypt, 1 thread {single_rate:>11.1f} verifications/s ({1000 / single_rate:.1f} ms each)")
+
+    baseline = []
+    probe(time.perf_counter() + 1.0, baseline)
+
+    deadline = time.perf_counter() + args.duration
+    latencies, counts = [], []
+    threads = [threading.Thread(target=storm, args=(hasher, stored, deadline, counts))
+               for _ in range(args.storm_threads)]
+    threads.append(threading.Thread(target=probe, args=(deadline, latencies)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    done = sum(d for d, _ in counts)
+    busy = sum(b for _, b in counts)
+    print(f"login storm      {done / args.duration:>11.1f} verifications/s "
+          f"({done / args.duration / cores:.1f} per core), {busy} turned away as busy")
+    print(f"probe latency    idle p50 {percentile(baseline, 0.5) * 1000:.2f} ms p99 {percentile(baseline, 0.99) * 1000:.2f} ms, "
+          f"during storm p50 {percentile(latencies, 0.5) * 1000:.2f} ms p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
@@ -0,0 +1,9 @@
+"""Latency percentiles shared by the benchmarks, so their p50/p95/p99 agree."""
+
+
+def percentile(values, fraction):
+    """The nearest-rank fraction percentile of values, 0.0 if there are none"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
@@ -0,0 +1,73 @@
+"""Compare prompt size and latency between full-context and retrieval modes.
+
+Prompts only include the FAQ entries in the answer's language. "full
+(both languages)" shows the size of the full-context prompt when every
+question was sent the English and Bengali FAQ together.
+
+Usage:
+    python benchmarks/prompt_size.py          # prompt size and build time only
+    python benchmarks/prompt_size.py --live   # also time real Gemini calls
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (
+    PROMPT_INSTRUCTIONS, PROMPT_QUESTION_LABEL, PROMPT_SUFFIX,
+    build_prompt, create_app, get_gemini_response, get_knowledge_base,
+)
+from faq_index import estimate_tokens
+
+QUESTIONS = [
+    "Who is Shamim?",
+    "What is your current position?",
+    "What experience does he have with cloud services?",
+    "Which frameworks does he use for ML model serving?",
+    "How can I contact him?",
+    "আপনার বর্তমান পদ কি?",
+    "ক্লাউড পরিষেবাগুলির সাথে তার কী অভিজ্ঞতা আছে?",
+    "শামীম কি LangChain এবং PyTorch ব্যবহার করেন?",
+]
+
+
+def both_languages_prompt(question):
+    faq_text = '\n\n'.join(get_knowledge_base().texts.values())
+    return f"{PROMPT_INSTRUCTIONS}{faq_text}{PROMPT_QUESTION_LABEL}{question}{PROMPT_SUFFIX}"
+
+
+def run(app, mode, live=False, build=build_prompt, label=None):
+    app.config['FAQ_CONTEXT_MODE'] = mode
+    total_chars = 0
+    build_time = 0.0
+    call_time = 0.0
+
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        prompt = build(question)
+        build_time += time.perf_counter() - start
+        total_chars += len(prompt)
+
+        if live:
+            start = time.perf_counter()
+            get_gemini_response(question)
+            call_time += time.perf_counter() - start
+
+    count = len(QUESTIONS)
+    print(f"mode={label or mode}")
+    print(f"  avg prompt chars:  {total_chars / count:.0f}")
+    print(f"  avg prompt tokens: ~{estimate_tokens('x' * (total_chars // count))}")
+    print(f"  avg build time:    {build_time / count * 1000:.3f} ms")
+    if live:
+        print(f"  avg Gemini call:   {call_time / count * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    live = '--live' in sys.argv
+    app = create_app()
+    with app.app_context():
+        get_knowledge_base()  # compile the FAQ before timing
+        run(app, 'full', build=both_languages_prompt, label='full (both languages)')
+        for mode in ('full', 'retrieval'):
+            run(app, mode, live=live)
@@ -0,0 +1,114 @@
+"""Per-user rate limiting and upstream protection against a faulty stub Gemini.
+
+Starts the stub Gemini server with injected latency and 429 failures, and
+loads the app in-process. A few users flood /ask from many threads while
+another user asks at a normal pace. Reports status codes per user, how
+many calls reached the stub at once, and the retry counters. Exits
+non-zero if the flood was not limited, the normal user was throttled, or
+the stub saw more concurrent calls than GEMINI_MAX_CONCURRENCY.
+
+Usage:
+    python benchmarks/rate_limit.py [--flood-threads 20] [--flood-users 3] [--duration 10]
+                                    [--latency 0.5] [--failure-rate 0.2]
+"""
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_gemini import create_server
+
+STUB_PORT = 8052
+
+
+def signup(client, name):
+    client.post('/signup', data={
+        'username': name, 'email': f'{name}@example.com',
+        'password': 'benchmark', 'confirm_password': 'benchmark',
+    })
+
+
+def ask_loop(app, name, group, deadline, pause, results, index):
+    client = app.test_client()
+    client.post('/login', data={'username': name, 'password': 'benchmark'})
+    count = 0
+    while time.monotonic() < deadline:
+        count += 1
+        response = client.post('/ask', json={'question': f'{name} question {index}-{count} about pricing?'})
+        results[group][response.status_code] += 1
+        if response.status_code == 429 and 'Retry-After' not in response.headers:
+            results[group]['missing Retry-After'] += 1
+        time.sleep(pause)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--flood-threads', type=int, default=20)
+    parser.add_argument('--flood-users', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--failure-rate', type=float, default=0.2)
+    parser.add_argument('--max-concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    stub = create_server(STUB_PORT, args.latency, args.failure_rate)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    os.chdir(tempfile.mkdtemp())
+    os.environ.update(
+        GEMINI_API_KEY='stub',
+        GEMINI_TRANSPORT='rest',
+        GEMINI_API_ENDPOINT=f'http://127.0.0.1:{STUB_PORT}',
+        ANSWER_CACHE='none',
+        FAST_PATH_ENABLED='false',
+        COALESCE_REQUESTS='false',
+        RATE_LIMIT_PER_MINUTE='30',
+        RATE_LIMIT_BURST='5',
+        GEMINI_MAX_CONCURRENCY=str(args.max_concurrency),
+        GEMINI_RETRY_BASE_DELAY='0.1',
+    )
+    from app import create_app
+    app = create_app()
+    upstream = app.extensions['smart_faq'].upstream
+
+    flooders = [f'flooder{i}' for i in range(args.flood_users)]
+    for name in flooders + ['regular']:
+        signup(app.test_client(), name)
+
+    results = {'flooder': collections.Counter(), 'regular': collections.Counter()}
+    deadline = time.monotonic() + args.duration
+    threads = [threading.Thread(target=ask_loop,
+                                args=(app, flooders[i % len(flooders)], 'flooder', deadline, 0.0, results, i))
+               for i in range(args.flood_threads)]
+    # Well under 30 requests a minute
+    threads.append(threading.Thread(target=ask_loop, args=(app, 'regular', 'regular', deadline, 3.0, results, 0)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name, counts in results.items():
+        print(f"{name:<8} " + '  '.join(f"{status}: {count}" for status, count in sorted(counts.items(), key=str)))
+    print(f"stub: {stub.stats.requests} requests, {stub.stats.failures} injected failures, "
+          f"max {stub.stats.max_in_flight} concurrent")
+    print(f"upstream: {upstream.stats()}")
+    stub.shutdown()
+
+    problems = []
+    if not results['flooder'][429]:
+        problems.append('flooding users were never rate limited')
+    if results['regular'][429]:
+        problems.append('regular user was rate limited')
+    if results['flooder']['missing Retry-After']:
+        problems.append('429 responses without Retry-After')
+    if stub.stats.max_in_flight > args.max_concurrency:
+        problems.append(f'stub saw {stub.stats.max_in_flight} concurrent calls')
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
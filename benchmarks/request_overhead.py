@@ -0,0 +1,73 @@
+"""Micro-benchmark of the per-request work done before calling Gemini.
+
+"before" rebuilds the generation config, safety settings, GenerativeModel
+and the full prompt f-string on every call, as get_gemini_response used
+to. "after" looks the model up in the registry and renders the
+precompiled prompt template. No network calls are made.
+
+Usage:
+    python benchmarks/request_overhead.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google.generativeai as genai
+
+from app import (
+    GEMINI_MODEL_NAME, PROMPT_INSTRUCTIONS, PROMPT_QUESTION_LABEL, PROMPT_SUFFIX,
+    build_prompt, create_app, get_gemini_model, get_knowledge_base,
+)
+
+QUESTION = "What experience does he have with cloud services?"
+
+
+def legacy_request_setup(question, faq_text):
+    generation_config = {
+        "temperature": 0.2,
+        "top_p": 0.8,
+        "top_k": 40,
+        "max_output_tokens": 1024,
+    }
+    safety_settings = [
+        {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+        {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    ]
+    model = genai.GenerativeModel(
+        model_name=GEMINI_MODEL_NAME,
+        generation_config=generation_config,
+        safety_settings=safety_settings
+    )
+    is_bengali = any('ঀ' <= c <= '৿' for c in question)
+    prompt = f"{PROMPT_INSTRUCTIONS}{faq_text}{PROMPT_QUESTION_LABEL}{question}{PROMPT_SUFFIX}"
+    return model, prompt, is_bengali
+
+
+def registry_request_setup(question):
+    return get_gemini_model(), build_prompt(question)
+
+
+def measure(label, func, iterations):
+    seconds = min(timeit.repeat(lambda: func(QUESTION), number=iterations, repeat=5))
+    print(f"{label:<22} {seconds / iterations * 1e6:10.1f} us/request")
+    return seconds
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    app = create_app()
+    app.app_context().push()
+
+    app.config['FAQ_CONTEXT_MODE'] = 'full'
+    # The whole FAQ in both languages, as it used to be sent
+    faq_text = '\n\n'.join(get_knowledge_base().texts.values())
+    before = measure('before (full)', lambda question: legacy_request_setup(question, faq_text), iterations)
+    after = measure('after (full)', registry_request_setup, iterations)
+    print(f"speedup: {before / after:.1f}x")
+
+    app.config['FAQ_CONTEXT_MODE'] = 'retrieval'
+    measure('after (retrieval)', registry_request_setup, iterations)
@@ -0,0 +1,130 @@
+"""/search query latency with the FTS5 index against a LIKE scan.
+
+Seeds a database through the real migrations with --messages messages
+spread over --users users. Message words are drawn from a Zipf-like
+distribution of English and Bengali words, so some terms are in most
+messages and others in a handful. For each query, reports the median
+latency of search_messages (FTS5, ranked by bm25) and of the equivalent
+LIKE '%word%' scan over the same user's messages, newest first.
+
+Usage:
+    python benchmarks/search.py [--messages 1000000] [--users 100]
+                                [--runs 10] [--db /tmp/search.db]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import connect
+from migrations import migrate
+from search import fts_query, search_messages
+
+ENGLISH = (
+    'the what is your experience with python projects work team data model machine learning '
+    'django flask api deploy aws docker kubernetes database sqlite postgres query index cache '
+    'latency answer question interview salary company role position skills education university '
+    'research paper langchain pipeline vector embedding search ranking contract remote office'
+).split()
+BENGALI = 'আপনার বর্তমান পদ কি অভিজ্ঞতা প্রকল্প কাজ দল শিক্ষা বিশ্ববিদ্যালয় দক্ষতা বেতন অফিস'.split()
+MESSAGE_WORDS = 30
+PAGE_SIZE = 20
+
+# (label, query), from terms in most messages to terms in almost none
+QUERIES = [
+    ('common word', 'the'),
+    ('mid word', 'kubernetes'),
+    ('rare word', 'word4000'),
+    ('bengali word', 'অভিজ্ঞতা'),
+    ('prefix', 'kuber'),
+    ('two words', 'docker latency'),
+]
+
+LIKE_SEARCH = (
+    'SELECT m.id, m.conversation_id, c.title, m.is_user, m.created_at, m.content '
+    'FROM conversations c JOIN messages m ON m.conversation_id = c.id '
+    'WHERE c.user_id = ? AND m.content LIKE ? '
+    'ORDER BY m.id DESC LIMIT ?'
+)
+
+
+def vocabulary():
+    words = ENGLISH[:1] + BENGALI + ENGLISH[1:] + [f'word{i}' for i in range(5000)]
+    # Weight 1/rank, so the first words are everywhere and the last are rare
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+
+def seed(path, messages, users):
+    conn = connect(path)
+    migrate(conn)
+    if conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0] >= messages:
+        return conn
+
+    words, weights = vocabulary()
+    rng = random.Random(0)
+    conversations_per_user = 50
+    conn.executemany('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                     [(f'user{i}', f'user{i}@example.com', 'x') for i in range(users)])
+    conn.executemany('INSERT INTO conversations (user_id, title) VALUES (?, ?)',
+                     [(user_id, f'conversation {i}') for user_id in range(1, users + 1)
+                      for i in range(conversations_per_user)])
+    conversations = users * conversations_per_user
+
+    start = time.perf_counter()
+    batch = 10000
+    for offset in range(0, messages, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, messages)):
+            content = ' '.join(rng.choices(words, weights, k=MESSAGE_WORDS))
+            rows.append((rng.randrange(conversations) + 1, i % 2 == 0, content))
+        conn.executemany('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)', rows)
+        conn.commit()
+    print(f"seeded {messages} messages in {time.perf_counter() - start:.0f}s, "
+          f"database {os.path.getsize(path) / 1e6:.0f} MB")
+    return conn
+
+
+def median_ms(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        rows = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000, len(rows)
+
+
+def like_search(conn, user_id, text, limit):
+    rows = conn.execute(LIKE_SEARCH, (user_id, '%' + text.split()[0] + '%', limit * 10)).fetchall()
+    # LIKE takes one pattern, so the other words are filtered in Python
+    rest = text.split()[1:]
+    return [row for row in rows if all(word in row['content'] for word in rest)][:limit]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--db', help='database file to seed, or reuse if already seeded')
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'search.db')
+    conn = seed(path, args.messages, args.users)
+    user_id = 1
+    per_user = conn.execute('SELECT COUNT(*) FROM messages m JOIN conversations c ON c.id = m.conversation_id '
+                            'WHERE c.user_id = ?', (user_id,)).fetchone()[0]
+    print(f"{args.messages} messages, {per_user} of them the searching user's, "
+          f"median of {args.runs} runs, {PAGE_SIZE} results per page")
+    print(f"{'query':<14} {'matches':>9} {'fts5':>10} {'like':>10}")
+    for label, text in QUERIES:
+        fts, _ = median_ms(lambda: search_messages(conn, user_id, text, PAGE_SIZE), args.runs)
+        like, _ = median_ms(lambda: like_search(conn, user_id, text, PAGE_SIZE), args.runs)
+        matches = conn.execute('SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH ?',
+                               (fts_query(text),)).fetchone()[0]
+        print(f"{label:<14} {matches:>9} {fts:>8.2f}ms {like:>8.2f}ms")
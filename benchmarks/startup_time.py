@@ -0,0 +1,102 @@
+"""Import and app-factory startup time, from `python -X importtime`.
+
+Imports the app in a fresh interpreter with -X importtime, reports the
+total and the slowest modules, then times create_app(). Exits non-zero if
+a module that should be deferred to first use (google.generativeai,
+numpy) is loaded by the import or by create_app(), or if the import takes
+longer than --budget-ms, so it can run as a CI step.
+
+Usage:
+    python benchmarks/startup_time.py [--top 10] [--budget-ms 1000] [--runs 5]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Loaded on first use instead of at startup
+DEFERRED_MODULES = ('google.generativeai', 'numpy')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+FACTORY_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def run_python(args, cwd):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='')
+    return subprocess.run([sys.executable] + args, cwd=cwd, env=env, capture_output=True, text=True, check=True)
+
+
+def importtime(cwd):
+    """Return [(self_us, cumulative_us, depth, module)] for `import app`"""
+    result = run_python(['-X', 'importtime', '-c', 'import app'], cwd)
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            entries.append((int(own), int(cumulative), len(indent) // 2, name))
+    return entries
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=1000.0)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # Run from an empty directory so create_app() doesn't touch a real database
+    workdir = tempfile.mkdtemp()
+    env_path = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    os.environ['PYTHONPATH'] = env_path
+    os.environ.setdefault('DATABASE', os.path.join(workdir, 'startup.db'))
+
+    # The first run warms the bytecode cache
+    importtime(workdir)
+    runs = [importtime(workdir) for _ in range(args.runs)]
+    totals = [next(cumulative for _, cumulative, depth, name in entries if name == 'app' and depth == 0)
+              for entries in runs]
+    entries = runs[-1]
+
+    print(f"import app: median {median(totals) / 1000:.1f} ms over {args.runs} runs")
+    print("slowest top-level imports:")
+    top_level = sorted((e for e in entries if e[2] == 1), key=lambda e: -e[1])[:args.top]
+    for own, cumulative, _, name in top_level:
+        print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+
+    factory = [json.loads(run_python(['-c', FACTORY_SCRIPT], workdir).stdout) for _ in range(args.runs)]
+    print(f"create_app(): median {median([f['create_app'] for f in factory]) * 1000:.1f} ms")
+
+    problems = []
+    loaded = set(factory[-1]['modules'])
+    for module in DEFERRED_MODULES:
+        if module in loaded:
+            problems.append(f"{module} is imported at startup")
+    if median(totals) / 1000 > args.budget_ms:
+        problems.append(f"import took {median(totals) / 1000:.0f} ms, budget is {args.budget_ms:.0f} ms")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,125 @@
+"""Local stand-in for the Gemini REST API, for load tests.
+
+Answers generateContent and streamGenerateContent with a canned reply
+after a configurable delay, so the app can be exercised without network
+access or API quota. A fraction of requests can be made to fail with 429
+or 503 to exercise retries. Point the app at it with:
+
+    GEMINI_TRANSPORT=rest GEMINI_API_ENDPOINT=http://127.0.0.1:8001
+
+Usage:
+    python benchmarks/stub_gemini.py [--port 8001] [--latency 1.0]
+                                     [--failure-rate 0.0]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = "This is a stubbed Gemini answer about Shamim Md. Jony."
+
+
+def candidate(text):
+    return {
+        'candidates': [{
+            'content': {'parts': [{'text': text}], 'role': 'model'},
+            'finishReason': 'STOP',
+            'index': 0,
+        }],
+    }
+
+
+class StubStats:
+    """Requests seen by a stub server, and how many ran at once"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def enter(self):
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def leave(self, failed):
+        with self.lock:
+            self.in_flight -= 1
+            self.failures += failed
+
+
+class StubGeminiHandler(BaseHTTPRequestHandler):
+    latency = 1.0
+    failure_rate = 0.0
+    stats = None
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        failed = random.random() < self.failure_rate
+        self.stats.enter()
+        try:
+            time.sleep(self.latency)
+        finally:
+            self.stats.leave(failed)
+
+        if failed:
+            body = json.dumps({'error': {'code': 429, 'message': 'Resource has been exhausted',
+                                         'status': 'RESOURCE_EXHAUSTED'}}).encode('utf-8')
+            self.send_response(429)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if ':streamGenerateContent' in self.path:
+            words = ANSWER.split(' ')
+            chunks = [candidate(word + ' ') for word in words]
+            body = json.dumps(chunks).encode('utf-8')
+        elif ':generateContent' in self.path:
+            body = json.dumps(candidate(ANSWER)).encode('utf-8')
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def create_server(port=8001, latency=1.0, failure_rate=0.0):
+    """Create (but don't start) a stub server; its counters are server.stats"""
+    stats = StubStats()
+    handler = type('Handler', (StubGeminiHandler,), {
+        'latency': latency, 'failure_rate': failure_rate, 'stats': stats,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.stats = stats
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = create_server(args.port, args.latency, args.failure_rate)
+    print(f"Stub Gemini listening on http://127.0.0.1:{args.port} "
+          f"(latency {args.latency}s, failure rate {args.failure_rate:.0%})")
+    server.serve_forever()
@@ -0,0 +1,287 @@
+"""Benchmark suite for the main endpoints, run against the stub LLM backend.
+
+Seeds a database, starts the app under gunicorn with LLM_BACKEND=stub (no
+network or API key needed), runs each scenario with closed-loop virtual
+users and reports throughput and p50/p95/p99 latency. --save writes the
+results with the commit they were measured on. --compare prints the
+change against a saved file and exits non-zero if a scenario's p95 or
+throughput got worse by more than --max-regression, so two commits can
+be compared on the same machine.
+
+Scenarios:
+    ask_llm        /ask with unique questions, answered by the stub
+    ask_cached     /ask repeating one question, served by the answer cache
+    ask_faq        /ask with FAQ questions, served by the local fast path
+    conversations  GET /conversations, a user with 100 conversations
+    conversation   GET /conversation/<id>, a conversation with 200 messages
+    revalidate     the same with If-None-Match, answered 304 Not Modified
+    login          POST /login
+    signup         POST /signup, a new user every time
+
+Usage:
+    python benchmarks/suite.py [--scenarios ask_llm,login] [--users 16]
+                               [--duration 5] [--stub-latency 0.2]
+                               [--save results.json] [--compare baseline.json]
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import request
+from benchmarks.percentiles import percentile
+
+APP_PORT = 8060
+USERNAME = 'bench'
+PASSWORD = 'bench-password'
+FAQ_QUESTIONS = [
+    'What is your current position?',
+    'Where can I see his work or contributions?',
+    'আপনার বর্তমান পদ কি?',
+]
+
+FORM = {'Content-Type': 'application/x-www-form-urlencoded'}
+JSON = {'Content-Type': 'application/json'}
+
+
+def seed(path):
+    """Create the benchmark user, its conversations and a long conversation"""
+    from app import create_app, get_db_connection, hash_password
+
+    app = create_app({'DATABASE': path, 'LLM_BACKEND': 'stub', 'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        conn = get_db_connection()
+        user_id = conn.execute('INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)',
+                               (USERNAME, 'bench@example.com', hash_password(PASSWORD))).lastrowid
+        conn.executemany('INSERT INTO conversations (user_id, title) VALUES (?, ?)',
+                         [(user_id, f'Conversation {i}') for i in range(100)])
+        conversation_id = conn.execute('SELECT MAX(id) FROM conversations').fetchone()[0]
+        conn.executemany('INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)',
+                         [(conversation_id, i % 2 == 0, f'Message {i} ' + 'text ' * 40) for i in range(200)])
+        conn.commit()
+    return conversation_id
+
+
+def start_app(path, workdir, args):
+    env = dict(
+        os.environ,
+        DATABASE=path,
+        SECRET_KEY='benchmark-suite',
+        LOG_LEVEL='WARNING',
+        LLM_BACKEND='stub',
+        STUB_LLM_LATENCY=str(args.stub_latency),
+        STUB_LLM_TOKENS_PER_SECOND=str(args.stub_tokens_per_second),
+        STUB_LLM_ERROR_RATE=str(args.stub_error_rate),
+        # Measure the endpoints, not the per-user and upstream limits
+        RATE_LIMIT='none',
+        GEMINI_MAX_CONCURRENCY='10000',
+        GUNICORN_BIND=f'127.0.0.1:{APP_PORT}',
+        GUNICORN_WORKERS=str(args.workers),
+    )
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--chdir', workdir, '--pythonpath', ROOT, 'app:create_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=1)
+            request(conn, 'GET', '/login')
+            conn.close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError('gunicorn did not start')
+
+
+def login_form():
+    return urllib.parse.urlencode({'username': USERNAME, 'password': PASSWORD})
+
+
+def session_cookie():
+    conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=30)
+    response, _ = request(conn, 'POST', '/login', login_form(), FORM)
+    conn.close()
+    cookie = response.getheader('Set-Cookie', '').split(';')[0]
+    if 'session=' not in cookie:
+        raise RuntimeError('could not log in as the benchmark user')
+    return cookie
+
+
+def conversation_etag(cookie, conversation_id):
+    conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=30)
+    response, _ = request(conn, 'GET', f'/conversation/{conversation_id}', headers={'Cookie': cookie})
+    conn.close()
+    return response.getheader('ETag')
+
+
+# Each scenario returns (method, path, body, headers, expected status) for
+# one request of one virtual user
+SCENARIOS = {
+    'ask_llm': lambda ctx, user, i: (
+        'POST', '/ask', json.dumps({'question': f"Benchmark question {ctx['run']} {user}-{i}"}),
+        dict(JSON, Cookie=ctx['cookie']), 200),
+    'ask_cached': lambda ctx, user, i: (
+        'POST', '/ask', json.dumps({'question': 'Tell me about the benchmark suite'}),
+        dict(JSON, Cookie=ctx['cookie']), 200),
+    'ask_faq': lambda ctx, user, i: (
+        'POST', '/ask', json.dumps({'question': FAQ_QUESTIONS[i % len(FAQ_QUESTIONS)]}),
+        dict(JSON, Cookie=ctx['cookie']), 200),
+    'conversations': lambda ctx, user, i: (
+        'GET', '/conversations', None, {'Cookie': ctx['cookie']}, 200),
+    'conversation': lambda ctx, user, i: (
+        'GET', f"/conversation/{ctx['conversation_id']}", None, {'Cookie': ctx['cookie']}, 200),
+    'revalidate': lambda ctx, user, i: (
+        'GET', f"/conversation/{ctx['conversation_id']}", None,
+        {'Cookie': ctx['cookie'], 'If-None-Match': ctx['etag']}, 304),
+    'login': lambda ctx, user, i: (
+        'POST', '/login', login_form(), FORM, 302),
+    'signup': lambda ctx, user, i: (
+        'POST', '/signup', urllib.parse.urlencode({
+            'username': f"u{ctx['run']}_{user}_{i}", 'email': f"u{ctx['run']}_{user}_{i}@example.com",
+            'password': PASSWORD, 'confirm_password': PASSWORD,
+        }), FORM, 302),
+}
+
+
+def virtual_user(scenario, ctx, user, deadline, latencies, errors):
+    conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=120)
+    i = 0
+    while time.monotonic() < deadline:
+        method, path, body, headers, expected = scenario(ctx, user, i)
+        start = time.monotonic()
+        try:
+            response, data = request(conn, method, path, body, headers)
+            if response.status == expected and b'event: error' not in data:
+                latencies.append(time.monotonic() - start)
+            else:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', APP_PORT, timeout=120)
+        i += 1
+    conn.close()
+
+
+def run_scenario(name, ctx, users, duration):
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+    threads = [threading.Thread(target=virtual_user, args=(SCENARIOS[name], ctx, user, deadline, latencies, errors))
+               for user in range(users)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - start
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def current_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(results, baseline, max_regression):
+    """Print the change from a saved run and return the scenarios that regressed"""
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('date')})")
+    print(f"{'scenario':<14} {'req/s':>16} {'p50':>18} {'p95':>18} {'p99':>18}")
+    regressions = []
+    for name, result in results.items():
+        before = baseline['results'].get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change = (result[key] - before[key]) / before[key] if before[key] else 0.0
+            cells.append(f"{before[key]:>7} {change:>+7.1%}")
+        print(f"{name:<14} " + ' '.join(f'{cell:>18}' for cell in cells))
+        if before['p95_ms'] and (result['p95_ms'] - before['p95_ms']) / before['p95_ms'] > max_regression:
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if before['rps'] and (before['rps'] - result['rps']) / before['rps'] > max_regression:
+            regressions.append(f"{name}: throughput {before['rps']} -> {result['rps']} req/s")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--stub-latency', type=float, default=0.2)
+    parser.add_argument('--stub-tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.20)
+    args = parser.parse_args()
+
+    names = args.scenarios.split(',')
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'bench.db')
+        ctx = {'run': uuid.uuid4().hex[:8], 'conversation_id': seed(path)}
+        process = start_app(path, workdir, args)
+        try:
+            ctx['cookie'] = session_cookie()
+            ctx['etag'] = conversation_etag(ctx['cookie'], ctx['conversation_id'])
+            print(f"{args.users} users, {args.duration}s per scenario, {args.workers} workers, "
+                  f"stub latency {args.stub_latency}s")
+            print(f"{'scenario':<14} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+            results = {}
+            for name in names:
+                result = results[name] = run_scenario(name, ctx, args.users, args.duration)
+                print(f"{name:<14} {result['requests']:>9} {result['errors']:>7} {result['rps']:>8.1f} "
+                      f"{result['p50_ms']:>7.1f}ms {result['p95_ms']:>7.1f}ms {result['p99_ms']:>7.1f}ms")
+        finally:
+            process.terminate()
+            process.wait()
+
+    if args.save:
+        report = {
+            'commit': current_commit(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'settings': {key: value for key, value in vars(args).items() if key not in ('save', 'compare')},
+            'results': results,
+        }
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+    sys.exit(1 if regressions else 0)
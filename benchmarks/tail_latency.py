@@ -0,0 +1,145 @@
+"""Answer latency tail with deadlines, hedged requests and a fallback model.
+
+Drives the LLM invocation layer directly with the stub backend, whose
+calls take --latency seconds except a --slow-rate fraction that take
+--slow-latency. Several threads ask --requests questions under each
+policy. For each policy it reports the p50/p99/max latency, how many
+calls failed and how many backend calls were made for them. Then it
+checks the app with a stub slower than the deadline: a question near an
+FAQ entry is answered from the FAQ, others get a structured error, and
+nothing but real answers is saved. Exits non-zero if a check fails.
+
+Usage:
+    python benchmarks/tail_latency.py [--requests 400] [--threads 8] [--latency 0.1]
+                                      [--slow-rate 0.03] [--slow-latency 2] [--deadline 1]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.percentiles import percentile
+from llm_backend import StubLLMBackend
+from llm_invoker import LLMError, LLMInvoker
+from upstream import UpstreamLimiter
+
+FALLBACK_MODEL = 'stub-fallback'
+
+
+def run_policy(args, **policy):
+    backend = StubLLMBackend(latency=args.latency, tokens_per_second=0, answer_tokens=20, seed=1,
+                             slow_rate=args.slow_rate, slow_latency=args.slow_latency,
+                             model_latencies={FALLBACK_MODEL: args.latency})
+    # Room for abandoned slow calls, so hedges aren't skipped for want of a slot
+    upstream = UpstreamLimiter(max_concurrency=args.threads * 4, retries=0, retryable=backend.retryable)
+    invoker = LLMInvoker(backend, upstream, 'stub', min_samples=50, **policy)
+    latencies = []
+    failed = []
+    counter = iter(range(args.requests))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.monotonic()
+            try:
+                invoker.generate(f'question {i}')
+            except LLMError as e:
+                failed.append(e.code)
+            latencies.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Let abandoned attempts finish so their calls are counted
+    time.sleep(args.slow_latency)
+    return {
+        'p50': percentile(latencies, 0.50),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies),
+        'failed': len(failed),
+        'backend_calls': upstream.stats()['calls'],
+        'stats': invoker.stats(),
+    }
+
+
+def check_app(args):
+    """Ask the app with a model that never answers in time"""
+    os.environ.update(
+        LLM_BACKEND='stub', STUB_LLM_LATENCY=str(args.slow_latency), STUB_LLM_TOKENS_PER_SECOND='0',
+        GEMINI_DEADLINE='0.3', FAST_PATH_ENABLED='false', RATE_LIMIT='none', COALESCE_REQUESTS='false',
+        DATABASE=os.path.join(tempfile.mkdtemp(), 'tail_latency.db'), LOG_LEVEL='ERROR',
+    )
+    from app import create_app
+
+    client = create_app().test_client()
+    client.post('/signup', data={'username': 'tail', 'email': 'tail@example.com',
+                                 'password': 'benchmark', 'confirm_password': 'benchmark'})
+    conversation_id = client.post('/conversation', json={'title': 'tail latency'}).json['id']
+    failures = []
+
+    response = client.post('/ask', json={'question': 'What is your current position?',
+                                         'conversation_id': conversation_id})
+    if response.json.get('source') != 'faq_fallback':
+        failures.append(f'FAQ question was not answered from the FAQ: {response.status_code} {response.json}')
+    response = client.post('/ask', json={'question': 'zzqx qqq', 'conversation_id': conversation_id})
+    if response.status_code != 504 or response.json.get('code') != 'deadline_exceeded':
+        failures.append(f'late answer was not a 504 error: {response.status_code} {response.json}')
+    body = client.post('/ask/stream', json={'question': 'zzqx qqq',
+                                            'conversation_id': conversation_id}).get_data(as_text=True)
+    if 'event: error' not in body or 'deadline_exceeded' not in body:
+        failures.append(f'late stream did not end with an error event: {body!r}')
+    messages = client.get(f'/conversation/{conversation_id}').json['messages']
+    if len(messages) != 2:
+        failures.append(f'expected only the FAQ answer to be saved, found {len(messages)} messages')
+    return failures
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--slow-rate', type=float, default=0.03)
+    parser.add_argument('--slow-latency', type=float, default=2.0)
+    parser.add_argument('--deadline', type=float, default=1.0)
+    args = parser.parse_args()
+
+    policies = [
+        ('no deadline', {'deadline': args.slow_latency * 10}),
+        ('deadline', {'deadline': args.deadline}),
+        ('deadline + hedge', {'deadline': args.deadline, 'hedge': True, 'hedge_delay': args.latency * 3}),
+        ('deadline + fallback', {'deadline': args.deadline, 'fallback_model': FALLBACK_MODEL,
+                                 'fallback_reserve': args.deadline / 2}),
+        ('all three', {'deadline': args.deadline, 'hedge': True, 'hedge_delay': args.latency * 3,
+                       'fallback_model': FALLBACK_MODEL, 'fallback_reserve': args.deadline / 2}),
+    ]
+    print(f"{args.requests} requests, {args.latency:g}s calls with {args.slow_rate:.0%} taking {args.slow_latency:g}s")
+    print(f"{'policy':<20} {'p50':>7} {'p99':>7} {'max':>7} {'failed':>7} {'calls':>6} {'hedges won':>11} "
+          f"{'fallbacks won':>14}")
+    failures = []
+    for label, policy in policies:
+        result = run_policy(args, **policy)
+        stats = result['stats']
+        print(f"{label:<20} {result['p50']:>6.3f}s {result['p99']:>6.3f}s {result['max']:>6.3f}s "
+              f"{result['failed']:>7} {result['backend_calls']:>6} "
+              f"{stats['hedge_wins']:>5}/{stats['hedged']:<5} {stats['fallback_wins']:>6}/{stats['fallbacks']:<7}")
+        if policy['deadline'] == args.deadline and result['max'] > args.deadline + 0.1:
+            failures.append(f'{label}: a call took {result["max"]:.3f}s, past the {args.deadline:g}s deadline')
+        if 'fallback_model' in policy and result['failed']:
+            failures.append(f'{label}: {result["failed"]} calls failed despite the fallback model')
+
+    failures += check_app(args)
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
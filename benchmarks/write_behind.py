@@ -0,0 +1,92 @@
+"""save_messages latency with direct writes and with the write-behind queue.
+
+Request threads save question/answer pairs while a contender thread keeps
+taking the SQLite write lock for a few milliseconds at a time, standing in
+for the other gunicorn workers writing to the same database. Reports the
+per-call latency seen by the request threads, and for write-behind how
+long the queue took to drain afterwards.
+
+Usage:
+    python benchmarks/write_behind.py [--threads 16] [--duration 5]
+                                      [--lock-hold-ms 5] [--lock-every-ms 10]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, get_db_connection, save_messages
+from benchmarks.percentiles import percentile
+from db import connect
+
+CONVERSATIONS = 50
+
+
+def contend(path, deadline, hold, every):
+    conn = connect(path)
+    while time.perf_counter() < deadline:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute("UPDATE users SET email = email WHERE id = 1")
+        time.sleep(hold)
+        conn.commit()
+        time.sleep(every)
+    conn.close()
+
+
+def request_thread(app, deadline, worker, latencies):
+    with app.app_context():
+        count = 0
+        while time.perf_counter() < deadline:
+            conversation_id = (worker * 7 + count) % CONVERSATIONS + 1
+            start = time.perf_counter()
+            save_messages(1, conversation_id, f'question {worker}-{count}', 'answer ' * 40)
+            latencies.append(time.perf_counter() - start)
+            count += 1
+
+
+def run(label, write_behind, args):
+    path = os.path.join(tempfile.mkdtemp(), 'write_behind.db')
+    app = create_app({'DATABASE': path, 'MESSAGE_WRITE_BEHIND': write_behind, 'LOG_LEVEL': 'WARNING'})
+    with app.app_context():
+        conn = get_db_connection()
+        conn.execute("INSERT INTO users (username, email, password_hash) VALUES ('bench', 'bench@example.com', 'x')")
+        conn.executemany('INSERT INTO conversations (user_id, title) VALUES (1, ?)',
+                         [(f'conversation {i}',) for i in range(CONVERSATIONS)])
+        conn.commit()
+
+    deadline = time.perf_counter() + args.duration
+    latencies = []
+    threads = [threading.Thread(target=request_thread, args=(app, deadline, i, latencies))
+               for i in range(args.threads)]
+    threads.append(threading.Thread(target=contend, args=(
+        path, deadline, args.lock_hold_ms / 1000, args.lock_every_ms / 1000)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    drain_start = time.perf_counter()
+    app.extensions['smart_faq'].close()
+    drain = time.perf_counter() - drain_start
+    saved = connect(path).execute('SELECT COUNT(*) FROM messages').fetchone()[0] // 2
+
+    print(f"{label:<13} {len(latencies) / args.duration:>8.0f} saves/s   "
+          f"p50 {percentile(latencies, 0.5) * 1000:7.2f} ms   p95 {percentile(latencies, 0.95) * 1000:7.2f} ms   "
+          f"p99 {percentile(latencies, 0.99) * 1000:7.2f} ms   {saved} pairs stored"
+          + (f", drained in {drain * 1000:.0f} ms" if write_behind else ''))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--lock-hold-ms', type=float, default=5.0)
+    parser.add_argument('--lock-every-ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    run('direct', False, args)
+    run('write-behind', True, args)
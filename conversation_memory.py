@@ -0,0 +1,167 @@
+import threading
+from collections import OrderedDict
+
+from faq_index import TOKEN_PATTERN, estimate_tokens
+
+# Words that only ever point back at an earlier turn. "he" and "his"
+# aren't among them: in this FAQ they mean Shamim, not something said before
+FOLLOW_UP_WORDS = frozenset({
+    'else', 'again', 'above', 'previous', 'earlier', 'elaborate',
+    'এটা', 'এটি', 'ওটা', 'সেটা', 'সেটি', 'এগুলো', 'সেগুলো', 'আগের',
+})
+
+# Pronouns that refer back when they end the question ("why is that?",
+# "tell me more about it") but are often dummies elsewhere ("is it
+# possible to...", "is there a portfolio?")
+TRAILING_PRONOUNS = frozenset({'it', 'that', 'this', 'these', 'those', 'them', 'one'})
+
+# A question made only of these asks about the previous answer ("why?")
+QUESTION_WORDS = frozenset({
+    'why', 'how', 'what', 'when', 'where', 'which', 'who', 'so', 'really',
+    'কেন', 'কিভাবে', 'কী', 'কি', 'কোথায়', 'কখন', 'তাই',
+})
+
+# Openings that continue the previous question ("and in Python?")
+FOLLOW_UP_OPENERS = ('and', 'but', 'so', 'also', 'then', 'what about', 'how about', 'আর', 'তাহলে')
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to roughly max_tokens"""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + '...'
+
+
+def is_follow_up(question):
+    """Whether a question needs the conversation before it to be understood.
+
+    True when it opens as a continuation, uses a word that only refers
+    back, ends on a pronoun, or is nothing but question words ("why?").
+    Only these questions get the conversation history in their prompt, so
+    a short standalone question ("who is Shamim?", "hi") is still
+    answered, and cached, the same in every conversation.
+    """
+    tokens = TOKEN_PATTERN.findall(question.lower())
+    if not tokens:
+        return False
+    opening = ' '.join(tokens[:2])
+    if any(opening == opener or opening.startswith(opener + ' ') for opener in FOLLOW_UP_OPENERS):
+        return True
+    if any(token in FOLLOW_UP_WORDS for token in tokens):
+        return True
+    return tokens[-1] in TRAILING_PRONOUNS or all(token in QUESTION_WORDS for token in tokens)
+
+
+class ConversationMemory:
+    """Token-budgeted prompt history per conversation, updated incrementally.
+
+    Each cached conversation keeps its most recent turns verbatim (long
+    turns truncated to max_turn_tokens) and a rolling summary of the
+    questions asked in older turns. Whenever the total goes over
+    token_budget, the oldest turns are folded into the summary, whose own
+    size is capped at a quarter of the budget.
+
+    A conversation is loaded from the database once, reading only its last
+    load_messages messages. After that, messages saved in this process are
+    appended through record(), and messages saved by other workers are
+    picked up by querying for ids above the last one seen.
+    """
+
+    def __init__(self, token_budget=1000, max_turn_tokens=200, load_messages=20, max_conversations=1024):
+        self.token_budget = token_budget
+        self.max_turn_tokens = max_turn_tokens
+        self.load_messages = load_messages
+        self.max_conversations = max_conversations
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _new_state(self):
+        return {
+            'turns': [], 'turn_tokens': 0,
+            'summary': [], 'summary_tokens': 0,
+            'last_id': 0, 'lock': threading.Lock(),
+        }
+
+    def _add(self, state, message_id, is_user, content):
+        if message_id <= state['last_id']:
+            return
+        text = truncate_to_tokens(content, self.max_turn_tokens)
+        tokens = estimate_tokens(text)
+        state['turns'].append((bool(is_user), text, tokens))
+        state['turn_tokens'] += tokens
+        state['last_id'] = message_id
+        self._fit(state)
+
+    def _fit(self, state):
+        summary_budget = self.token_budget // 4
+        while state['turns'] and state['turn_tokens'] + state['summary_tokens'] > self.token_budget:
+            is_user, text, tokens = state['turns'].pop(0)
+            state['turn_tokens'] -= tokens
+            if is_user:
+                # Older questions survive, shortened, in the rolling summary
+                question = truncate_to_tokens(text, 30)
+                state['summary'].append((question, estimate_tokens(question)))
+                state['summary_tokens'] += state['summary'][-1][1]
+            while state['summary'] and state['summary_tokens'] > summary_budget:
+                state['summary_tokens'] -= state['summary'].pop(0)[1]
+
+    def _load(self, conn, conversation_id):
+        state = self._new_state()
+        rows = conn.execute('SELECT id, is_user, content FROM messages WHERE conversation_id = ? '
+                            'ORDER BY created_at DESC, id DESC LIMIT ?',
+                            (conversation_id, self.load_messages)).fetchall()
+        for row in reversed(rows):
+            self._add(state, row['id'], row['is_user'], row['content'])
+        return state
+
+    def _catch_up(self, conn, conversation_id, state):
+        # The newest messages, like _load: if more than load_messages arrived
+        # the oldest of them are the ones left out
+        rows = conn.execute('SELECT id, is_user, content FROM messages WHERE conversation_id = ? AND id > ? '
+                            'ORDER BY id DESC LIMIT ?',
+                            (conversation_id, state['last_id'], self.load_messages)).fetchall()
+        for row in reversed(rows):
+            self._add(state, row['id'], row['is_user'], row['content'])
+
+    def _get_or_load(self, conn, conversation_id):
+        with self._lock:
+            state = self._states.get(conversation_id)
+            if state is not None:
+                self._states.move_to_end(conversation_id)
+                return state, False
+
+        loaded = self._load(conn, conversation_id)
+        with self._lock:
+            state = self._states.setdefault(conversation_id, loaded)
+            self._states.move_to_end(conversation_id)
+            while len(self._states) > self.max_conversations:
+                self._states.popitem(last=False)
+        return state, state is loaded
+
+    def history(self, conn, conversation_id):
+        """Return the formatted history to include in the prompt"""
+        state, fresh = self._get_or_load(conn, conversation_id)
+        with state['lock']:
+            if not fresh:
+                self._catch_up(conn, conversation_id, state)
+            return self.format(state)
+
+    def record(self, conversation_id, messages):
+        """Append newly saved (id, is_user, content) messages to a cached conversation"""
+        with self._lock:
+            state = self._states.get(conversation_id)
+        if state is None:
+            return
+        with state['lock']:
+            for message_id, is_user, content in messages:
+                self._add(state, message_id, is_user, content)
+
+    def format(self, state):
+        """Render a conversation's summary and recent turns as prompt text"""
+        lines = []
+        if state['summary']:
+            lines.append('Earlier the user asked: ' + '; '.join(question for question, _ in state['summary']))
+        for is_user, text, _ in state['turns']:
+            lines.append(f"{'User' if is_user else 'Assistant'}: {text}")
+        return '\n    '.join(lines)
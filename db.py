@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import threading
+
+# WAL lets readers proceed while a writer commits, and synchronous=NORMAL is
+# durable across application crashes in WAL mode (only an OS crash can lose
+# the last transactions). busy_timeout makes writers queue instead of
+# failing immediately with "database is locked". auto_vacuum only takes
+# effect on a new database (before its first table), and lets the archiver
+# hand freed pages back with incremental_vacuum.
+DEFAULT_PRAGMAS = {
+    'auto_vacuum': 'INCREMENTAL',
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -16000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+# Prepared statements kept per connection; Python's sqlite3 reuses them by
+# SQL text, which only pays off when connections outlive a request
+STATEMENT_CACHE_SIZE = 256
+
+
+def connect(path, pragmas=None):
+    """Open a tuned SQLite connection"""
+    conn = sqlite3.connect(path, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    for name, value in (pragmas or DEFAULT_PRAGMAS).items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """One long-lived SQLite connection per thread (and per process).
+
+    gthread workers reuse their threads across requests, so each thread
+    keeps its connection, page cache and prepared statements instead of
+    reconnecting on every request. Connections are reopened after a fork so
+    gunicorn workers never share the master's handle.
+    """
+
+    def __init__(self, path, pragmas=None):
+        self.path = path
+        self.pragmas = pragmas or DEFAULT_PRAGMAS
+        self._local = threading.local()
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path, self.pragmas)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def release(self):
+        """Return the connection to a clean state at the end of a request"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid() and conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            if self._local.pid == os.getpid():
+                conn.close()
+            self._local.conn = None
+
+
+def pragmas_from_config(config):
+    """Build the pragma set from app config overrides"""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for name in ('synchronous', 'cache_size', 'mmap_size', 'busy_timeout'):
+        value = config.get(f'SQLITE_{name.upper()}')
+        if value is not None:
+            pragmas[name] = value
+    return pragmas
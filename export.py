@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+
+from archive import unpack_messages
+
+FIELDS = ('id', 'conversation_id', 'user_id', 'conversation_title', 'role', 'content', 'created_at')
+
+# One page of messages after a watermark id, with the conversation they belong to
+MESSAGES_AFTER = (
+    'SELECT m.id, m.conversation_id, c.user_id, c.title, m.is_user, m.content, m.created_at '
+    'FROM messages m JOIN conversations c ON c.id = m.conversation_id '
+    'WHERE m.id > ? ORDER BY m.id LIMIT ?'
+)
+
+
+def _record(message_id, conversation_id, user_id, title, is_user, content, created_at):
+    return {
+        'id': message_id,
+        'conversation_id': conversation_id,
+        'user_id': user_id,
+        'conversation_title': title,
+        'role': 'user' if is_user else 'assistant',
+        'content': content,
+        'created_at': created_at,
+    }
+
+
+def iter_messages(conn, since_id=0, batch_size=1000, include_archived=None):
+    """Yield every message with an id above since_id as a dict, oldest first.
+
+    Reads in keyset pages of batch_size rows, each its own short query, so
+    memory stays flat and no read transaction is held open for the whole
+    export (a long one would stop WAL checkpoints). Messages committed
+    while the export runs are included if their id comes after the page
+    being read.
+
+    Archived conversations are decompressed and exported after the hot
+    messages, by default only for a full export (since_id 0). Conversations
+    are only archived long after their last message, so an incremental
+    export that runs more often than that has already seen them.
+    """
+    last_id = since_id
+    while True:
+        rows = conn.execute(MESSAGES_AFTER, (last_id, batch_size)).fetchall()
+        for row in rows:
+            yield _record(*row)
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1][0]
+
+    if include_archived is None:
+        include_archived = not since_id
+    if include_archived:
+        archived = conn.execute('SELECT a.conversation_id, c.user_id, c.title, a.data FROM archived_messages a '
+                                'JOIN conversations c ON c.id = a.conversation_id ORDER BY a.conversation_id')
+        # One blob (one conversation) is in memory at a time
+        for conversation_id, user_id, title, data in archived:
+            for message_id, is_user, content, created_at in unpack_messages(data):
+                if message_id > since_id:
+                    yield _record(message_id, conversation_id, user_id, title, is_user, content, created_at)
+
+
+def to_jsonl(records):
+    """Serialize records as JSON lines"""
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def to_csv(records):
+    """Serialize records as CSV with a header row"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS)
+    writer.writeheader()
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for record in records:
+        writer.writerow(record)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+# Format name -> (serializer, content type)
+FORMATS = {
+    'jsonl': (to_jsonl, 'application/x-ndjson'),
+    'csv': (to_csv, 'text/csv'),
+}
+
+
+class Watermark:
+    """Tracks the highest message id passed through, for the next incremental export"""
+
+    def __init__(self, since_id=0):
+        self.value = since_id
+        self.count = 0
+
+    def track(self, records):
+        for record in records:
+            if record['id'] > self.value:
+                self.value = record['id']
+            self.count += 1
+            yield record
+
+
+def export_messages(conn, fmt='jsonl', since_id=0, batch_size=1000, include_archived=None, watermark=None):
+    """Return an iterator of text chunks exporting messages in the given format.
+
+    Pass a Watermark to learn the highest id exported once the iterator is
+    exhausted.
+    """
+    serialize, _ = FORMATS[fmt]
+    records = iter_messages(conn, since_id, batch_size, include_archived)
+    if watermark is not None:
+        records = watermark.track(records)
+    return serialize(records)
@@ -0,0 +1,78 @@
+"""Export conversation messages as JSONL or CSV, streamed in constant memory.
+
+One line (or CSV row) per message, oldest first, with its conversation,
+user and role. --since exports only messages with a higher id. With
+--watermark-file, the id to start after is read from the file and the
+highest id exported is written back once the output is safely on disk,
+so running the same command again exports only what is new.
+
+Usage:
+    python export_conversations.py [path/to/database.db] -o messages.jsonl
+                                   [--format jsonl|csv] [--since ID]
+                                   [--watermark-file export.watermark]
+                                   [--include-archived | --no-include-archived]
+"""
+import argparse
+import os
+import sys
+import time
+
+from app import load_config
+from db import connect, pragmas_from_config
+from export import FORMATS, Watermark, export_messages
+
+
+def read_watermark(path):
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return int(f.read().strip() or 0)
+
+
+def write_watermark(path, value):
+    # Write then rename, so a crash never leaves a half-written watermark
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        f.write(f'{value}\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    config = load_config()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('database', nargs='?', default=config['DATABASE'])
+    parser.add_argument('-o', '--output', default='-', help='file to write (default stdout)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='jsonl')
+    parser.add_argument('--since', type=int, help='export only messages with a higher id')
+    parser.add_argument('--watermark-file', help='read --since from this file and store the new watermark in it')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--include-archived', action=argparse.BooleanOptionalAction,
+                        help='also export archived conversations (default only for a full export)')
+    args = parser.parse_args(argv)
+
+    since = args.since
+    if since is None:
+        since = read_watermark(args.watermark_file) if args.watermark_file else 0
+
+    conn = connect(args.database, pragmas_from_config(config))
+    watermark = Watermark(since)
+    start = time.perf_counter()
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8', newline='')
+    with output:
+        output.writelines(export_messages(conn, args.format, since, args.batch_size, args.include_archived, watermark))
+        output.flush()
+        if output is not sys.stdout:
+            os.fsync(output.fileno())
+    conn.close()
+
+    if args.watermark_file:
+        write_watermark(args.watermark_file, watermark.value)
+    print(f"Exported {watermark.count} messages after id {since} in {time.perf_counter() - start:.1f}s, "
+          f"watermark {watermark.value}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
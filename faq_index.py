@@ -0,0 +1,181 @@
+import math
+import re
+
+# Python's \w does not match Bengali vowel signs (category Mc/Mn), so the
+# Bengali block is matched explicitly to keep words like "শামীম" intact.
+TOKEN_PATTERN = re.compile(r'[ঀ-৿]+|[a-z0-9]+')
+BENGALI_PATTERN = re.compile(r'[ঀ-৿]')
+
+ENGLISH_STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does',
+    'for', 'from', 'has', 'have', 'he', 'his', 'how', 'i', 'in', 'is', 'it',
+    'me', 'my', 'of', 'on', 'or', 'so', 'the', 'to', 'was', 'what', 'which',
+    'who', 'with', 'you', 'your',
+}
+
+BENGALI_STOPWORDS = {
+    'কি', 'কী', 'কে', 'এবং', 'ও', 'আর', 'এর', 'এই', 'সেই', 'তার', 'তিনি',
+    'আমি', 'আপনি', 'আপনার', 'আমার', 'করে', 'হয়', 'জন্য', 'সাথে', 'কোন',
+}
+
+# Common Bengali inflections, longest first, so that e.g. "পরিষেবাগুলির"
+# and "পরিষেবা" end up as the same term.
+BENGALI_SUFFIXES = (
+    'গুলোর', 'গুলির', 'গুলো', 'গুলি', 'দের', 'েরা', 'টির', 'টি', 'ের',
+    'তে', 'কে', 'র', 'ে',
+)
+
+
+def is_bengali(text):
+    """Check if text contains Bengali characters"""
+    return BENGALI_PATTERN.search(text) is not None
+
+
+def detect_language(text):
+    """Classify a question as "en", "bn" or "mixed".
+
+    Scans the text once with a regex instead of checking every character.
+    "mixed" means it has both Bengali words and English words, like a
+    Bengali question naming a framework; reply_language() picks which
+    language to answer those in.
+    """
+    bengali = latin = False
+    for token in TOKEN_PATTERN.finditer(text.lower()):
+        if BENGALI_PATTERN.match(token.group()):
+            bengali = True
+        elif not token.group().isdigit():
+            latin = True
+        if bengali and latin:
+            return 'mixed'
+    return 'bn' if bengali else 'en'
+
+
+def reply_language(text):
+    """The language to answer in: the one most of the question's words are in"""
+    language = detect_language(text)
+    if language != 'mixed':
+        return language
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    bengali = sum(1 for token in tokens if BENGALI_PATTERN.match(token))
+    latin = sum(1 for token in tokens if not BENGALI_PATTERN.match(token) and not token.isdigit())
+    return 'bn' if bengali >= latin else 'en'
+
+
+def stem_bengali(token):
+    """Strip a common Bengali inflection from a token"""
+    for suffix in BENGALI_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Split English and Bengali text into normalized search terms"""
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in ENGLISH_STOPWORDS or token in BENGALI_STOPWORDS:
+            continue
+        if BENGALI_PATTERN.match(token):
+            token = stem_bengali(token)
+        terms.append(token)
+    return terms
+
+
+def char_ngrams(text, n=3):
+    """Character n-grams of the tokenized text, for typo-tolerant matching"""
+    text = f" {' '.join(TOKEN_PATTERN.findall(text.lower()))} "
+    return frozenset(text[i:i + n] for i in range(max(len(text) - n + 1, 1)))
+
+
+def format_entries(entries):
+    """Render FAQ records back into prompt text"""
+    return '\n\n'.join(f"{entry['question']}\n{entry['answer']}" for entry in entries)
+
+
+class FAQIndex:
+    """In-memory BM25 index over parsed FAQ records"""
+
+    def __init__(self, records, k1=1.5, b=0.75):
+        # numpy is imported here rather than at module level so that using
+        # the tokenizer and parser doesn't pay for it
+        import numpy as np
+
+        self.records = records
+        self.vocabulary = {}
+        self.question_terms = [frozenset(tokenize(record['question'])) for record in records]
+        self.question_ngrams = [char_ngrams(record['question']) for record in records]
+
+        documents = []
+        for record in records:
+            # Count the question twice so heading matches outrank body matches
+            terms = tokenize(record['question']) * 2 + tokenize(record['answer'])
+            documents.append(terms)
+            for term in terms:
+                self.vocabulary.setdefault(term, len(self.vocabulary))
+
+        tf = np.zeros((len(records), len(self.vocabulary)), dtype=np.float32)
+        for row, terms in enumerate(documents):
+            for term in terms:
+                tf[row, self.vocabulary[term]] += 1
+
+        lengths = tf.sum(axis=1, keepdims=True)
+        average_length = float(lengths.mean()) if len(records) else 0.0
+        document_frequency = (tf > 0).sum(axis=0)
+        idf = np.log(1 + (len(records) - document_frequency + 0.5) / (document_frequency + 0.5))
+
+        # Precompute the full BM25 weight of every (document, term) pair so a
+        # query is just a column gather and a row sum.
+        norm = k1 * (1 - b + b * lengths / max(average_length, 1e-9))
+        self.weights = (idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+
+    def scores(self, question):
+        """Score every record against a question"""
+        import numpy as np
+
+        columns = [self.vocabulary[term] for term in tokenize(question) if term in self.vocabulary]
+        if not columns:
+            return np.zeros(len(self.records), dtype=np.float32)
+        return self.weights[:, columns].sum(axis=1)
+
+    def search(self, question, top_k=5):
+        """Return the top_k matching records with their scores"""
+        import numpy as np
+
+        scores = self.scores(question)
+        if not len(scores):
+            return []
+        top_k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(self.records[i], float(scores[i])) for i in ranked if scores[i] > 0]
+
+
+    def match(self, question):
+        """Find the FAQ question closest to the user's question.
+
+        Returns (record, confidence) where confidence in [0, 1] averages the
+        Dice overlap of content terms and the Jaccard overlap of character
+        trigrams between the two questions. Only records in the question's
+        language are considered.
+        """
+        language = 'bn' if is_bengali(question) else 'en'
+        terms = frozenset(tokenize(question))
+        ngrams = char_ngrams(question)
+
+        best, best_confidence = None, 0.0
+        for i, record in enumerate(self.records):
+            if record['language'] != language:
+                continue
+            faq_terms = self.question_terms[i]
+            dice = 2 * len(terms & faq_terms) / (len(terms) + len(faq_terms)) if terms and faq_terms else 0.0
+            faq_ngrams = self.question_ngrams[i]
+            overlap = len(ngrams & faq_ngrams) / len(ngrams | faq_ngrams)
+            confidence = (dice + overlap) / 2
+            if confidence > best_confidence:
+                best, best_confidence = record, confidence
+        return best, best_confidence
+
+
+def estimate_tokens(text):
+    """Rough token estimate used for prompt size comparisons"""
+    return math.ceil(len(text) / 4)
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+
+# Gemini calls spend seconds waiting on the network. The default sync worker
+# would hold a whole process for each one, so serve with threaded workers
+# (or gevent) and let many requests wait on the API at once.
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+# Each worker builds its own app through the factory
+wsgi_app = "app:create_app()"
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+
+# "gthread" (default), "gevent" (needs `pip install gevent` and
+# GEMINI_TRANSPORT=rest, since gRPC doesn't cooperate with gevent) or "sync"
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+
+# Concurrent requests per worker for gthread and gevent respectively.
+# Note that gunicorn runs "sync" as gthread whenever threads > 1.
+threads = int(os.getenv("GUNICORN_THREADS", "64"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+backlog = 2048
+
+
+# With several workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+# so /metrics reports all of them; clean up after workers that exit.
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
+
+
+# With MESSAGE_WRITE_BEHIND, commit the messages still queued in a worker
+# before it exits
+def worker_exit(server, worker):
+    services = getattr(worker.wsgi, 'extensions', {}).get('smart_faq')
+    if services is not None:
+        services.close()
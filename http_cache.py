@@ -0,0 +1,108 @@
+import hashlib
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    # Optional, responses are gzipped without it
+    brotli = None
+
+# Content types worth compressing, the rest (images, event streams) are sent as is
+COMPRESSIBLE_TYPES = frozenset({'application/json'})
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class StaticVersions:
+    """Content hashes of static files, for cache-busting URLs.
+
+    A file's hash is recomputed only when its size or mtime changes, so
+    building a URL costs one stat() after the first time.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._hashes = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename):
+        """Return a short hash of the file's contents, or None if it doesn't exist"""
+        path = os.path.join(self.root, filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._hashes.get(filename)
+        if cached and cached[0] == key:
+            return cached[1]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        with self._lock:
+            self._hashes[filename] = (key, digest)
+        return digest
+
+
+def choose_encoding(accept_encodings):
+    """Pick brotli or gzip from a request's Accept-Encoding, or None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_chunks(chunks, encoding):
+    compress, finish = _compressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response, accept_encodings, min_size):
+    """Compress a JSON response in place if the client accepts it.
+
+    Streamed responses are compressed chunk by chunk as they are sent.
+    Buffered ones are compressed only when they are at least min_size
+    bytes, below that the headers cost more than they save.
+    """
+    if (response.status_code != 200 or response.direct_passthrough
+            or response.mimetype not in COMPRESSIBLE_TYPES
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        compress, finish = _compressor(encoding)
+        response.set_data(compress(data) + finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
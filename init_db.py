@@ -1,49 +1,22 @@
-import sqlite3
+import sys
 
-def get_db_connection():
-    conn = sqlite3.connect('shamim_faq.db')
-    conn.row_factory = sqlite3.Row
-    return conn
+from db import connect
+from migrations import MIGRATIONS, check_query_plans, migrate, schema_version
 
-def init_db():
-    conn = get_db_connection()
+def init_db(path='shamim_faq.db'):
+    conn = connect(path)
     
-    # Create users table
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT UNIQUE NOT NULL,
-        email TEXT UNIQUE NOT NULL,
-        password_hash TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-    )
-    ''')
+    applied = migrate(conn)
+    for version, description in applied:
+        print(f"Applied migration {version}: {description}")
     
-    # Create conversations table with user_id
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS conversations (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        title TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (user_id) REFERENCES users (id)
-    )
-    ''')
+    problems = check_query_plans(conn)
+    for sql, plan in problems:
+        print(f"Warning: query does not use its index: {sql}\n    plan: {plan}")
     
-    conn.execute('''
-    CREATE TABLE IF NOT EXISTS messages (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        conversation_id INTEGER NOT NULL,
-        is_user BOOLEAN NOT NULL,
-        content TEXT NOT NULL,
-        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
-    )
-    ''')
-    
-    conn.commit()
+    version = schema_version(conn)
     conn.close()
-    print("Database initialized successfully!")
+    print(f"Database initialized successfully! (schema version {version} of {MIGRATIONS[-1][0]})")
 
 if __name__ == "__main__":
-    init_db()
+    init_db(*sys.argv[1:])
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from faq_index import FAQIndex
+from structured_log import log_event
+
+logger = logging.getLogger('smart_faq')
+
+LANGUAGES = ('en', 'bn')
+
+
+class KnowledgeBaseError(Exception):
+    """Raised when the FAQ file can't be read or is malformed"""
+
+
+def load_records(path):
+    """Read and validate FAQ records from a JSON file.
+
+    The file holds a list of {"key", "question", "answer", "language",
+    "section"} objects. Entries that are translations of each other share
+    a key. Ids are assigned by position, so records keep the ids they had
+    when the FAQ was a text blob.
+    """
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        raise KnowledgeBaseError(f'Could not read {path}: {e}') from e
+
+    if not isinstance(entries, list):
+        raise KnowledgeBaseError(f'{path} must contain a list of FAQ entries')
+
+    records = []
+    keys = set()
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise KnowledgeBaseError(f'Entry {position} in {path} is not an object')
+        question = entry.get('question')
+        answer = entry.get('answer')
+        if not isinstance(question, str) or not question.strip():
+            raise KnowledgeBaseError(f'Entry {position} in {path} has no question')
+        if not isinstance(answer, str) or not answer.strip():
+            raise KnowledgeBaseError(f'Entry {position} in {path} has no answer')
+        if entry.get('language') not in LANGUAGES:
+            raise KnowledgeBaseError(f'Entry {position} in {path} has an unknown language')
+        key = entry.get('key') or None
+        if key is not None:
+            if (key, entry['language']) in keys:
+                raise KnowledgeBaseError(f'Entry {position} in {path} repeats key {key!r} for its language')
+            keys.add((key, entry['language']))
+        records.append({
+            'id': position,
+            'key': key,
+            'question': question.strip(),
+            'answer': answer.strip(),
+            'language': entry['language'],
+            'section': entry.get('section') or None,
+        })
+    return records
+
+
+def render_text(records):
+    """Render records as the FAQ text sent to the model in full-context mode"""
+    blocks = []
+    section = None
+    for record in records:
+        if record['section'] and record['section'] != section:
+            blocks.append(record['section'])
+        section = record['section']
+        if record['question'] == record['section']:
+            # Content directly under a heading, like the address block
+            blocks.append(record['answer'])
+        else:
+            blocks.append(f"{record['question']}\n{record['answer']}")
+    return '\n\n'.join(blocks)
+
+
+class KnowledgeBase:
+    """One compiled version of the FAQ, never modified after it is built.
+
+    Each language is a separate corpus with its own retrieval index,
+    full-context prompt text and prompts (from make_prompts(language,
+    text)), so a question is only ever answered from entries in its
+    language. Entries sharing a key are mapped to each other across
+    languages. version is a hash of the content. A request keeps using
+    the instance it started with, so a reload can't change the FAQ
+    halfway through an answer.
+    """
+
+    def __init__(self, records, make_prompts=None):
+        self.records = records
+        self.corpora = {}
+        self.texts = {}
+        self.prompts = {}
+        for language in LANGUAGES:
+            corpus = [record for record in records if record['language'] == language]
+            self.corpora[language] = FAQIndex(corpus)
+            self.texts[language] = render_text(corpus)
+            if make_prompts:
+                self.prompts[language] = make_prompts(language, self.texts[language])
+
+        # record id -> the equivalent record in each language
+        by_key = {}
+        for record in records:
+            if record['key']:
+                by_key.setdefault(record['key'], {})[record['language']] = record
+        self.translations = {record['id']: by_key[record['key']] for record in records if record['key']}
+
+        canonical = json.dumps(records, ensure_ascii=False, sort_keys=True)
+        self.version = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+
+    def translate(self, record, language):
+        """Return the record's equivalent in a language, or None"""
+        if record['language'] == language:
+            return record
+        return self.translations.get(record['id'], {}).get(language)
+
+    def search(self, question, language, top_k=5, languages=None):
+        """Return the top_k records for a question, all in one language.
+
+        languages lists the corpora to search (by default just language).
+        Hits from other corpora are replaced by their translation, and
+        dropped when there is none, so a mixed-language question still
+        gets context in the language it will be answered in.
+        """
+        best = {}
+        for corpus in languages or (language,):
+            for record, score in self.corpora[corpus].search(question, top_k):
+                record = self.translate(record, language)
+                if record is not None and score > best.get(record['id'], (None, 0.0))[1]:
+                    best[record['id']] = (record, score)
+        return sorted(best.values(), key=lambda match: -match[1])[:top_k]
+
+
+class KnowledgeBaseStore:
+    """Keeps the compiled knowledge base in sync with the FAQ file.
+
+    current() checks the file's mtime and size at most every
+    reload_interval seconds (0 disables reloading). When they change the
+    file is compiled off to the side by one thread and swapped in with a
+    single assignment, while other threads keep serving the previous
+    version. A file that fails to load is logged and the previous version
+    stays in place. on_reload(old, new) is called after each swap.
+    """
+
+    def __init__(self, path, make_prompts=None, reload_interval=2.0, on_reload=None):
+        self.path = path
+        self.make_prompts = make_prompts
+        self.reload_interval = reload_interval
+        self.on_reload = on_reload
+        self.reloads = 0
+        self._current = None
+        self._signature = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _compile(self, signature):
+        knowledge_base = KnowledgeBase(load_records(self.path), self.make_prompts)
+        previous, self._current = self._current, knowledge_base
+        self._signature = signature
+        return previous, knowledge_base
+
+    def current(self):
+        """Return the latest knowledge base, reloading it if the file changed"""
+        if self._current is None:
+            with self._lock:
+                if self._current is None:
+                    self._compile(self._stat())
+                    self._next_check = time.monotonic() + self.reload_interval
+            return self._current
+
+        if self.reload_interval <= 0 or time.monotonic() < self._next_check:
+            return self._current
+        # Another thread is already checking, keep serving the current version
+        if not self._lock.acquire(blocking=False):
+            return self._current
+        try:
+            self._next_check = time.monotonic() + self.reload_interval
+            signature = self._stat()
+            if signature is not None and signature != self._signature:
+                self._reload(signature)
+        finally:
+            self._lock.release()
+        return self._current
+
+    def _reload(self, signature):
+        start = time.perf_counter()
+        try:
+            previous, knowledge_base = self._compile(signature)
+        except KnowledgeBaseError as e:
+            # Don't retry the same broken file on every check
+            self._signature = signature
+            log_event(logger, logging.ERROR, 'faq_reload_failed', path=self.path, error=str(e))
+            return
+
+        self.reloads += 1
+        log_event(logger, logging.INFO, 'faq_reloaded', path=self.path,
+                  version=knowledge_base.version, previous_version=previous.version,
+                  records=len(knowledge_base.records),
+                  duration_ms=round((time.perf_counter() - start) * 1000, 2))
+        if self.on_reload:
+            self.on_reload(previous, knowledge_base)
+
+    def stats(self):
+        knowledge_base = self._current
+        return {
+            'path': self.path,
+            'version': knowledge_base.version if knowledge_base else None,
+            'records': len(knowledge_base.records) if knowledge_base else 0,
+            'reloads': self.reloads,
+        }
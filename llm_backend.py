@@ -0,0 +1,127 @@
+import hashlib
+import random
+import threading
+import time
+
+# Words the stub builds its answers from
+STUB_VOCABULARY = (
+    'Shamim', 'builds', 'machine', 'learning', 'systems', 'with', 'Python', 'and', 'deploys',
+    'them', 'on', 'AWS', 'using', 'Flask', 'FastAPI', 'LangChain', 'models', 'for', 'real',
+    'world', 'products', 'the', 'team', 'ships', 'reliable', 'scalable', 'services', 'daily',
+)
+
+
+class StubLLMError(Exception):
+    """Transient failure injected by the stub backend, retried like a 503"""
+
+
+class GeminiBackend:
+    """Answers prompts with a Gemini model from the model registry.
+
+    retryable is None so the upstream limiter uses the provider's
+    transient errors, resolved on first use. Calls use model_name unless
+    given another model.
+    """
+
+    retryable = None
+
+    def __init__(self, model_registry, model_name, generation_config):
+        self.model_registry = model_registry
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def model(self, model_name=None):
+        return self.model_registry.get_model(model_name or self.model_name, self.generation_config)
+
+    def generate(self, prompt, model_name=None):
+        """Return the whole answer to a prompt"""
+        return self.model(model_name).generate_content(prompt).text
+
+    def stream(self, prompt, model_name=None):
+        """Start an answer and return an iterator over its text chunks.
+
+        The request is sent before this returns, so a caller can retry the
+        call itself without retrying a half-consumed stream.
+        """
+        response = self.model(model_name).generate_content(prompt, stream=True)
+        return (chunk.text for chunk in response if chunk.text)
+
+
+class StubLLMBackend:
+    """Deterministic local stand-in for the model, for offline benchmarks.
+
+    The answer to a prompt depends only on the prompt, so runs are
+    comparable. Each call waits latency seconds before the first token
+    and then answer_tokens / tokens_per_second more, streamed word by
+    word. A fraction error_rate of calls raise StubLLMError instead, and
+    a fraction slow_rate wait slow_latency before the first token, for a
+    long latency tail. Both are chosen by a random generator seeded with
+    seed. Calls naming a model in model_latencies wait that model's
+    latency instead, to stand in for a faster fallback model.
+    """
+
+    retryable = (StubLLMError,)
+
+    def __init__(self, latency=0.5, tokens_per_second=100.0, answer_tokens=80, error_rate=0.0, seed=0,
+                 slow_rate=0.0, slow_latency=5.0, model_latencies=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.model_latencies = model_latencies or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def answer(self, prompt):
+        """The text the stub returns for a prompt"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).digest()
+        words = random.Random(digest).choices(STUB_VOCABULARY, k=self.answer_tokens)
+        return f"[stub {digest[:4].hex()}] " + ' '.join(words) + '.'
+
+    def _start(self, model_name):
+        with self._lock:
+            failed = self._random.random() < self.error_rate
+            slow = self._random.random() < self.slow_rate
+        time.sleep(self.model_latencies.get(model_name, self.slow_latency if slow else self.latency))
+        if failed:
+            raise StubLLMError('Injected stub error')
+
+    def generate(self, prompt, model_name=None):
+        """Return the whole answer to a prompt"""
+        self._start(model_name)
+        if self.tokens_per_second:
+            time.sleep(self.answer_tokens / self.tokens_per_second)
+        return self.answer(prompt)
+
+    def stream(self, prompt, model_name=None):
+        """Wait for the first token, then return an iterator over the words"""
+        self._start(model_name)
+        return self._chunks(self.answer(prompt))
+
+    def _chunks(self, text):
+        words = text.split(' ')
+        delay = 1 / self.tokens_per_second if self.tokens_per_second else 0
+        for i, word in enumerate(words):
+            if i and delay:
+                time.sleep(delay)
+            yield word if i == len(words) - 1 else word + ' '
+
+
+def create_llm_backend(config, model_registry, model_name, generation_config):
+    """Build the LLM backend described by the app config"""
+    backend = config.get('LLM_BACKEND', 'gemini')
+    if backend == 'stub':
+        return StubLLMBackend(
+            latency=config.get('STUB_LLM_LATENCY', 0.5),
+            tokens_per_second=config.get('STUB_LLM_TOKENS_PER_SECOND', 100.0),
+            answer_tokens=config.get('STUB_LLM_ANSWER_TOKENS', 80),
+            error_rate=config.get('STUB_LLM_ERROR_RATE', 0.0),
+            seed=config.get('STUB_LLM_SEED', 0),
+            slow_rate=config.get('STUB_LLM_SLOW_RATE', 0.0),
+            slow_latency=config.get('STUB_LLM_SLOW_LATENCY', 5.0),
+            model_latencies={config['GEMINI_FALLBACK_MODEL']: config.get('STUB_LLM_FALLBACK_LATENCY', 0.2)}
+            if config.get('GEMINI_FALLBACK_MODEL') else None,
+        )
+    return GeminiBackend(model_registry, model_name, generation_config)
@@ -0,0 +1,264 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from upstream import UpstreamBusy
+
+
+class LLMError(Exception):
+    """No model produced an answer. Reported to the client, never saved as one.
+
+    code is "deadline_exceeded" when nothing answered in time and
+    "upstream_error" when every model that was asked failed.
+    """
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+    def to_dict(self):
+        return {'code': self.code, 'message': str(self)}
+
+
+class LatencyTracker:
+    """Latencies of the most recent window calls, for picking a hedge delay"""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, fraction):
+        """The fraction quantile of the window, None until min_samples calls were seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Attempt:
+    """One request to one model, run on a worker thread"""
+
+    def __init__(self, kind, model_name):
+        self.kind = kind
+        self.model_name = model_name
+        self.started = time.monotonic()
+        self.cancelled = threading.Event()
+        self.finished = False
+
+
+class LLMInvoker:
+    """Calls the LLM backend within a deadline, hedging and falling back.
+
+    Every call must produce its answer within deadline seconds. Attempts
+    run on worker threads through the upstream limiter (so they still
+    count against its slots and are retried), and the caller only waits
+    for them:
+
+    - with hedge, a second identical request is sent if the first hasn't
+      answered after the hedge_quantile of recent latencies (hedge_delay
+      until min_samples calls were seen), and only while the limiter has
+      a free slot, so hedging never adds load to a saturated upstream;
+    - with a fallback_model, that model is asked too once only
+      fallback_reserve seconds of the deadline are left, or at once if
+      the primary model fails.
+
+    The first attempt to produce a chunk wins and the others are
+    cancelled. A blocking provider call can't be interrupted: an
+    abandoned attempt keeps its slot until the provider answers or its
+    client times out. If no attempt answers in time LLMError is raised.
+    UpstreamBusy from the primary model is raised as is, as before.
+    """
+
+    def __init__(self, backend, upstream, model_name, deadline=30.0, hedge=False, hedge_delay=2.0,
+                 hedge_quantile=0.95, fallback_model=None, fallback_reserve=10.0, min_samples=20):
+        self.backend = backend
+        self.upstream = upstream
+        self.model_name = model_name
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_delay_default = hedge_delay
+        self.hedge_quantile = hedge_quantile
+        self.fallback_model = fallback_model or None
+        self.fallback_reserve = fallback_reserve
+        # Whole answers and first chunks take very different times
+        self.latency = {
+            'generate': LatencyTracker(min_samples=min_samples),
+            'stream': LatencyTracker(min_samples=min_samples),
+        }
+        # Enough threads for a primary, a hedge and a fallback per slot
+        self._executor = ThreadPoolExecutor(max_workers=upstream.max_concurrency * 3,
+                                            thread_name_prefix='llm')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.fallback_wins = 0
+        self.deadline_exceeded = 0
+        self.failed = 0
+
+    def hedge_delay(self, operation):
+        """Seconds to wait for the primary model before sending a hedge"""
+        delay = self.latency[operation].quantile(self.hedge_quantile)
+        return self.hedge_delay_default if delay is None else delay
+
+    def generate(self, prompt, deadline=None):
+        """Return (answer, model name) for a prompt"""
+        chunks = []
+        model_name = None
+        for text, model_name in self._invoke(prompt, 'generate', deadline):
+            chunks.append(text)
+        return ''.join(chunks), model_name
+
+    def stream(self, prompt, deadline=None):
+        """Yield (text chunk, model name) pairs of the answer to a prompt.
+
+        The deadline covers the whole answer, so a stream that stalls
+        part way raises LLMError after some chunks were yielded.
+        """
+        return self._invoke(prompt, 'stream', deadline)
+
+    def _chunks(self, prompt, operation, attempt):
+        backend, upstream = self.backend, self.upstream
+        if operation == 'generate':
+            yield upstream.call(lambda: backend.generate(prompt, attempt.model_name))
+            return
+        # The slot is held until the stream ends or the attempt is cancelled
+        with upstream.slot():
+            yield from upstream.retry(lambda: backend.stream(prompt, attempt.model_name))
+
+    def _run(self, prompt, operation, attempt, events):
+        if attempt.cancelled.is_set():
+            # Another attempt won while this one waited for a thread
+            return
+        chunks = self._chunks(prompt, operation, attempt)
+        first = True
+        try:
+            for text in chunks:
+                if attempt.cancelled.is_set():
+                    break
+                if first and attempt.model_name == self.model_name:
+                    self.latency[operation].record(time.monotonic() - attempt.started)
+                first = False
+                events.put((attempt, 'chunk', text))
+            events.put((attempt, 'done', None))
+        except Exception as e:
+            events.put((attempt, 'error', e))
+        finally:
+            chunks.close()
+
+    def _invoke(self, prompt, operation, deadline):
+        start = time.monotonic()
+        deadline_at = start + (self.deadline if deadline is None else deadline)
+        hedge_at = start + self.hedge_delay(operation) if self.hedge else None
+        fallback_at = max(start, deadline_at - self.fallback_reserve) if self.fallback_model else None
+        events = queue.Queue()
+        attempts = []
+        errors = []
+
+        def launch(kind, model_name):
+            attempt = _Attempt(kind, model_name)
+            attempts.append(attempt)
+            self._executor.submit(self._run, prompt, operation, attempt, events)
+
+        with self._lock:
+            self.calls += 1
+        launch('primary', self.model_name)
+        winner = None
+        try:
+            # Race the attempts for the first chunk
+            while winner is None:
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    if self.upstream.active < self.upstream.max_concurrency:
+                        launch('hedge', self.model_name)
+                        with self._lock:
+                            self.hedged += 1
+                if fallback_at is not None and now >= fallback_at:
+                    fallback_at = None
+                    launch('fallback', self.fallback_model)
+                    with self._lock:
+                        self.fallbacks += 1
+                if now >= deadline_at:
+                    self._count('deadline_exceeded')
+                    raise LLMError('deadline_exceeded', f'No answer within {deadline_at - start:g} seconds')
+
+                wake_at = min(t for t in (hedge_at, fallback_at, deadline_at) if t is not None)
+                try:
+                    attempt, event, value = events.get(timeout=wake_at - now)
+                except queue.Empty:
+                    continue
+                attempt.finished = event != 'chunk'
+                if event != 'error':
+                    winner = attempt
+                    break
+                if isinstance(value, UpstreamBusy) and attempt.kind == 'primary':
+                    raise value
+                errors.append(value)
+                # The primary model already used its retries: don't hedge it,
+                # bring the fallback forward instead
+                if attempt.model_name == self.model_name:
+                    hedge_at = None
+                    if fallback_at is not None:
+                        fallback_at = time.monotonic()
+                if all(a.finished for a in attempts) and fallback_at is None:
+                    self._count('failed')
+                    raise LLMError('upstream_error', f'The model failed: {errors[-1]}')
+
+            if winner.kind == 'hedge':
+                self._count('hedge_wins')
+            elif winner.kind == 'fallback':
+                self._count('fallback_wins')
+            for attempt in attempts:
+                if attempt is not winner:
+                    attempt.cancelled.set()
+
+            # Relay the winner's chunks until it finishes or the deadline passes
+            yield (value if event == 'chunk' else ''), winner.model_name
+            while event == 'chunk':
+                while True:
+                    try:
+                        attempt, event, value = events.get(timeout=max(0, deadline_at - time.monotonic()))
+                    except queue.Empty:
+                        self._count('deadline_exceeded')
+                        raise LLMError('deadline_exceeded',
+                                       f'The answer was not finished within {deadline_at - start:g} seconds')
+                    if attempt is winner:
+                        break
+                if event == 'chunk':
+                    yield value, winner.model_name
+                elif event == 'error':
+                    self._count('failed')
+                    raise LLMError('upstream_error', f'The model failed mid-answer: {value}')
+        finally:
+            for attempt in attempts:
+                attempt.cancelled.set()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'deadline': self.deadline,
+                'hedge': self.hedge,
+                'hedge_delay': {operation: round(self.hedge_delay(operation), 3) for operation in self.latency},
+                'fallback_model': self.fallback_model,
+                'calls': self.calls,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'fallbacks': self.fallbacks,
+                'fallback_wins': self.fallback_wins,
+                'deadline_exceeded': self.deadline_exceeded,
+                'failed': self.failed,
+            }
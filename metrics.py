@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Sub-millisecond buckets for the local stages, seconds for Gemini
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+REQUEST_SECONDS = Histogram(
+    'faq_request_seconds', 'End-to-end latency of question requests',
+    ['endpoint'], buckets=LATENCY_BUCKETS
+)
+STAGE_SECONDS = Histogram(
+    'faq_stage_seconds', 'Time spent in each stage of answering a question',
+    ['stage'], buckets=LATENCY_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    'faq_prompt_tokens', 'Estimated tokens in prompts sent to Gemini',
+    buckets=TOKEN_BUCKETS
+)
+RESPONSE_TOKENS = Histogram(
+    'faq_response_tokens', 'Estimated tokens in answers returned by Gemini',
+    buckets=TOKEN_BUCKETS
+)
+ANSWERS = Counter(
+    'faq_answers', 'Questions answered, by the path that served them',
+    ['endpoint', 'source']
+)
+
+_local = threading.local()
+# labels() takes a lock on every call, so keep each stage's child
+_stage_children = {}
+
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def start_request():
+    """Begin collecting stage timings for the request on this thread"""
+    _local.timings = {}
+    _local.start = time.perf_counter()
+
+
+def record_stage(name, seconds):
+    """Observe a stage duration and add it to the current request's timings"""
+    child = _stage_children.get(name)
+    if child is None:
+        child = _stage_children[name] = STAGE_SECONDS.labels(name)
+    child.observe(seconds)
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def stage(name):
+    """Context manager timing one stage, e.g. `with stage('gemini'):`"""
+    return _Stage(name)
+
+
+def finish_request(endpoint, source=None):
+    """Record the request's total latency and outcome.
+
+    Returns the stage timings in milliseconds, with the total under
+    "total", for the request log line.
+    """
+    total = time.perf_counter() - getattr(_local, 'start', time.perf_counter())
+    REQUEST_SECONDS.labels(endpoint).observe(total)
+    if source is not None:
+        ANSWERS.labels(endpoint, source).inc()
+
+    timings = getattr(_local, 'timings', None) or {}
+    _local.timings = None
+    result = {name: round(seconds * 1000, 2) for name, seconds in timings.items()}
+    result['total'] = round(total * 1000, 2)
+    return result
+
+
+def render():
+    """Return the /metrics body and content type.
+
+    Under gunicorn set PROMETHEUS_MULTIPROC_DIR so every worker writes its
+    samples there and any worker can report the totals for all of them.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,253 @@
+import sqlite3
+
+from archive import index_archived_messages, unpack_messages
+
+# Bengali vowel signs, virama and other combining marks, plus the
+# zero-width (non-)joiners used in Bengali spelling. unicode61 treats marks
+# as separators, so without these it would index "বর্তমান" as "বর" and "তম"
+BENGALI_TOKENCHARS = (
+    '\u0981\u0982\u0983\u09bc\u09be\u09bf\u09c0\u09c1\u09c2\u09c3\u09c4'
+    '\u09c7\u09c8\u09cb\u09cc\u09cd\u09d7\u09e2\u09e3\u09fe\u200c\u200d'
+)
+
+
+def index_existing_archives(conn):
+    """Add the conversations archived before migration 8 to its search index"""
+    archives = conn.execute('SELECT conversation_id, data FROM archived_messages').fetchall()
+    for conversation_id, data in archives:
+        index_archived_messages(conn, conversation_id, unpack_messages(data))
+
+
+# Schema migrations, applied in order. The database's PRAGMA user_version
+# records the last one applied, so each runs exactly once per database.
+# Never edit a migration that has shipped, add a new one instead. Statements
+# are split on ';' (trigger bodies are kept whole), so keep semicolons out
+# of comments. A migration that needs Python is a function of the
+# connection instead of SQL, run in the same transaction.
+MIGRATIONS = [
+    (1, 'Create users, conversations and messages', '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        email TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS conversations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        title TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    );
+
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id INTEGER NOT NULL,
+        is_user BOOLEAN NOT NULL,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+    );
+    '''),
+    (2, 'Index conversation and message history lookups', '''
+    -- Covers "WHERE user_id = ? ORDER BY created_at DESC" without touching
+    -- the table (id is the rowid, so it is in every index entry)
+    CREATE INDEX IF NOT EXISTS idx_conversations_user_created
+        ON conversations (user_id, created_at, title);
+
+    CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+        ON messages (conversation_id, created_at);
+    '''),
+    (3, 'Add id to the conversations index for keyset pagination', '''
+    -- Pages are ordered by (created_at, id). With id as an explicit key
+    -- column the index order matches and no sort step is needed
+    DROP INDEX IF EXISTS idx_conversations_user_created;
+
+    CREATE INDEX IF NOT EXISTS idx_conversations_user_created_id
+        ON conversations (user_id, created_at, id, title);
+    '''),
+    (4, 'Add token buckets for per-user rate limiting', '''
+    -- Only used with RATE_LIMIT=sqlite, one row per rate-limited key
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        tokens REAL NOT NULL,
+        updated_at REAL NOT NULL
+    ) WITHOUT ROWID;
+    '''),
+    (5, 'Add full-text search over messages', f'''
+    -- External content table, the text lives only in messages. The
+    -- triggers keep the index in step with inserts, updates and deletes
+    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content='messages',
+        content_rowid='id',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '{BENGALI_TOKENCHARS}'"
+    );
+
+    CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END;
+
+    -- Index the messages written before this migration
+    INSERT INTO messages_fts (messages_fts) VALUES ('rebuild');
+    '''),
+    (6, 'Add version counters for conditional GETs', '''
+    -- users.conversations_version changes whenever the user's conversation
+    -- list does and conversations.version whenever a conversation or its
+    -- messages do. The endpoints use them as ETags, so a revalidation reads
+    -- one row instead of the messages. Triggers cover every writer,
+    -- including the write-behind queue
+    ALTER TABLE users ADD COLUMN conversations_version INTEGER NOT NULL DEFAULT 0;
+
+    ALTER TABLE conversations ADD COLUMN version INTEGER NOT NULL DEFAULT 0;
+
+    CREATE TRIGGER IF NOT EXISTS conversations_version_insert AFTER INSERT ON conversations BEGIN
+        UPDATE users SET conversations_version = conversations_version + 1 WHERE id = new.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS conversations_version_update AFTER UPDATE OF title ON conversations BEGIN
+        UPDATE users SET conversations_version = conversations_version + 1 WHERE id = new.user_id;
+        UPDATE conversations SET version = version + 1 WHERE id = new.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS conversations_version_delete AFTER DELETE ON conversations BEGIN
+        UPDATE users SET conversations_version = conversations_version + 1 WHERE id = old.user_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS messages_version_insert AFTER INSERT ON messages BEGIN
+        UPDATE conversations SET version = version + 1 WHERE id = new.conversation_id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS messages_version_update AFTER UPDATE ON messages BEGIN
+        UPDATE conversations SET version = version + 1 WHERE id IN (old.conversation_id, new.conversation_id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS messages_version_delete AFTER DELETE ON messages BEGIN
+        UPDATE conversations SET version = version + 1 WHERE id = old.conversation_id;
+    END;
+    '''),
+    (7, 'Add cold storage for archived conversations', '''
+    -- archive_conversations.py moves the messages of inactive conversations
+    -- here as one zlib-compressed JSON array per conversation and sets
+    -- conversations.archived. Reading the conversation moves them back
+    CREATE TABLE IF NOT EXISTS archived_messages (
+        conversation_id INTEGER PRIMARY KEY,
+        message_count INTEGER NOT NULL,
+        raw_bytes INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        archived_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+    );
+
+    ALTER TABLE conversations ADD COLUMN archived INTEGER NOT NULL DEFAULT 0;
+    '''),
+    (8, 'Add full-text search over archived messages', f'''
+    -- Archiving deletes messages, and with them their messages_fts rows.
+    -- archive.py indexes them here instead and removes them on restore.
+    -- Contentless, the text lives only in the compressed blob, and
+    -- archived_message_ids holds what a search result needs besides it
+    CREATE VIRTUAL TABLE IF NOT EXISTS archived_messages_fts USING fts5(
+        content,
+        content='',
+        tokenize="unicode61 remove_diacritics 2 tokenchars '{BENGALI_TOKENCHARS}'"
+    );
+
+    CREATE TABLE IF NOT EXISTS archived_message_ids (
+        id INTEGER PRIMARY KEY,
+        conversation_id INTEGER NOT NULL,
+        is_user BOOLEAN NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_archived_message_ids_conversation
+        ON archived_message_ids (conversation_id);
+    '''),
+    (9, 'Index the conversations archived before full-text search covered them', index_existing_archives),
+]
+
+# Hot queries and the index each one must use
+QUERY_PLAN_CHECKS = [
+    ('SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+     'ORDER BY created_at DESC, id DESC LIMIT ?',
+     (1, 51), 'idx_conversations_user_created_id'),
+    ('SELECT id, title, created_at FROM conversations WHERE user_id = ? '
+     'AND (created_at, id) < (SELECT created_at, id FROM conversations WHERE id = ? AND user_id = ?) '
+     'ORDER BY created_at DESC, id DESC LIMIT ?',
+     (1, 100, 1, 51), 'idx_conversations_user_created_id'),
+    ('SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+     'ORDER BY created_at DESC, id DESC LIMIT ?',
+     (1, 51), 'idx_messages_conversation_created'),
+    ('SELECT id, is_user, content, created_at FROM messages WHERE conversation_id = ? '
+     'AND (created_at, id) < (SELECT created_at, id FROM messages WHERE id = ? AND conversation_id = ?) '
+     'ORDER BY created_at DESC, id DESC LIMIT ?',
+     (1, 100, 1, 51), 'idx_messages_conversation_created'),
+]
+
+
+def schema_version(conn):
+    """Return the last migration applied to a database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def split_statements(sql):
+    """Split a migration on ';', keeping each CREATE TRIGGER body whole"""
+    statements = []
+    current = ''
+    for part in sql.split(';'):
+        current += part + ';'
+        if sqlite3.complete_statement(current):
+            if current.strip(' \n;'):
+                statements.append(current)
+            current = ''
+    if current.strip(' \n;'):
+        statements.append(current)
+    return statements
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations, returning the list of versions applied"""
+    applied = []
+    for version, description, sql in MIGRATIONS:
+        if target is not None and version > target:
+            break
+
+        # BEGIN IMMEDIATE serializes gunicorn workers migrating at boot
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            if callable(sql):
+                sql(conn)
+            else:
+                for statement in split_statements(sql):
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def check_query_plans(conn):
+    """Return the hot queries whose plan doesn't use the expected index"""
+    problems = []
+    for sql, params, index in QUERY_PLAN_CHECKS:
+        plan = ' '.join(row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+        if index not in plan or 'TEMP B-TREE' in plan:
+            problems.append((sql, plan))
+    return problems
@@ -0,0 +1,67 @@
+import json
+import threading
+
+
+class PromptTemplate:
+    """Prompt split into a precompiled static prefix and a per-request part.
+
+    For full-context prompts the prefix already contains the FAQ, so
+    rendering only appends the question. For retrieval prompts the
+    per-request context goes between the prefix and the question, followed
+    by the conversation history when there is one.
+    """
+
+    def __init__(self, prefix, question_label, suffix='', history_label=''):
+        self.prefix = prefix
+        self.question_label = question_label
+        self.suffix = suffix
+        self.history_label = history_label
+
+    def render(self, question, context=None, history=''):
+        """Return the full prompt for a question"""
+        parts = [self.prefix]
+        if context is not None:
+            parts.append(context)
+        if history:
+            parts.append(self.history_label)
+            parts.append(history)
+        parts += [self.question_label, question, self.suffix]
+        return ''.join(parts)
+
+
+class ModelRegistry:
+    """Preconfigured Gemini models, built once.
+
+    Models are keyed by model name and generation config, so every request
+    using the same settings shares one GenerativeModel instance.
+    google.generativeai takes most of a second to import, so it is imported
+    and configured with gemini_options when the first model is built.
+    """
+
+    def __init__(self, safety_settings, gemini_options=None):
+        self.safety_settings = safety_settings
+        self.gemini_options = gemini_options or {}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, model_name, generation_config):
+        """Return the model for a name and config, creating it on first use"""
+        key = (model_name, json.dumps(generation_config, sort_keys=True))
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                import google.generativeai as genai
+
+                if not self._models:
+                    genai.configure(**self.gemini_options)
+                model = genai.GenerativeModel(
+                    model_name=model_name,
+                    generation_config=generation_config,
+                    safety_settings=self.safety_settings
+                )
+                self._models[key] = model
+        return model
@@ -0,0 +1,132 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+# Unsalted hex SHA-256 digests written before scrypt was introduced
+LEGACY_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# scrypt at n=2**14, r=8 uses 16 MB and roughly 50 ms of CPU per hash
+DEFAULT_SCRYPT_N = 2 ** 14
+DEFAULT_SCRYPT_R = 8
+DEFAULT_SCRYPT_P = 1
+SALT_BYTES = 16
+KEY_BYTES = 32
+
+
+class HasherBusy(Exception):
+    """Raised when too many hashes are already queued"""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many login attempts in progress, try again shortly')
+        self.retry_after = retry_after
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class PasswordHasher:
+    """Salted scrypt password hashes, computed on a bounded thread pool.
+
+    Hashes are stored as "scrypt$n$r$p$salt$key" so the cost parameters can
+    be raised later: verify() reports when a hash was made with other
+    parameters, or is a legacy unsalted SHA-256 digest, so the caller can
+    store a fresh hash while it still has the plaintext.
+
+    hashlib.scrypt releases the GIL, so hashing on a thread pool keeps the
+    other request threads of a worker running. At most max_workers hashes
+    run at once and at most max_pending wait; beyond that, or when a hash
+    takes longer than timeout seconds, callers get HasherBusy instead of
+    queueing behind a login storm.
+    """
+
+    def __init__(self, n=DEFAULT_SCRYPT_N, r=DEFAULT_SCRYPT_R, p=DEFAULT_SCRYPT_P,
+                 max_workers=None, max_pending=64, timeout=10.0):
+        self.n = n
+        self.r = r
+        self.p = p
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 1,
+                                            thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        # Compared against when the user doesn't exist, so a failed login
+        # takes as long whether or not the username is registered
+        self._dummy_hash = self._hash('not a real password')
+
+    def _derive(self, password, salt, n, r, p):
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r * p, dklen=KEY_BYTES)
+
+    def _hash(self, password):
+        salt = os.urandom(SALT_BYTES)
+        key = self._derive(password, salt, self.n, self.r, self.p)
+        return f'scrypt${self.n}${self.r}${self.p}${_b64encode(salt)}${_b64encode(key)}'
+
+    def _verify(self, stored_hash, password):
+        if stored_hash is None:
+            self._verify(self._dummy_hash, password)
+            return False, False
+
+        if LEGACY_SHA256_PATTERN.match(stored_hash):
+            digest = hashlib.sha256(password.encode('utf-8')).hexdigest()
+            return hmac.compare_digest(stored_hash, digest), True
+
+        try:
+            scheme, n, r, p, salt, key = stored_hash.split('$')
+            n, r, p = int(n), int(r), int(p)
+        except ValueError:
+            return False, False
+        if scheme != 'scrypt':
+            return False, False
+
+        derived = self._derive(password, _b64decode(salt), n, r, p)
+        matches = hmac.compare_digest(derived, _b64decode(key))
+        return matches, (n, r, p) != (self.n, self.r, self.p)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy(1)
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued behind other hashes: drop it and turn the caller away
+            # like a full queue (a hash already running finishes and is discarded)
+            future.cancel()
+            raise HasherBusy(1)
+
+    def hash(self, password):
+        """Return a new salted hash of a password"""
+        return self._run(self._hash, password)
+
+    def verify(self, stored_hash, password):
+        """Check a password, returning (matches, needs_rehash).
+
+        Pass stored_hash=None for an unknown user to spend the same time as
+        a real check.
+        """
+        return self._run(self._verify, stored_hash, password)
+
+
+def create_password_hasher(config):
+    """Build the password hasher described by the app config"""
+    return PasswordHasher(
+        n=config.get('PASSWORD_SCRYPT_N', DEFAULT_SCRYPT_N),
+        r=config.get('PASSWORD_SCRYPT_R', DEFAULT_SCRYPT_R),
+        p=config.get('PASSWORD_SCRYPT_P', DEFAULT_SCRYPT_P),
+        max_workers=config.get('PASSWORD_HASH_WORKERS'),
+        max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 64),
+    )
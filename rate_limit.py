@@ -0,0 +1,133 @@
+import math
+import sqlite3
+import threading
+import time
+
+
+class RateLimited(Exception):
+    """Raised when a key has no token left for a request"""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many requests, please slow down')
+        self.retry_after = retry_after
+
+
+class NoRateLimit:
+    """Allows every request, used when rate limiting is disabled"""
+
+    def acquire(self, key):
+        return True, 0.0
+
+    def stats(self):
+        return {'enabled': False}
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets held in process memory.
+
+    Each key gets a bucket of burst tokens that refills at rate tokens per
+    second; a request takes one token or is refused with the time until
+    the next token. With several gunicorn workers every worker keeps its
+    own buckets, so use SQLiteTokenBucketLimiter for a host-wide limit.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def _prune(self, now):
+        # Buckets that have refilled completely hold no state worth keeping
+        full_after = self.burst / self.rate
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[key]
+
+    def acquire(self, key):
+        """Take a token for key, returning (allowed, retry_after_seconds)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self.allowed += 1
+                if len(self._buckets) > self.max_keys:
+                    self._prune(now)
+                return True, 0.0
+            self._buckets[key] = (tokens, now)
+            self.limited += 1
+            return False, (1 - tokens) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': True,
+                'backend': 'memory',
+                'allowed': self.allowed,
+                'limited': self.limited,
+                'tracked_keys': len(self._buckets),
+            }
+
+
+class SQLiteTokenBucketLimiter:
+    """Token buckets stored in the rate_limits table, shared by all workers.
+
+    Costs one short write transaction per request, in exchange for a limit
+    that holds across every gunicorn worker using the same database.
+    """
+
+    def __init__(self, pool, rate, burst):
+        self.pool = pool
+        self.rate = rate
+        self.burst = burst
+
+    def acquire(self, key):
+        """Take a token for key, returning (allowed, retry_after_seconds)"""
+        conn = self.pool.connection()
+        now = time.time()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?',
+                               (str(key),)).fetchone()
+            tokens = self.burst if row is None else min(
+                self.burst, row['tokens'] + max(0.0, now - row['updated_at']) * self.rate
+            )
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            conn.execute('INSERT INTO rate_limits (key, tokens, updated_at) VALUES (?, ?, ?) '
+                         'ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                         (str(key), tokens, now))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return allowed, 0.0 if allowed else (1 - tokens) / self.rate
+
+    def stats(self):
+        conn = self.pool.connection()
+        tracked = conn.execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        return {'enabled': True, 'backend': 'sqlite', 'tracked_keys': tracked}
+
+
+def retry_after_header(seconds):
+    """Format a Retry-After value, rounding up to whole seconds"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def create_rate_limiter(config, pool=None):
+    """Build the per-user rate limiter described by the app config"""
+    backend = config.get('RATE_LIMIT', 'memory')
+    if backend == 'none':
+        return NoRateLimit()
+
+    rate = config.get('RATE_LIMIT_PER_MINUTE', 20) / 60.0
+    burst = config.get('RATE_LIMIT_BURST', 5)
+    if backend == 'sqlite':
+        return SQLiteTokenBucketLimiter(pool, rate, burst)
+    return TokenBucketLimiter(rate, burst)
@@ -0,0 +1,87 @@
+import re
+
+from archive import unpack_messages
+
+# Messages matching an FTS5 query in one user's conversations, best first,
+# from both the hot and the archived index. bm25 ranks lower as better.
+# The snippet is plain text around the matches. The archived index is
+# contentless and has no snippet, search_messages fills those in
+SEARCH_MESSAGES = (
+    'SELECT id, conversation_id, title, is_user, created_at, snippet FROM ('
+    'SELECT m.id, m.conversation_id, c.title, m.is_user, m.created_at, '
+    "snippet(messages_fts, 0, '', '', '…', 24) AS snippet, bm25(messages_fts) AS rank "
+    'FROM messages_fts '
+    'JOIN messages m ON m.id = messages_fts.rowid '
+    'JOIN conversations c ON c.id = m.conversation_id '
+    'WHERE messages_fts MATCH ? AND c.user_id = ? '
+    'UNION ALL '
+    'SELECT a.id, a.conversation_id, c.title, a.is_user, a.created_at, '
+    'NULL AS snippet, bm25(archived_messages_fts) AS rank '
+    'FROM archived_messages_fts '
+    'JOIN archived_message_ids a ON a.id = archived_messages_fts.rowid '
+    'JOIN conversations c ON c.id = a.conversation_id '
+    'WHERE archived_messages_fts MATCH ? AND c.user_id = ?'
+    ') ORDER BY rank, id DESC LIMIT ? OFFSET ?'
+)
+
+# Words of context in a snippet, as in snippet() above
+SNIPPET_WORDS = 24
+
+WORD = re.compile(r'\w')
+
+
+def query_words(text):
+    """The words of free text that a search matches on"""
+    return [word for word in text.split() if WORD.search(word)]
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching all of its words.
+
+    Each word is quoted so operators and punctuation in what the user
+    typed are taken literally, and the last word matches as a prefix so
+    a partly typed word still finds results. Returns None if the text
+    has no words.
+    """
+    words = query_words(text)
+    if not words:
+        return None
+    quoted = ['"' + word.replace('"', '""') + '"' for word in words]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def text_snippet(content, words, size=SNIPPET_WORDS):
+    """Plain text of about size words around the first of words in content"""
+    tokens = content.split()
+    needles = [word.lower() for word in words]
+    first = next((i for i, token in enumerate(tokens)
+                  if any(needle in token.lower() for needle in needles)), 0)
+    start = max(0, min(first - size // 4, len(tokens) - size))
+    end = start + size
+    return ('…' if start > 0 else '') + ' '.join(tokens[start:end]) + ('…' if end < len(tokens) else '')
+
+
+def search_messages(conn, user_id, text, limit, offset=0):
+    """Return a page of the user's messages matching text, best match first.
+
+    Matches in archived conversations are included, with their snippet
+    taken from the conversation's compressed messages. Opening one
+    restores it as usual.
+    """
+    query = fts_query(text)
+    if query is None:
+        return []
+    rows = [dict(row) for row in conn.execute(SEARCH_MESSAGES, (query, user_id, query, user_id, limit, offset))]
+    archived = {row['conversation_id'] for row in rows if row['snippet'] is None}
+    contents = {}
+    for conversation_id in archived:
+        blob = conn.execute('SELECT data FROM archived_messages WHERE conversation_id = ?',
+                            (conversation_id,)).fetchone()
+        if blob:
+            contents.update((message[0], message[2]) for message in unpack_messages(blob[0]))
+    words = query_words(text)
+    for row in rows:
+        if row['snippet'] is None:
+            row['snippet'] = text_snippet(contents.get(row['id'], ''), words)
+    return rows
@@ -0,0 +1,348 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Stream:
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.items = []
+        self.done = False
+        self.error = None
+        self.followers = 0
+
+    def add(self, item):
+        with self.changed:
+            self.items.append(item)
+            self.changed.notify_all()
+
+    def finish(self, error=None):
+        with self.changed:
+            self.error = error
+            self.done = True
+            self.changed.notify_all()
+
+    def replay(self):
+        """Yield every item so far and then each new one, ending as the leader did"""
+        position = 0
+        while True:
+            with self.changed:
+                while position == len(self.items) and not self.done:
+                    self.changed.wait()
+                items = self.items[position:]
+                done, error = self.done, self.error
+            position += len(items)
+            yield from items
+            if done and position == len(self.items):
+                if error is not None:
+                    raise error
+                return
+
+
+class NoCoalescing:
+    """Runs every call, used when request coalescing is disabled"""
+
+    def do(self, key, func):
+        return func()
+
+    def stream(self, key, func):
+        return iter(func())
+
+    def stats(self):
+        return {'enabled': False}
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key within one process.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is running wait for it and receive the same result or
+    exception instead of making their own call.
+
+    stream() does the same for a function returning an iterator: followers
+    replay the items the leader has seen so far and then receive each new
+    one as it arrives, so a streamed answer is shared chunk by chunk.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+
+    def do(self, key, func):
+        """Run func for key, or wait for the call already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, func):
+        """Yield the items of func() for key, or of the stream already in flight.
+
+        The leader's exception is raised to followers after the same items.
+        If the leader's consumer stops early while followers are attached,
+        the leader reads the rest of the stream for them before returning.
+        """
+        with self._lock:
+            call = self._streams.get(key)
+            if call is None:
+                call = _Stream()
+                self._streams[key] = call
+                self.leaders += 1
+                leader = True
+            else:
+                call.followers += 1
+                self.followers += 1
+                leader = False
+
+        if not leader:
+            yield from call.replay()
+            return
+
+        items = iter(func())
+        error = None
+        finished = False
+        try:
+            for item in items:
+                call.add(item)
+                yield item
+            finished = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # No follower can join once the key is gone
+            with self._lock:
+                del self._streams[key]
+                followers = call.followers
+            if not finished and error is None and followers:
+                try:
+                    for item in items:
+                        call.add(item)
+                except Exception as e:
+                    error = e
+            call.finish(error)
+            if hasattr(items, 'close'):
+                items.close()
+
+    def stats(self):
+        """Upstream calls made and saved"""
+        with self._lock:
+            return {
+                'enabled': True,
+                'upstream_calls': self.leaders,
+                'saved_calls': self.followers,
+                'in_flight': len(self._calls) + len(self._streams),
+            }
+
+
+class ProcessSingleFlight(SingleFlight):
+    """SingleFlight that also deduplicates across processes on one host.
+
+    Threads are first coalesced in-process. The in-process leader then takes
+    an exclusive file lock for the key; a leader in another worker that
+    already holds it finishes its call and leaves the result in a file,
+    which is reused if it is younger than result_ttl seconds. A caller
+    that can't get the lock within lock_timeout seconds (the other leader
+    hung, or keeps failing) makes its call without it.
+
+    Every sweep_interval seconds one thread removes the result files that
+    have expired and the lock files nobody holds that haven't been used
+    for as long, so a directory of one-off keys doesn't grow forever.
+    Streams are only coalesced within the process, see SingleFlight.
+    """
+
+    # How often a caller waiting for a key's lock checks it again
+    LOCK_POLL_INTERVAL = 0.02
+
+    def __init__(self, directory, result_ttl=5.0, is_shareable=None, lock_timeout=10.0, sweep_interval=60.0):
+        super().__init__()
+        self.directory = directory
+        self.result_ttl = result_ttl
+        self.is_shareable = is_shareable or (lambda result: True)
+        self.lock_timeout = lock_timeout
+        self.sweep_interval = sweep_interval
+        self.shared_hits = 0
+        self.lock_timeouts = 0
+        self.swept = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._sweep_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key):
+        name = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:32]
+        base = os.path.join(self.directory, name)
+        return base + '.lock', base + '.json'
+
+    def _read_fresh_result(self, result_path):
+        try:
+            if time.time() - os.path.getmtime(result_path) > self.result_ttl:
+                return None
+            with open(result_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _acquire_file_lock(self, lock_path):
+        """Open and lock a key's lock file, or return None after lock_timeout"""
+        import fcntl
+
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            lock_file = open(lock_path, 'a')
+            try:
+                while True:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        break
+                    except BlockingIOError:
+                        if time.monotonic() >= deadline:
+                            lock_file.close()
+                            return None
+                        time.sleep(self.LOCK_POLL_INTERVAL)
+                # The sweeper may have removed the file while we waited for
+                # it, in which case a new caller can lock a new file: start over
+                try:
+                    if os.stat(lock_path).st_ino == os.fstat(lock_file.fileno()).st_ino:
+                        # Mark it used, for the sweeper
+                        os.utime(lock_path)
+                        return lock_file
+                except FileNotFoundError:
+                    pass
+            except BaseException:
+                lock_file.close()
+                raise
+            lock_file.close()
+
+    def _call_with_file_lock(self, key, func):
+        import fcntl
+
+        lock_path, result_path = self._paths(key)
+        started = time.time()
+        lock_file = self._acquire_file_lock(lock_path)
+        if lock_file is None:
+            with self._lock:
+                self.lock_timeouts += 1
+            return func()
+        with lock_file:
+            try:
+                # Another worker may have answered while we waited for the lock
+                shared = self._read_fresh_result(result_path)
+                if shared is not None and shared['finished_at'] >= started:
+                    with self._lock:
+                        self.shared_hits += 1
+                    return shared['result']
+
+                result = func()
+                if self.is_shareable(result):
+                    temp_path = f'{result_path}.{os.getpid()}'
+                    with open(temp_path, 'w', encoding='utf-8') as f:
+                        json.dump({'result': result, 'finished_at': time.time()}, f)
+                    os.replace(temp_path, result_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def sweep(self):
+        """Remove expired result files and unused lock files, returning how many"""
+        import fcntl
+
+        cutoff = time.time() - self.result_ttl
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime >= cutoff:
+                        continue
+                    if entry.name.endswith('.json'):
+                        os.unlink(entry.path)
+                        removed += 1
+                    elif entry.name.endswith('.lock'):
+                        # Only while nobody holds it; waiters that opened it
+                        # notice it is gone once they get it (see _lock)
+                        with open(entry.path, 'a') as lock_file:
+                            try:
+                                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                            except BlockingIOError:
+                                continue
+                            os.unlink(entry.path)
+                            removed += 1
+                except FileNotFoundError:
+                    # Removed by another worker's sweep
+                    continue
+        with self._lock:
+            self.swept += removed
+        return removed
+
+    def _maybe_sweep(self):
+        if time.monotonic() < self._next_sweep or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+        except OSError:
+            pass
+        finally:
+            self._sweep_lock.release()
+
+    def do(self, key, func):
+        self._maybe_sweep()
+        return super().do(key, lambda: self._call_with_file_lock(key, func))
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats['saved_calls'] += self.shared_hits
+            stats['upstream_calls'] -= self.shared_hits
+            stats['shared_across_workers'] = self.shared_hits
+            stats['lock_timeouts'] = self.lock_timeouts
+            stats['files_swept'] = self.swept
+        return stats
+
+
+def create_single_flight(config, is_shareable=None):
+    """Build the request coalescer described by the app config"""
+    if not config.get('COALESCE_REQUESTS', True):
+        return NoCoalescing()
+    if config.get('COALESCE_ACROSS_WORKERS'):
+        return ProcessSingleFlight(
+            config['COALESCE_LOCK_DIR'],
+            result_ttl=config.get('COALESCE_RESULT_TTL', 5.0),
+            is_shareable=is_shareable,
+            lock_timeout=config.get('COALESCE_LOCK_TIMEOUT', 10.0),
+        )
+    return SingleFlight()
@@ -3,6 +3,14 @@
 // Global variables
 let currentConversationId = null;
 
+// Pagination state: cursors for the next (older) page, or null when done
+const PAGE_SIZE = 50;
+let nextConversationsBefore = null;
+let lastHistoryHeading = null;
+let loadingConversations = false;
+let nextMessagesBefore = null;
+let loadingMessages = false;
+
 // Function to create typewriter effect
 function typeWriter(element, text, speed = 20, index = 0) {
     if (index < text.length) {
@@ -49,70 +57,55 @@ function initTheme() {
     });
 }
 
+// Heading for a conversation in the sidebar, based on its date
+function historyHeadingFor(conversation) {
+    const today = new Date().toDateString();
+    const yesterday = new Date(Date.now() - 86400000).toDateString();
+    const date = new Date(conversation.created_at).toDateString();
+    
+    if (date === today) return 'Today';
+    if (date === yesterday) return 'Yesterday';
+    return 'Previous 7 Days';
+}
+
+// Append a page of conversations (newest first) to the sidebar
+function appendConversationItems(conversations) {
+    const chatHistory = document.querySelector('.chat-history');
+    
+    conversations.forEach(conversation => {
+        const heading = historyHeadingFor(conversation);
+        
+        // Pages arrive in date order, so a heading is only added when the group changes
+        if (heading !== lastHistoryHeading) {
+            const headingElement = document.createElement('h6');
+            headingElement.className = 'history-heading';
+            headingElement.textContent = heading;
+            chatHistory.appendChild(headingElement);
+            lastHistoryHeading = heading;
+        }
+        
+        chatHistory.appendChild(createHistoryItem(conversation));
+    });
+}
+
 // Load conversations from database
 function loadConversations() {
     $.ajax({
         url: '/conversations',
         type: 'GET',
-        success: function(conversations) {
+        data: { limit: PAGE_SIZE },
+        success: function(response) {
             const chatHistory = document.querySelector('.chat-history');
             
             // Clear existing history items
             chatHistory.innerHTML = '';
+            lastHistoryHeading = null;
+            nextConversationsBefore = response.next_before;
             
-            // Group conversations by date
-            const today = new Date().toDateString();
-            const yesterday = new Date(Date.now() - 86400000).toDateString();
-            
-            let todayItems = [];
-            let yesterdayItems = [];
-            let olderItems = [];
-            
-            conversations.forEach(conversation => {
-                const date = new Date(conversation.created_at).toDateString();
-                const item = createHistoryItem(conversation);
-                
-                if (date === today) {
-                    todayItems.push(item);
-                } else if (date === yesterday) {
-                    yesterdayItems.push(item);
-                } else {
-                    olderItems.push(item);
-                }
-            });
-            
-            // Add today's conversations
-            if (todayItems.length > 0) {
-                const todayHeading = document.createElement('h6');
-                todayHeading.className = 'history-heading';
-                todayHeading.textContent = 'Today';
-                chatHistory.appendChild(todayHeading);
-                
-                todayItems.forEach(item => chatHistory.appendChild(item));
-            }
-            
-            // Add yesterday's conversations
-            if (yesterdayItems.length > 0) {
-                const yesterdayHeading = document.createElement('h6');
-                yesterdayHeading.className = 'history-heading';
-                yesterdayHeading.textContent = 'Yesterday';
-                chatHistory.appendChild(yesterdayHeading);
-                
-                yesterdayItems.forEach(item => chatHistory.appendChild(item));
-            }
-            
-            // Add older conversations
-            if (olderItems.length > 0) {
-                const olderHeading = document.createElement('h6');
-                olderHeading.className = 'history-heading';
-                olderHeading.textContent = 'Previous 7 Days';
-                chatHistory.appendChild(olderHeading);
-                
-                olderItems.forEach(item => chatHistory.appendChild(item));
-            }
+            appendConversationItems(response.conversations);
             
             // If no conversations, add a message
-            if (conversations.length === 0) {
+            if (response.conversations.length === 0) {
                 const emptyMessage = document.createElement('div');
                 emptyMessage.className = 'empty-history-message';
                 emptyMessage.textContent = 'No conversations yet';
@@ -125,6 +118,28 @@ function loadConversations() {
     });
 }
 
+// Load the next page of older conversations into the sidebar
+function loadMoreConversations() {
+    if (nextConversationsBefore === null || loadingConversations) return;
+    
+    loadingConversations = true;
+    $.ajax({
+        url: '/conversations',
+        type: 'GET',
+        data: { limit: PAGE_SIZE, before: nextConversationsBefore },
+        success: function(response) {
+            nextConversationsBefore = response.next_before;
+            appendConversationItems(response.conversations);
+        },
+        error: function(error) {
+            console.error('Error loading more conversations:', error);
+        },
+        complete: function() {
+            loadingConversations = false;
+        }
+    });
+}
+
 // Create a history item element
 function createHistoryItem(conversation) {
     const item = document.createElement('div');
@@ -163,9 +178,11 @@ function loadConversation(conversationId) {
     $.ajax({
         url: `/conversation/${conversationId}`,
         type: 'GET',
+        data: { limit: PAGE_SIZE },
         success: function(conversation) {
             console.log("Loaded conversation:", conversation);
             currentConversationId = conversation.id;
+            nextMessagesBefore = conversation.next_before;
             
             // Clear chat body
             const chatBody = document.getElementById('chatBody');
@@ -191,6 +208,43 @@ function loadConversation(conversationId) {
     });
 }
 
+// Load the page of messages older than the ones shown and prepend it
+function loadOlderMessages() {
+    if (nextMessagesBefore === null || loadingMessages || !currentConversationId) return;
+    
+    loadingMessages = true;
+    const conversationId = currentConversationId;
+    $.ajax({
+        url: `/conversation/${conversationId}`,
+        type: 'GET',
+        data: { limit: PAGE_SIZE, before: nextMessagesBefore },
+        success: function(conversation) {
+            // Ignore the page if the user switched conversations meanwhile
+            if (conversationId !== currentConversationId) return;
+            
+            nextMessagesBefore = conversation.next_before;
+            
+            const chatBody = document.getElementById('chatBody');
+            const previousHeight = chatBody.scrollHeight;
+            const firstMessage = chatBody.firstChild;
+            
+            conversation.messages.forEach(message => {
+                const container = createMessageElement(message.content, message.is_user);
+                chatBody.insertBefore(container, firstMessage);
+            });
+            
+            // Keep the messages the user was reading in place
+            chatBody.scrollTop += chatBody.scrollHeight - previousHeight;
+        },
+        error: function(error) {
+            console.error('Error loading older messages:', error);
+        },
+        complete: function() {
+            loadingMessages = false;
+        }
+    });
+}
+
 // Create a new conversation
 function createNewConversation() {
     console.log("Creating new conversation");
@@ -202,6 +256,7 @@ function createNewConversation() {
         success: function(response) {
             console.log("New conversation created:", response);
             currentConversationId = response.id;
+            nextMessagesBefore = null;
             
             // Clear chat body
             const chatBody = document.getElementById('chatBody');
@@ -277,10 +332,8 @@ function initSidebar() {
     });
 }
 
-// Add a message to the UI
-function addMessageToUI(message, isUser, animate = true) {
-    const chatBody = document.getElementById('chatBody');
-    
+// Create the element for a message without adding it to the chat
+function createMessageElement(message, isUser) {
     // Create message container
     const messageContainer = document.createElement('div');
     messageContainer.className = isUser ? 'message-container user-container' : 'message-container bot-container';
@@ -292,24 +345,176 @@ function addMessageToUI(message, isUser, animate = true) {
     // Create message element
     const messageElement = document.createElement('div');
     messageElement.className = isUser ? 'message user-message' : 'message bot-message';
-    
-    // Add content
-    if (isUser) {
-        messageElement.textContent = message;
-    } else if (animate) {
-        // Use typewriter effect for bot messages
-        typeWriter(messageElement, message);
-    } else {
-        messageElement.textContent = message;
-    }
+    messageElement.textContent = message;
     
     // Append elements
     messageContent.appendChild(messageElement);
     messageContainer.appendChild(messageContent);
+    
+    return messageContainer;
+}
+
+// Add a message to the UI
+function addMessageToUI(message, isUser, animate = true) {
+    const chatBody = document.getElementById('chatBody');
+    
+    // Use typewriter effect for bot messages
+    const useTypewriter = !isUser && animate;
+    const messageContainer = createMessageElement(useTypewriter ? '' : message, isUser);
+    const messageElement = messageContainer.querySelector('.message');
+    
+    if (useTypewriter) {
+        typeWriter(messageElement, message);
+    }
+    
     chatBody.appendChild(messageContainer);
     
     // Scroll to bottom
     chatBody.scrollTop = chatBody.scrollHeight;
+    
+    return messageElement;
+}
+
+// Send the question to /ask and show the whole answer at once
+function sendAskRequest(requestData) {
+    $.ajax({
+        url: '/ask',
+        type: 'POST',
+        contentType: 'application/json',
+        data: requestData,
+        success: function(response) {
+            console.log("Received response:", response);
+            
+            // Hide loader
+            document.getElementById('loader').style.display = 'none';
+            
+            // Add bot response to UI
+            addMessageToUI(response.answer, false);
+            
+            // Update conversation list
+            loadConversations();
+        },
+        error: function(error) {
+            console.error("Error from server:", error);
+            document.getElementById('loader').style.display = 'none';
+            if (error.status === 429) {
+                addMessageToUI(rateLimitMessage(error.getResponseHeader('Retry-After')), false);
+            } else {
+                addMessageToUI('Sorry, I encountered an error. Please try again later.', false);
+            }
+        }
+    });
+}
+
+// Message shown when the server asks us to slow down
+function rateLimitMessage(retryAfter) {
+    const seconds = parseInt(retryAfter, 10) || 1;
+    return `You're asking questions too quickly. Please wait ${seconds} second${seconds === 1 ? '' : 's'} and try again.`;
+}
+
+// Parse one server-sent event block into {event, data}
+function parseServerEvent(block) {
+    let event = 'message';
+    let data = '';
+    
+    block.split('\n').forEach(line => {
+        if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+            data += line.slice(5).trim();
+        }
+    });
+    
+    return { event: event, data: data ? JSON.parse(data) : null };
+}
+
+// Send the question to /ask/stream and render the answer as it arrives
+function streamAskRequest(question, conversationId, requestData) {
+    // Fall back to the regular endpoint on browsers without streaming fetch
+    if (!window.fetch || !window.ReadableStream || !window.TextDecoder) {
+        sendAskRequest(requestData);
+        return;
+    }
+    
+    const chatBody = document.getElementById('chatBody');
+    let messageElement = null;
+    
+    fetch('/ask/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: requestData
+    }).then(response => {
+        if (response.status === 429) {
+            document.getElementById('loader').style.display = 'none';
+            addMessageToUI(rateLimitMessage(response.headers.get('Retry-After')), false);
+            return;
+        }
+        if (!response.ok || !response.body) {
+            throw new Error(`Stream request failed with status ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        function handleEvent(block) {
+            const message = parseServerEvent(block);
+            if (!message.data) return;
+            
+            if (message.event === 'done') {
+                console.log("Stream finished:", message.data);
+                loadConversations();
+                return;
+            }
+            
+            if (message.event === 'error') {
+                // The answer failed and wasn't saved
+                console.error("Stream failed:", message.data);
+                document.getElementById('loader').style.display = 'none';
+                const text = message.data.code === 'upstream_busy'
+                    ? rateLimitMessage(message.data.retry_after)
+                    : 'Sorry, I couldn\'t answer that right now. Please try again.';
+                if (messageElement) {
+                    messageElement.textContent += `\n\n${text}`;
+                } else {
+                    addMessageToUI(text, false);
+                }
+                return;
+            }
+            
+            if (!messageElement) {
+                // First chunk: swap the loader for an empty bot message
+                document.getElementById('loader').style.display = 'none';
+                messageElement = addMessageToUI('', false, false);
+            }
+            messageElement.textContent += message.data.text;
+            chatBody.scrollTop = chatBody.scrollHeight;
+        }
+        
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    if (buffer.trim()) handleEvent(buffer);
+                    return;
+                }
+                
+                buffer += decoder.decode(value, { stream: true });
+                const blocks = buffer.split('\n\n');
+                buffer = blocks.pop();
+                blocks.forEach(handleEvent);
+                
+                return read();
+            });
+        }
+        
+        return read();
+    }).catch(error => {
+        console.error("Error from server:", error);
+        document.getElementById('loader').style.display = 'none';
+        if (!messageElement) {
+            addMessageToUI('Sorry, I encountered an error. Please try again later.', false);
+        }
+    });
 }
 
 // Function to ask a question
@@ -361,6 +566,7 @@ function sendQuestionToServer(question, conversationId = null) {
             success: function(response) {
                 console.log("Created new conversation for question:", response);
                 currentConversationId = response.id;
+                nextMessagesBefore = null;
                 
                 // Now send the question with the new conversation ID
                 sendQuestionWithConversation(question, currentConversationId);
@@ -394,6 +600,7 @@ function sendQuestionWithConversation(question, conversationId) {
     $.ajax({
         url: `/conversation/${conversationId}`,
         type: 'GET',
+        data: { limit: 1 },
         success: function(conversation) {
             // If this is the first message (no messages yet), update the title
             if (conversation.messages.length === 0) {
@@ -424,57 +631,13 @@ function sendQuestionWithConversation(question, conversationId) {
             }
             
             // Now send the actual question
-            $.ajax({
-                url: '/ask',
-                type: 'POST',
-                contentType: 'application/json',
-                data: requestData,
-                success: function(response) {
-                    console.log("Received response:", response);
-                    
-                    // Hide loader
-                    document.getElementById('loader').style.display = 'none';
-                    
-                    // Add bot response to UI
-                    addMessageToUI(response.answer, false);
-                    
-                    // Update conversation list
-                    loadConversations();
-                },
-                error: function(error) {
-                    console.error("Error from server:", error);
-                    document.getElementById('loader').style.display = 'none';
-                    addMessageToUI('Sorry, I encountered an error. Please try again later.', false);
-                }
-            });
+            streamAskRequest(question, conversationId, requestData);
         },
         error: function(error) {
             console.error("Error checking conversation:", error);
             
             // If we can't check the conversation, just send the question anyway
-            $.ajax({
-                url: '/ask',
-                type: 'POST',
-                contentType: 'application/json',
-                data: requestData,
-                success: function(response) {
-                    console.log("Received response:", response);
-                    
-                    // Hide loader
-                    document.getElementById('loader').style.display = 'none';
-                    
-                    // Add bot response to UI
-                    addMessageToUI(response.answer, false);
-                    
-                    // Update conversation list
-                    loadConversations();
-                },
-                error: function(error) {
-                    console.error("Error from server:", error);
-                    document.getElementById('loader').style.display = 'none';
-                    addMessageToUI('Sorry, I encountered an error. Please try again later.', false);
-                }
-            });
+            streamAskRequest(question, conversationId, requestData);
         }
     });
 }
@@ -523,6 +686,18 @@ $(document).ready(function() {
     // Load conversations
     loadConversations();
     
+    // Lazily load older messages and conversations while scrolling
+    document.getElementById('chatBody').addEventListener('scroll', function() {
+        if (this.scrollTop < 100) {
+            loadOlderMessages();
+        }
+    });
+    document.querySelector('.sidebar-content').addEventListener('scroll', function() {
+        if (this.scrollTop + this.clientHeight > this.scrollHeight - 100) {
+            loadMoreConversations();
+        }
+    });
+    
     // Create new conversation if none exists
     setTimeout(() => {
         if (!currentConversationId) {
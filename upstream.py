@@ -0,0 +1,112 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+def default_retryable_errors():
+    """Provider errors worth another attempt: quota (429, which includes
+    ResourceExhausted), overload (503), transient server errors and timeouts.
+
+    Resolved on first use, since google.api_core is slow to import.
+    """
+    from google.api_core import exceptions as api_exceptions
+
+    return (
+        api_exceptions.TooManyRequests,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.DeadlineExceeded,
+    )
+
+
+class UpstreamBusy(Exception):
+    """Raised when no Gemini call slot frees up in time"""
+
+    def __init__(self, retry_after):
+        super().__init__('Too many requests in progress, try again shortly')
+        self.retry_after = retry_after
+
+
+class UpstreamLimiter:
+    """Bounds concurrent Gemini calls and retries transient provider errors.
+
+    At most max_concurrency calls run at once in this process. A request
+    that can't get a slot within queue_timeout seconds fails fast with
+    UpstreamBusy instead of piling more load onto a provider that is
+    already saturated. Retryable errors are retried up to retries times
+    with full-jitter exponential backoff, so clients that failed together
+    don't all retry at the same moment. call() releases its slot while
+    backing off.
+    """
+
+    def __init__(self, max_concurrency=8, queue_timeout=5.0, retries=2,
+                 base_delay=0.5, max_delay=8.0, retryable=None):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.calls = 0
+        self.retried = 0
+        self.rejected = 0
+        self.failed = 0
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the concurrent call slots"""
+        if not self._semaphore.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise UpstreamBusy(self.base_delay + self.queue_timeout)
+        with self._lock:
+            self.active += 1
+            self.calls += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._semaphore.release()
+
+    def retry(self, func):
+        """Run func, retrying retryable errors with jittered backoff"""
+        if self.retryable is None:
+            self.retryable = default_retryable_errors()
+        for attempt in range(self.retries + 1):
+            try:
+                return func()
+            except self.retryable:
+                if attempt == self.retries:
+                    with self._lock:
+                        self.failed += 1
+                    raise
+                with self._lock:
+                    self.retried += 1
+                time.sleep(self.backoff(attempt))
+
+    def call(self, func):
+        """Run func in a slot, with retries"""
+        def attempt():
+            with self.slot():
+                return func()
+        return self.retry(attempt)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'active': self.active,
+                'calls': self.calls,
+                'retried': self.retried,
+                'rejected': self.rejected,
+                'failed': self.failed,
+            }
@@ -0,0 +1,209 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, deque
+
+from structured_log import log_event
+
+logger = logging.getLogger('smart_faq')
+
+INSERT_MESSAGE = 'INSERT INTO messages (conversation_id, is_user, content) VALUES (?, ?, ?)'
+
+
+class MessageWriter:
+    """Write-behind queue for conversation messages, drained by one thread.
+
+    submit() queues a question/answer pair and returns straight away, so a
+    request doesn't wait for the SQLite write lock. The writer thread
+    takes up to batch_size pairs at a time, waiting up to flush_interval
+    for a batch to fill, and inserts them with one executemany in a single
+    transaction. Failed transactions are retried with backoff and the pairs
+    stay queued until they commit.
+
+    The queue holds at most max_queue pairs. When it is full, submit()
+    blocks for up to put_timeout and then returns False, so the caller can
+    write the pair itself instead of growing the backlog. wait() blocks
+    until a conversation's queued pairs are committed, for
+    read-your-writes, and close() flushes everything before shutdown.
+    on_written(conversation_id, [(id, is_user, content), ...]) is called
+    after each pair commits.
+    """
+
+    def __init__(self, connection, max_queue=10000, batch_size=500, flush_interval=0.05,
+                 put_timeout=1.0, on_written=None):
+        self.connection = connection
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.on_written = on_written
+        self._queue = deque()
+        self._pending = Counter()
+        self._in_flight = 0
+        self._urgent = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _start(self):
+        # Threads don't survive a fork, so each gunicorn worker starts its own
+        if self._thread is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, conversation_id, question, answer):
+        """Queue a question/answer pair, returning False if the queue stays full"""
+        deadline = time.monotonic() + self.put_timeout
+        with self._cond:
+            while len(self._queue) >= self.max_queue and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                self._cond.wait(remaining)
+            if self._closed:
+                return False
+            self._queue.append((conversation_id, question, answer))
+            self._pending[conversation_id] += 1
+            self.submitted += 1
+            self._start()
+            self._cond.notify_all()
+        return True
+
+    def wait(self, conversation_id, timeout=None):
+        """Wait until a conversation's queued pairs are committed.
+
+        Returns False if they are still pending after timeout seconds.
+        """
+        with self._cond:
+            if not self._pending[conversation_id]:
+                return True
+            # Flush now rather than waiting for the batch to fill
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending[conversation_id], timeout)
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed"""
+        with self._cond:
+            self._urgent = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._queue and not self._in_flight, timeout)
+
+    def close(self, timeout=10.0):
+        """Flush the queue and stop the writer thread, e.g. at shutdown"""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            lost = len(self._queue) + self._in_flight
+            self._cond.notify_all()
+        if not flushed:
+            log_event(logger, logging.ERROR, 'message_writer_unflushed', pairs=lost)
+        return flushed
+
+    def _next_batch(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._queue or self._closed)
+            if not self._queue:
+                return None
+            # Let a batch build up so one commit covers many pairs
+            self._cond.wait_for(lambda: len(self._queue) >= self.batch_size or self._urgent or self._closed,
+                                self.flush_interval)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._in_flight = len(batch)
+            if not self._queue:
+                self._urgent = False
+            # Wake submitters waiting for room
+            self._cond.notify_all()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                written = self._write(batch)
+                self.batches += 1
+                self.written += len(written)
+                if self.on_written:
+                    for conversation_id, messages in written:
+                        self.on_written(conversation_id, messages)
+            except Exception:
+                log_event(logger, logging.ERROR, 'message_write_failed', exc_info=True, pairs=len(batch))
+            finally:
+                with self._cond:
+                    for conversation_id, _, _ in batch:
+                        self._pending[conversation_id] -= 1
+                        if not self._pending[conversation_id]:
+                            del self._pending[conversation_id]
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def _write(self, batch):
+        """Insert a batch, retrying until it commits, and return what was written"""
+        attempt = 0
+        while True:
+            try:
+                return self._insert(batch)
+            except sqlite3.IntegrityError as e:
+                if len(batch) == 1:
+                    log_event(logger, logging.ERROR, 'message_write_dropped',
+                              conversation_id=batch[0][0], error=str(e))
+                    return []
+                # One bad pair fails the whole executemany, so write the
+                # pairs one at a time and drop only the rejected ones
+                return [pair for item in batch for pair in self._write([item])]
+            except sqlite3.Error as e:
+                self.failures += 1
+                attempt += 1
+                log_event(logger, logging.WARNING, 'message_write_retry',
+                          pairs=len(batch), attempt=attempt, error=str(e))
+                time.sleep(min(0.05 * 2 ** attempt, 2.0))
+
+    def _insert(self, batch):
+        conn = self.connection()
+        rows = []
+        for conversation_id, question, answer in batch:
+            rows.append((conversation_id, True, question))
+            rows.append((conversation_id, False, answer))
+
+        # IMMEDIATE takes the write lock up front, so no other connection
+        # can insert between reading the last id and the new rows
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM messages').fetchone()[0]
+            conn.executemany(INSERT_MESSAGE, rows)
+            ids = [row[0] for row in conn.execute('SELECT id FROM messages WHERE id > ? ORDER BY id', (last_id,))]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        return [
+            (conversation_id, [(ids[2 * i], True, question), (ids[2 * i + 1], False, answer)])
+            for i, (conversation_id, question, answer) in enumerate(batch)
+        ]
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._queue) + self._in_flight
+        return {
+            'enabled': True,
+            'queued': queued,
+            'max_queue': self.max_queue,
+            'submitted': self.submitted,
+            'written': self.written,
+            'batches': self.batches,
+            'failures': self.failures,
+            'rejected': self.rejected,
+        }